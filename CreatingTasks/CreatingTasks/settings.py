@@ -3,6 +3,8 @@ from pathlib import Path
 import sys
 from datetime import timedelta
 
+from CreatingTasks.database import parse_database_url
+
 # Базовые пути для проекта CreatingTasks
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -68,18 +70,58 @@ TEMPLATES = [
 ]
 
 # Database configuration for CreatingTasks
+# DATABASE_URL (postgres://... или sqlite:///...), по умолчанию (и если пусто) db.sqlite3 рядом с manage.py.
+# DATABASE_REPLICA_URL включает чтение безопасных запросов API с реплики
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', '60'))
+DATABASE_CONN_HEALTH_CHECKS = os.getenv('DATABASE_CONN_HEALTH_CHECKS', 'true').lower() == 'true'
+# Сколько секунд после записи пользователь читает с основной базы
+DATABASE_REPLICA_PIN = int(os.getenv('DATABASE_REPLICA_PIN', '5'))
+# WAL меняет формат файла SQLite, поэтому включается явно (для развёрнутых баз, не для db.sqlite3 из репозитория)
+DATABASE_SQLITE_WAL = os.getenv('DATABASE_SQLITE_WAL', 'false').lower() == 'true'
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': parse_database_url(
+        os.getenv('DATABASE_URL') or f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=DATABASE_CONN_HEALTH_CHECKS,
+    )
 }
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = parse_database_url(
+        os.getenv('DATABASE_REPLICA_URL'),
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=DATABASE_CONN_HEALTH_CHECKS,
+    )
+    # В тестах реплика - та же база, что и default
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['CreatingTasks.database.ReplicaRouter']
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Redis для CreatingTasks
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
 
+# manage.py test: кэш, слой каналов и Celery работают в памяти процесса
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
+# Кэш общий для всех процессов (веб, Daphne, Celery): в нём членство в списках,
+# счётчики непрочитанного и токены версий, и сброс должен быть виден всем.
+# Локальная память процесса - только в тестах
+CACHE_URL = os.getenv('CACHE_URL') or REDIS_URL
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
 # WebSocket routing для CreatingTasks
 ASGI_APPLICATION = 'CreatingTasks.asgi.application'
 
@@ -93,6 +135,23 @@ CHANNEL_LAYERS = {
     },
 }
 
+if TESTING:
+    CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+# Окно схлопывания исходящих WebSocket-событий (секунды, 0 - отправка сразу)
+WEBSOCKET_COALESCE_WINDOW = float(os.getenv('WEBSOCKET_COALESCE_WINDOW', '0.05'))
+
+# Журнал изменений задач: сколько версий списка отдаём дельтой и храним
+TASK_CHANGELOG_MAX_REPLAY = int(os.getenv('TASK_CHANGELOG_MAX_REPLAY', '1000'))
+TASK_CHANGELOG_RETENTION = int(os.getenv('TASK_CHANGELOG_RETENTION', '5000'))
+
+# Кэш GET-ответов списков и задач (секунды); сбрасывается сигналами при изменениях,
+# срок ограничивает устаревание is_overdue
+TASK_RESPONSE_CACHE_TIMEOUT = int(os.getenv('TASK_RESPONSE_CACHE_TIMEOUT', '60'))
+
+# Через сколько дней завершённые и архивные задачи переносятся в ArchivedTask
+TASK_ARCHIVE_AFTER_DAYS = int(os.getenv('TASK_ARCHIVE_AFTER_DAYS', '90'))
+
 # Celery для CreatingTasks
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -100,6 +159,28 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# В тестах задачи выполняются сразу, без брокера
+CELERY_TASK_ALWAYS_EAGER = TESTING
+CELERY_BEAT_SCHEDULE = {
+    'send-due-reminders': {
+        'task': 'apps.notifications.tasks.send_due_reminders',
+        'schedule': 300.0,
+    },
+    'compact-notifications': {
+        'task': 'apps.notifications.tasks.compact_notifications',
+        'schedule': 24 * 60 * 60.0,
+    },
+    'archive-old-tasks': {
+        'task': 'apps.tasks.tasks.archive_old_tasks',
+        'schedule': 24 * 60 * 60.0,
+    },
+}
+
+# Сколько дней хранить прочитанные уведомления
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '30'))
+
+# За сколько минут до срока напоминать о задаче
+TASK_DUE_REMINDER_THRESHOLDS = [24 * 60, 60]
 
 # CreatingTasks API Configuration
 REST_FRAMEWORK = {
@@ -141,6 +222,10 @@ SESSION_COOKIE_NAME = f"{PROJECT_NAME.lower()}_sessionid"
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
 TELEGRAM_BOT_USERNAME = os.getenv('TELEGRAM_BOT_USERNAME', 'CreatingTasksBot')
 
+# Очередь push-событий, которую читает бот (см. apps/notifications/telegram.py)
+TELEGRAM_PUSH_URL = os.getenv('TELEGRAM_PUSH_URL', REDIS_URL)
+TELEGRAM_PUSH_QUEUE = os.getenv('TELEGRAM_PUSH_QUEUE', 'telegram:push')
+
 AUTH_USER_MODEL = 'users.User'
 
 # Создайте необходимые директории
@@ -0,0 +1,110 @@
+"""Маршрутизация чтения на реплику с двумя локальными базами SQLite.
+
+    DATABASE_URL=sqlite:///primary.sqlite3 DATABASE_REPLICA_URL=sqlite:///replica.sqlite3 \
+        python manage.py test CreatingTasks
+
+В тестах реплика - зеркало default (TEST MIRROR), но ходит через своё
+соединение, так что видно, на какой алиас ушли запросы.
+"""
+import unittest
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.tasks.models import Comment, Task, TaskList
+from apps.users.models import User
+
+from .database import REPLICA_ALIAS, parse_database_url, use_replica
+
+
+class ParseDatabaseUrlTests(unittest.TestCase):
+    def test_sqlite_paths(self):
+        self.assertEqual(parse_database_url('sqlite:///db.sqlite3')['NAME'], 'db.sqlite3')
+        self.assertEqual(parse_database_url('sqlite:////var/db.sqlite3')['NAME'], '/var/db.sqlite3')
+        self.assertEqual(parse_database_url('sqlite://')['NAME'], ':memory:')
+
+    def test_postgres_options(self):
+        config = parse_database_url('postgres://u:p%40ss@db:5433/tasks?sslmode=require', conn_max_age=60)
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['USER'], config['PASSWORD'], config['HOST'], config['PORT']),
+                         ('u', 'p@ss', 'db', '5433'))
+        self.assertEqual(config['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ValueError):
+            parse_database_url('mysql://db/tasks')
+
+
+@unittest.skipUnless(REPLICA_ALIAS in settings.DATABASES, 'DATABASE_REPLICA_URL не задан')
+class ReplicaRouterTests(TransactionTestCase):
+    # TestCase держит default в транзакции, и роутер никогда не выбрал бы реплику.
+    # '__all__', а не имена алиасов: без реплики класс пропускается, но базы собираются
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner')
+        task_list = TaskList.objects.create(name='Старый список', created_by=self.user)
+        task_list.members.add(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reads_use_replica_only_inside_use_replica(self):
+        self.assertEqual(TaskList.objects.all().db, DEFAULT_DB_ALIAS)
+        with use_replica():
+            self.assertEqual(TaskList.objects.all().db, REPLICA_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(TaskList.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_writes_and_migrations_use_default(self):
+        with use_replica():
+            self.assertEqual(router.db_for_write(TaskList), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, 'tasks'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'tasks'))
+
+    def test_safe_requests_read_from_replica_until_user_writes(self):
+        # Архив не кэшируется и читается с реплики
+        with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica_queries:
+            response = self.client.get('/api/tasks/archive/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica_queries.captured_queries)
+
+        response = self.client.post('/api/tasks/lists/', {'name': 'Новый список'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        # Автор только что записал - читает с основной базы
+        with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica_queries:
+            self.assertEqual(self.client.get('/api/tasks/archive/').status_code, 200)
+            response = self.client.get('/api/tasks/lists/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica_queries.captured_queries, [])
+        self.assertEqual([item['name'] for item in response.json()['results']], ['Новый список', 'Старый список'])
+
+    def test_cached_responses_are_built_from_primary(self):
+        task_list = TaskList.objects.get()
+        task = Task.objects.create(title='Задача', task_list=task_list, created_by=self.user)
+        Comment.objects.create(task=task, author=self.user, content='Комментарий')
+        # Промах кэша ответов: ответ строится только с основной базы
+        for url in ['/api/tasks/lists/', f'/api/tasks/lists/{task_list.pk}/',
+                    f'/api/tasks/lists/{task_list.pk}/tasks/', '/api/tasks/tasks/']:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica_queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(replica_queries.captured_queries, [])
+
+        # Задача для проверки доступа ищется на реплике, всё остальное - с основной базы
+        for url, table in [(f'/api/tasks/tasks/{task.pk}/', 'tasks_task'),
+                           (f'/api/tasks/tasks/{task.pk}/comments/', 'tasks_comment')]:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica_queries:
+                    with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary_queries:
+                        response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(replica_queries.captured_queries), 1)
+                self.assertTrue(any(f'FROM "{table}"' in query['sql'] for query in primary_queries.captured_queries))
@@ -8,6 +8,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.users.urls')),
     path('api/tasks/', include('apps.tasks.urls')),
+    path('api/notifications/', include('apps.notifications.urls')),
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
 ]
 
@@ -0,0 +1,78 @@
+"""Денормализованный счётчик непрочитанных уведомлений в кэше.
+
+Счётчик меняется инкрементально при создании и прочтении, а при промахе
+кэша пересчитывается одним запросом по частичному индексу непрочитанных.
+Уведомления, удалённые каскадом вместе с задачами, счётчик сбрасывают
+(invalidate).
+"""
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from apps.tasks.websocket_manager import websocket_manager
+from .models import Notification
+
+UNREAD_COUNT_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    key = _cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        # Значение кэшируется на час - считаем по основной базе, не по реплике
+        count = Notification.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id, is_read=False).count()
+        cache.set(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def _adjust(user_id, delta):
+    key = _cache_key(user_id)
+    try:
+        count = cache.incr(key, delta)
+    except ValueError:
+        # Ключа нет - пересчитываем из БД
+        return get_unread_count(user_id)
+    if count < 0:
+        cache.delete(key)
+        return get_unread_count(user_id)
+    return count
+
+
+def increment(user_id, amount=1):
+    return _adjust(user_id, amount)
+
+
+def decrement(user_id, amount=1):
+    return _adjust(user_id, -amount)
+
+
+def push_unread_count(user_id, count=None):
+    if count is None:
+        count = get_unread_count(user_id)
+    websocket_manager.send_notification(user_id, {'type': 'unread_count', 'count': count})
+
+
+def unread_user_ids(**filters):
+    """Пользователи, у которых есть непрочитанные уведомления по filters"""
+    return set(
+        Notification.objects.filter(is_read=False, **filters)
+        .order_by().values_list('user_id', flat=True).distinct()
+    )
+
+
+def invalidate(user_ids):
+    """Сбрасывает счётчики сразу и после коммита, затем рассылает пересчитанные"""
+    keys = {user_id: _cache_key(user_id) for user_id in set(user_ids)}
+    if not keys:
+        return
+    cache.delete_many(list(keys.values()))
+
+    def refresh():
+        cache.delete_many(list(keys.values()))
+        for user_id in keys:
+            push_unread_count(user_id)
+
+    transaction.on_commit(refresh)
@@ -0,0 +1,95 @@
+"""Превращение событий задач в уведомления и их доставка.
+
+Получатели и тексты собираются несколькими запросами на всю пачку задач,
+уведомления пишутся одним bulk_create, а доставка идёт через группы
+notifications_{user_id} и очередь бота согласно UserProfile.
+"""
+import logging
+from collections import defaultdict
+
+from apps.tasks.models import TaskList, Task, Comment
+from apps.tasks.websocket_manager import websocket_manager
+from . import counters, telegram
+from .models import Notification
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _list_members(task_list_ids):
+    members = defaultdict(set)
+    rows = TaskList.members.through.objects.filter(
+        tasklist_id__in=task_list_ids
+    ).values_list('tasklist_id', 'user_id')
+    for task_list_id, user_id in rows:
+        members[task_list_id].add(user_id)
+    return members
+
+
+def build_task_notifications(event, task_ids, actor_id=None):
+    tasks = Task.objects.filter(pk__in=task_ids).select_related('task_list')
+    notifications = []
+    for task in tasks:
+        if event == 'task_assigned':
+            recipients = {task.assigned_to_id}
+            title = 'Новая задача'
+            message = f'Вам назначена задача «{task.title}» в списке «{task.task_list.name}»'
+        elif event == 'task_completed':
+            recipients = {task.created_by_id, task.assigned_to_id}
+            title = 'Задача завершена'
+            message = f'Задача «{task.title}» в списке «{task.task_list.name}» завершена'
+        else:
+            raise ValueError(f'Unknown task event: {event}')
+        for user_id in recipients - {None, actor_id}:
+            notifications.append(Notification(
+                user_id=user_id, notification_type=event,
+                title=title, message=message, related_task=task,
+            ))
+    return notifications
+
+
+def build_comment_notifications(comment_id):
+    try:
+        comment = Comment.objects.select_related('task__task_list', 'author').get(pk=comment_id)
+    except Comment.DoesNotExist:
+        return []
+    task = comment.task
+    recipients = _list_members([task.task_list_id])[task.task_list_id] - {comment.author_id}
+    message = f'{comment.author.username} к задаче «{task.title}»: {comment.content[:200]}'
+    return [
+        Notification(
+            user_id=user_id, notification_type='comment_added',
+            title='Новый комментарий', message=message, related_task=task,
+        )
+        for user_id in recipients
+    ]
+
+
+def create_and_deliver(notifications):
+    """Сохраняет уведомления пачкой и доставляет их получателям"""
+    if not notifications:
+        return []
+    notifications = Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+    deliver(notifications)
+    return notifications
+
+
+def deliver(notifications):
+    per_user = defaultdict(int)
+    for notification in notifications:
+        per_user[notification.user_id] += 1
+    unread = {user_id: counters.increment(user_id, amount) for user_id, amount in per_user.items()}
+
+    for notification in notifications:
+        websocket_manager.send_notification(notification.user_id, {
+            'type': 'notification',
+            'notification': NotificationSerializer(notification).data,
+            'unread_count': unread[notification.user_id],
+        })
+
+    try:
+        telegram.push(telegram.notification_events(notifications))
+    except Exception as e:
+        logger.error(f"Error pushing notifications to Telegram queue: {e}")
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskreminder',
+            name='run_id',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -20,6 +20,35 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['user', 'is_read', '-created_at']),
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='notifications_unread_idx',
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.notification_type} for {self.user.username}"
\ No newline at end of file
+        return f"{self.notification_type} for {self.user.username}"
+
+class TaskReminder(models.Model):
+    """Отметка об отправленном напоминании о сроке (для дедупликации)"""
+    task = models.ForeignKey('tasks.Task', on_delete=models.CASCADE, related_name='reminders')
+    threshold_minutes = models.PositiveIntegerField()
+    due_date = models.DateTimeField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+    # Запуск рассылки, вставивший строку: уведомляет только он
+    run_id = models.UUIDField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task', 'threshold_minutes', 'due_date'],
+                name='notifications_reminder_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Reminder {self.threshold_minutes}m for task {self.task_id}"
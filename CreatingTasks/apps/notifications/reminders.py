@@ -0,0 +1,129 @@
+"""Напоминания о приближающемся сроке задач (task_due).
+
+Каждый запуск берёт только задачи, пересёкшие порог с прошлого запуска:
+due_date в (прошлый запуск + порог, сейчас + порог]. Запрос идёт по
+индексу (status, due_date) пачками по (due_date, id), поэтому стоимость
+пропорциональна числу задач в окне, а не размеру таблицы.
+"""
+import logging
+import uuid
+from datetime import timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.tasks.models import Task
+from . import fanout
+from .models import Notification, TaskReminder
+
+logger = logging.getLogger(__name__)
+
+LAST_RUN_CACHE_KEY = 'notifications:due_reminders:last_run'
+CHUNK_SIZE = 500
+
+
+def _open_statuses():
+    return [status for status, _ in Task.STATUS_CHOICES if status not in Task.CLOSED_STATUSES]
+
+
+def _user_timezone(user):
+    try:
+        return ZoneInfo(user.profile.timezone)
+    except (ZoneInfoNotFoundError, ValueError, AttributeError):
+        return dt_timezone.utc
+
+
+def _localize(moment, user):
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.get_default_timezone())
+    return moment.astimezone(_user_timezone(user))
+
+
+def _format_threshold(minutes):
+    if minutes % 1440 == 0:
+        return f'{minutes // 1440} дн.'
+    if minutes % 60 == 0:
+        return f'{minutes // 60} ч.'
+    return f'{minutes} мин.'
+
+
+def _iter_chunks(queryset):
+    """Keyset-обход по (due_date, id) без OFFSET"""
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(Q(due_date__gt=last[0]) | Q(due_date=last[0], id__gt=last[1]))
+        chunk = list(chunk.order_by('due_date', 'id')[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last = (chunk[-1].due_date, chunk[-1].pk)
+
+
+def _process_chunk(tasks, threshold, run_id):
+    already_sent = set(
+        TaskReminder.objects.filter(
+            task_id__in=[task.pk for task in tasks], threshold_minutes=threshold
+        ).values_list('task_id', 'due_date')
+    )
+    pending = [task for task in tasks if (task.pk, task.due_date) not in already_sent]
+    if not pending:
+        return 0
+    # Параллельный запуск мог вставить те же отметки: конфликтные строки
+    # пропускаются, и уведомления уходят только по строкам с нашим run_id
+    TaskReminder.objects.bulk_create([
+        TaskReminder(task=task, threshold_minutes=threshold, due_date=task.due_date, run_id=run_id)
+        for task in pending
+    ], batch_size=CHUNK_SIZE, ignore_conflicts=True)
+    claimed = set(
+        TaskReminder.objects.filter(
+            run_id=run_id, task_id__in=[task.pk for task in pending], threshold_minutes=threshold
+        ).values_list('task_id', flat=True)
+    )
+    notifications = []
+    for task in pending:
+        if task.pk not in claimed:
+            continue
+        recipient = task.assigned_to or task.created_by
+        local_due = _localize(task.due_date, recipient)
+        notifications.append(Notification(
+            user=recipient,
+            notification_type='task_due',
+            title='Истекает срок задачи',
+            message=(
+                f'Срок задачи «{task.title}» истекает через {_format_threshold(threshold)}: '
+                f'{local_due:%d.%m.%Y %H:%M} ({local_due.tzname()})'
+            ),
+            related_task=task,
+        ))
+    fanout.create_and_deliver(notifications)
+    return len(notifications)
+
+
+def send_due_reminders(now=None):
+    now = now or timezone.now()
+    run_id = uuid.uuid4()
+    last_run = cache.get(LAST_RUN_CACHE_KEY)
+    sent = 0
+    thresholds = sorted(settings.TASK_DUE_REMINDER_THRESHOLDS)
+    for index, threshold in enumerate(thresholds):
+        window = timedelta(minutes=threshold)
+        # Задачи внутри меньшего порога получат только его напоминание
+        lower = now + timedelta(minutes=thresholds[index - 1] if index else 0)
+        if last_run is not None:
+            lower = max(lower, last_run + window)
+        queryset = Task.objects.filter(
+            status__in=_open_statuses(),
+            due_date__gt=lower,
+            due_date__lte=now + window,
+            is_archived=False,
+        ).select_related('assigned_to__profile', 'created_by__profile')
+        for chunk in _iter_chunks(queryset):
+            sent += _process_chunk(chunk, threshold, run_id)
+    cache.set(LAST_RUN_CACHE_KEY, now, None)
+    logger.info(f"Due reminders sent: {sent}")
+    return sent
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Notification
+
+BATCH_SIZE = 1000
+
+
+def compact_read_notifications(days=None):
+    """Удаляет прочитанные уведомления старше days дней пачками,
+    чтобы не держать долгую блокировку на большой таблице"""
+    days = settings.NOTIFICATION_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(
+            Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+            .order_by().values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            return deleted
+        count, _ = Notification.objects.filter(id__in=ids).delete()
+        deleted += count
@@ -0,0 +1,12 @@
+from rest_framework import serializers
+from .models import Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = [
+            'id', 'notification_type', 'title', 'message',
+            'related_task', 'is_read', 'created_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,82 @@
+import logging
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.tasks.actors import current_actor_id
+from apps.tasks import archive
+from apps.tasks.models import Task, TaskList, Comment
+from apps.tasks.signals import tasks_bulk_changed
+from . import counters
+from .tasks import fan_out_task_event, fan_out_comment, push_task_cards
+
+logger = logging.getLogger(__name__)
+
+
+def _enqueue(task, *args):
+    """Постановка в Celery после коммита; недоступный брокер не ломает запрос"""
+    def send():
+        try:
+            task.delay(*args)
+        except Exception as e:
+            logger.error(f"Error enqueueing {task.name}: {e}")
+    transaction.on_commit(send)
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_state', {})
+    # Автор действия уведомлений о нём не получает
+    actor_id = current_actor_id()
+    if actor_id is None and created:
+        actor_id = instance.created_by_id
+    if instance.assigned_to_id and instance.assigned_to_id != previous.get('assigned_to_id'):
+        _enqueue(fan_out_task_event, 'task_assigned', [instance.pk], actor_id)
+    elif instance.assigned_to_id and not created:
+        _enqueue(push_task_cards, [instance.pk])
+    if not created and instance.status == 'completed' and previous.get('status') != 'completed':
+        _enqueue(fan_out_task_event, 'task_completed', [instance.pk], actor_id)
+
+
+@receiver(pre_delete, sender=Task)
+def task_deleting(sender, instance, origin=None, **kwargs):
+    """Непрочитанные уведомления о задаче удаляются каскадом мимо счётчиков.
+    Пользователи ищутся одним запросом на весь вызов delete(), а не на задачу;
+    архивация сбрасывает счётчики сама, пачкой"""
+    if archive.in_progress() or getattr(origin, '_unread_counters_reset', False):
+        return
+    if isinstance(origin, TaskList):
+        filters = {'related_task__task_list': origin}
+    elif isinstance(origin, QuerySet) and origin.model is TaskList:
+        filters = {'related_task__task_list__in': origin.values('pk')}
+    elif isinstance(origin, QuerySet) and origin.model is Task:
+        filters = {'related_task__in': origin.values('pk')}
+    else:
+        filters, origin = {'related_task': instance}, None
+    if origin is not None:
+        origin._unread_counters_reset = True
+    counters.invalidate(counters.unread_user_ids(**filters))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _enqueue(fan_out_comment, instance.pk)
+
+
+@receiver(tasks_bulk_changed)
+def tasks_bulk_changed_handler(sender, action=None, task_ids=(), actor_id=None,
+                               assigned_task_ids=(), completed_task_ids=(), **kwargs):
+    # Порядок задач в карточке не виден, новые задачи придут как назначения
+    if action not in ('created', 'reordered'):
+        updated_ids = set(task_ids) - set(assigned_task_ids)
+        if updated_ids:
+            _enqueue(push_task_cards, sorted(updated_ids))
+    if assigned_task_ids:
+        _enqueue(fan_out_task_event, 'task_assigned', list(assigned_task_ids), actor_id)
+    if completed_task_ids:
+        _enqueue(fan_out_task_event, 'task_completed', list(completed_task_ids), actor_id)
@@ -0,0 +1,37 @@
+import logging
+
+from celery import shared_task
+
+from . import fanout, reminders, retention, telegram
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def fan_out_task_event(event, task_ids, actor_id=None):
+    """Уведомления о назначении/завершении задач"""
+    fanout.create_and_deliver(fanout.build_task_notifications(event, task_ids, actor_id))
+
+
+@shared_task(ignore_result=True)
+def fan_out_comment(comment_id):
+    """Уведомления всем участникам списка о новом комментарии"""
+    fanout.create_and_deliver(fanout.build_comment_notifications(comment_id))
+
+
+@shared_task(ignore_result=True)
+def send_due_reminders():
+    """Периодическая задача Celery beat: напоминания о сроках"""
+    return reminders.send_due_reminders()
+
+
+@shared_task(ignore_result=True)
+def compact_notifications():
+    """Периодическая очистка старых прочитанных уведомлений"""
+    return retention.compact_read_notifications()
+
+
+@shared_task(ignore_result=True)
+def push_task_cards(task_ids):
+    """Обновление уже отправленных в Telegram карточек задач"""
+    telegram.push(telegram.task_card_events(task_ids))
@@ -0,0 +1,100 @@
+"""Очередь push-доставки в Telegram.
+
+Сервер не ходит в Bot API сам: события для пользователей с telegram_id
+складываются JSON-строками в Redis-список TELEGRAM_PUSH_QUEUE, а бот
+забирает их BLPOP и отправляет с учётом лимитов Telegram. Событие 'task'
+несёт карточку задачи: бот редактирует уже отправленную карточку на месте,
+а новое сообщение шлёт только при назначении (notify=True).
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from apps.tasks.models import Task
+from apps.tasks.serializers import TaskSerializer
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(settings.TELEGRAM_PUSH_URL)
+    return _client
+
+
+def push(events):
+    if not events:
+        return 0
+    get_client().rpush(
+        settings.TELEGRAM_PUSH_QUEUE,
+        *[json.dumps(event, ensure_ascii=False, default=str) for event in events]
+    )
+    return len(events)
+
+
+def telegram_chats(user_ids):
+    """{user_id: telegram_id} для пользователей с включёнными уведомлениями"""
+    return dict(
+        get_user_model().objects.filter(
+            pk__in=user_ids,
+            telegram_id__isnull=False,
+            profile__telegram_notifications=True,
+        ).values_list('pk', 'telegram_id')
+    )
+
+
+def _task_event(task, chat_id, notify, title=None):
+    return {
+        'type': 'task',
+        'chat_id': chat_id,
+        'notify': notify,
+        'title': title,
+        'task': TaskSerializer(task).data,
+    }
+
+
+def notification_events(notifications):
+    chats = telegram_chats({n.user_id for n in notifications})
+    assigned_ids = {
+        n.related_task_id for n in notifications
+        if n.notification_type == 'task_assigned' and n.user_id in chats
+    }
+    tasks = Task.objects.select_related('created_by', 'assigned_to').in_bulk(assigned_ids)
+
+    events = []
+    for notification in notifications:
+        chat_id = chats.get(notification.user_id)
+        if chat_id is None:
+            continue
+        task = tasks.get(notification.related_task_id)
+        if notification.notification_type == 'task_assigned' and task is not None:
+            # Карточка задачи вместо текста, чтобы дальше её можно было обновлять
+            events.append(_task_event(task, chat_id, notify=True, title=notification.title))
+        else:
+            events.append({
+                'type': 'notification',
+                'chat_id': chat_id,
+                'title': notification.title,
+                'message': notification.message,
+                'task_id': notification.related_task_id,
+            })
+    return events
+
+
+def task_card_events(task_ids):
+    """Обновления карточек у исполнителей; бот отбросит их, если карточки нет"""
+    tasks = list(
+        Task.objects.filter(pk__in=task_ids, assigned_to__isnull=False)
+        .select_related('created_by', 'assigned_to')
+    )
+    chats = telegram_chats({task.assigned_to_id for task in tasks})
+    return [
+        _task_event(task, chats[task.assigned_to_id], notify=False)
+        for task in tasks if task.assigned_to_id in chats
+    ]
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.notifications.models import Notification
+from apps.tasks.models import Task, TaskList
+from apps.users.models import User
+
+NOTIFICATIONS_URL = '/api/notifications/notifications/'
+
+
+class UnreadCounterTests(TestCase):
+    """Счётчик непрочитанного в кэше на пути fan-out -> unread_count -> mark_read"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user('author')
+        self.assignee = User.objects.create_user('assignee')
+        self.task_list = TaskList.objects.create(name='Список', created_by=self.author)
+        self.task_list.members.add(self.author, self.assignee)
+        self.author_client = self._client(self.author)
+        self.assignee_client = self._client(self.assignee)
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def unread_count(self):
+        response = self.assignee_client.get(f'{NOTIFICATIONS_URL}unread_count/')
+        self.assertEqual(response.status_code, 200)
+        count = response.json()['unread_count']
+        self.assertEqual(count, Notification.objects.filter(user=self.assignee, is_read=False).count())
+        return count
+
+    def assign_task(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.author_client.post('/api/tasks/tasks/', {
+                'title': title, 'task_list': self.task_list.pk, 'assigned_to': self.assignee.pk,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Task.objects.get(title=title)
+
+    def test_fan_out_then_mark_read(self):
+        # Счётчик уже в кэше: fan-out должен увеличить его, а не оставить 0
+        self.assertEqual(self.unread_count(), 0)
+        task = self.assign_task('Первая')
+        self.assign_task('Вторая')
+        self.assertEqual(self.unread_count(), 2)
+        self.assertFalse(Notification.objects.filter(user=self.author).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author_client.post('/api/tasks/comments/', {'task': task.pk, 'content': 'Посмотри'}, format='json')
+        self.assertEqual(self.unread_count(), 3)
+
+        first = Notification.objects.filter(user=self.assignee).order_by('id').first()
+        response = self.assignee_client.post(f'{NOTIFICATIONS_URL}mark_read/', {'ids': [first.pk]}, format='json')
+        self.assertEqual(response.json(), {'marked': 1, 'unread_count': 2})
+        # Повторное прочтение счётчик не меняет
+        response = self.assignee_client.post(f'{NOTIFICATIONS_URL}{first.pk}/read/')
+        self.assertEqual(response.json(), {'marked': 0, 'unread_count': 2})
+        self.assertEqual(self.unread_count(), 2)
+
+        response = self.assignee_client.post(f'{NOTIFICATIONS_URL}mark_all_read/')
+        self.assertEqual(response.json(), {'marked': 2, 'unread_count': 0})
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_task_delete_resets_counter(self):
+        task = self.assign_task('Первая')
+        self.assign_task('Вторая')
+        self.assertEqual(self.unread_count(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.author_client.delete(f'/api/tasks/tasks/{task.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.unread_count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author_client.delete(f'/api/tasks/lists/{self.task_list.pk}/')
+        self.assertEqual(self.unread_count(), 0)
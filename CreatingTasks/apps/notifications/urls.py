@@ -1,5 +1,10 @@
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import views
+
+router = DefaultRouter()
+router.register(r'notifications', views.NotificationViewSet, basename='notification')
 
 urlpatterns = [
-    # Пока оставим пустым, добавим позже
-]
\ No newline at end of file
+    path('', include(router.urls)),
+]
@@ -0,0 +1,61 @@
+from rest_framework import viewsets, serializers
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from CreatingTasks.database import ReplicaReadMixin
+from apps.tasks.pagination import CreatedAtCursorPagination
+from . import counters
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+class NotificationIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
+
+class NotificationViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    permission_classes = [IsAuthenticated]
+    serializer_class = NotificationSerializer
+    pagination_class = CreatedAtCursorPagination
+    queryset = Notification.objects.all()
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(user=self.request.user)
+        is_read = self.request.query_params.get('is_read')
+        if is_read in ('false', '0'):
+            # Частичный индекс notifications_unread_idx
+            queryset = queryset.filter(is_read=False)
+        elif is_read in ('true', '1'):
+            queryset = queryset.filter(is_read=True)
+        return queryset
+
+    def _marked(self, updated):
+        user_id = self.request.user.pk
+        count = counters.decrement(user_id, updated) if updated else counters.get_unread_count(user_id)
+        if updated:
+            counters.push_unread_count(user_id, count)
+        return Response({'marked': updated, 'unread_count': count})
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': counters.get_unread_count(request.user.pk)})
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        updated = Notification.objects.filter(user=request.user, pk=pk, is_read=False).update(is_read=True)
+        return self._marked(updated)
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        serializer = NotificationIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = Notification.objects.filter(
+            user=request.user, pk__in=serializer.validated_data['ids'], is_read=False
+        ).update(is_read=True)
+        return self._marked(updated)
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        # Один UPDATE по частичному индексу непрочитанных
+        updated = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        return self._marked(updated)
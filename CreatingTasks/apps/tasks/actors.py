@@ -0,0 +1,39 @@
+"""Пользователь, от имени которого идёт текущее изменение задач.
+
+Обработчики сигналов одиночных сохранений берут его отсюда, чтобы не
+уведомлять пользователя о его же действиях. Массовые операции передают
+actor_id в tasks_bulk_changed явно.
+"""
+import contextvars
+from contextlib import contextmanager
+
+_actor_id = contextvars.ContextVar('actor_id', default=None)
+
+
+def current_actor_id():
+    return _actor_id.get()
+
+
+@contextmanager
+def acting_as(user):
+    token = _actor_id.set(user.pk if user is not None and user.is_authenticated else None)
+    try:
+        yield
+    finally:
+        _actor_id.reset(token)
+
+
+class ActingUserMixin:
+    """Изменения внутри запроса вьюсета выполняются от имени request.user"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            self._actor_token = _actor_id.set(request.user.pk)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_actor_token', None)
+        if token is not None:
+            _actor_id.reset(token)
+            self._actor_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
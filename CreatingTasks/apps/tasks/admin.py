@@ -1,10 +1,17 @@
 # apps/tasks/admin.py
 from django.contrib import admin
 from .models import Task
+from .search import filter_tasks
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ['title', 'status', 'created_at']  # Только существующие поля
     list_filter = ['status', 'created_at']
     search_fields = ['title', 'description']
-    date_hierarchy = 'created_at'
\ No newline at end of file
+    date_hierarchy = 'created_at'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо icontains по title/description - полнотекстовый индекс
+        if not search_term.strip():
+            return queryset, False
+        return filter_tasks(queryset, search_term), False
\ No newline at end of file
@@ -0,0 +1,281 @@
+"""Аналитика по спискам задач и исполнителям.
+
+Счётчики хранятся в TaskListStats и UserTaskStats и меняются дельтами
+(UPDATE ... SET x = x + d) на переходах задач: сохранение, удаление и
+массовые операции. Полный пересчёт нужен только для отсутствующей строки
+(строится при первом чтении) и для команды rebuild_task_stats.
+
+Задачи, перенесённые в ArchivedTask, остаются в счётчиках как архивные,
+чтобы архивация не меняла долю и время выполнения.
+
+Просроченные задачи зависят от текущего времени, поэтому считаются при
+чтении одним запросом по индексу, а не хранятся.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DurationField, ExpressionWrapper, F, Min, Q, Sum, Value, When,
+)
+from django.utils import timezone
+
+from .models import ArchivedTask, Task, TaskListStats, UserTaskStats
+
+STATE_FIELDS = (
+    'task_list_id', 'status', 'assigned_to_id', 'is_archived', 'priority', 'created_at', 'completed_at',
+)
+COUNTER_FIELDS = (
+    'tasks_count', 'archived_count',
+    *(f'{status}_count' for status, _ in Task.STATUS_CHOICES),
+    *(f'{priority}_count' for priority, _ in Task.PRIORITY_CHOICES),
+    'completion_time_count',
+)
+ZERO = {**dict.fromkeys(COUNTER_FIELDS, 0), 'completion_time_total': timedelta(0)}
+REBUILD_CHUNK_SIZE = 500
+
+# (модель счётчиков, её ключ, поле задачи)
+LIST_STATS = (TaskListStats, 'task_list_id', 'task_list_id')
+USER_STATS = (UserTaskStats, 'user_id', 'assigned_to_id')
+
+
+def _contribution(state):
+    """Вклад одной задачи в счётчики"""
+    delta = {'tasks_count': 1, f"{state['status']}_count": 1, f"{state['priority']}_count": 1}
+    if state['is_archived']:
+        delta['archived_count'] = 1
+    if state['status'] == 'completed' and state['completed_at'] and state['created_at']:
+        delta['completion_time_count'] = 1
+        delta['completion_time_total'] = state['completed_at'] - state['created_at']
+    return delta
+
+
+def _is_complete(state):
+    return state is not None and all(field in state for field in STATE_FIELDS)
+
+
+class _Deltas:
+    """Накопитель дельт по спискам и пользователям; строки, для которых
+    прежнее состояние неизвестно, пересчитываются целиком"""
+
+    def __init__(self):
+        self.by_list = defaultdict(dict)
+        self.by_user = defaultdict(dict)
+        self.rebuild_lists = set()
+        self.rebuild_users = set()
+
+    def add(self, old, new):
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            delta = _contribution(state)
+            for bucket, key in ((self.by_list, state['task_list_id']), (self.by_user, state['assigned_to_id'])):
+                if key is None:
+                    continue
+                counters = bucket[key]
+                for field, value in delta.items():
+                    counters[field] = counters.get(field, ZERO[field]) + value * sign
+
+    def rebuild(self, *states):
+        for state in states:
+            if state is None:
+                continue
+            if state.get('task_list_id') is not None:
+                self.rebuild_lists.add(state['task_list_id'])
+            if state.get('assigned_to_id') is not None:
+                self.rebuild_users.add(state['assigned_to_id'])
+
+    def apply(self):
+        _apply(LIST_STATS, self.by_list, self.rebuild_lists)
+        _apply(USER_STATS, self.by_user, self.rebuild_users)
+        if self.rebuild_lists or self.rebuild_users:
+            rebuild(task_list_ids=self.rebuild_lists, user_ids=self.rebuild_users, existing_only=True)
+
+
+def _apply(stats, deltas, skip):
+    """Один UPDATE на таблицу: разные дельты разных строк - через CASE"""
+    model, key, _ = stats
+    deltas = {pk: delta for pk, delta in deltas.items() if pk not in skip}
+    fields = {field for delta in deltas.values() for field, value in delta.items() if value}
+    if not fields:
+        return
+    changes = {}
+    for field in fields:
+        output_field = model._meta.get_field(field)
+        whens = [
+            When(**{key: pk}, then=Value(delta[field], output_field=output_field))
+            for pk, delta in deltas.items() if delta.get(field)
+        ]
+        if len(deltas) == 1:
+            changes[field] = F(field) + whens[0].result
+        else:
+            changes[field] = F(field) + Case(
+                *whens, default=Value(ZERO[field], output_field=output_field),
+                output_field=output_field,
+            )
+    # Нет строки - нет обновления: она посчитается целиком при первом чтении
+    model.objects.filter(**{f'{key}__in': list(deltas)}).update(updated_at=timezone.now(), **changes)
+
+
+def _record(pairs):
+    deltas = _Deltas()
+    for old, new in pairs:
+        if (old is not None and not _is_complete(old)) or (new is not None and not _is_complete(new)):
+            deltas.rebuild(old, new)
+        else:
+            deltas.add(old, new)
+    deltas.apply()
+
+
+def record_transitions(pairs):
+    """pairs - [(old, new)]: состояния задачи (Task._tracked_state()) до и после;
+    None, если задачи не было (создание) или больше нет (удаление)"""
+    _record(pairs)
+
+
+def record_transition(old, new):
+    _record([(old, new)])
+
+
+def record_bulk(tasks):
+    """Массовая операция: прежнее состояние берётся из _loaded_state,
+    новое - из атрибутов уже изменённых объектов"""
+    pairs = []
+    for task in tasks:
+        pairs.append((getattr(task, '_loaded_state', None), task._tracked_state()))
+        task._loaded_state = task._tracked_state()
+    _record(pairs)
+
+
+def _aggregate(stats, ids):
+    """{ключ: значения счётчиков}: по GROUP BY на Task и на ArchivedTask"""
+    result = {}
+    for model, archived in ((Task, Q(is_archived=True)), (ArchivedTask, None)):
+        for key, values in _aggregate_model(model, archived, stats[2], ids).items():
+            if key in result:
+                values = {field: result[key][field] + value for field, value in values.items()}
+            result[key] = values
+    return result
+
+
+def _aggregate_model(model, archived, group_field, ids):
+    timed = Q(status='completed', completed_at__isnull=False)
+    counters = {
+        'tasks_count': Count('id'),
+        # В ArchivedTask архивные все задачи
+        'archived_count': Count('id', filter=archived),
+        'completion_time_count': Count('id', filter=timed),
+        'completion_time_total': Sum(
+            ExpressionWrapper(F('completed_at') - F('created_at'), output_field=DurationField()),
+            filter=timed,
+        ),
+    }
+    for status, _ in Task.STATUS_CHOICES:
+        counters[f'{status}_count'] = Count('id', filter=Q(status=status))
+    for priority, _ in Task.PRIORITY_CHOICES:
+        counters[f'{priority}_count'] = Count('id', filter=Q(priority=priority))
+    rows = (
+        model.objects.filter(**{f'{group_field}__in': ids})
+        .order_by()
+        .values(group_field)
+        .annotate(**counters)
+    )
+    result = {}
+    for row in rows:
+        key = row.pop(group_field)
+        row['completion_time_total'] = row['completion_time_total'] or timedelta(0)
+        result[key] = row
+    return result
+
+
+def _rebuild(stats, ids, existing_only=False):
+    model, key, _ = stats
+    ids = sorted(set(ids))
+    built = []
+    for start in range(0, len(ids), REBUILD_CHUNK_SIZE):
+        chunk = ids[start:start + REBUILD_CHUNK_SIZE]
+        if existing_only:
+            chunk = list(model.objects.filter(**{f'{key}__in': chunk}).values_list(key, flat=True))
+            if not chunk:
+                continue
+        values = _aggregate(stats, chunk)
+        objects = [model(**{key: pk}, **values.get(pk, {})) for pk in chunk]
+        with transaction.atomic():
+            model.objects.filter(**{f'{key}__in': chunk}).delete()
+            # Параллельный пересчёт той же строки при первом чтении - не ошибка
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+        built.extend(objects)
+    return built
+
+
+def rebuild(task_list_ids=(), user_ids=(), existing_only=False):
+    """Пересчитывает строки счётчиков заданных списков и пользователей с нуля.
+
+    existing_only - только уже созданные строки: так делают обработчики
+    сигналов, чтобы не вставить строку для удаляемого в том же каскаде
+    списка или пользователя; недостающие строки строятся при чтении.
+    """
+    return (
+        _rebuild(LIST_STATS, task_list_ids, existing_only),
+        _rebuild(USER_STATS, user_ids, existing_only),
+    )
+
+
+def list_assignee_ids(task_list_id):
+    """Исполнители задач списка (и его архива) - их счётчики пересчитываются
+    после удаления списка"""
+    return list(
+        Task.objects.filter(task_list_id=task_list_id, assigned_to__isnull=False)
+        .order_by().values_list('assigned_to_id', flat=True)
+        .union(
+            ArchivedTask.objects.filter(task_list_id=task_list_id, assigned_to__isnull=False)
+            .order_by().values_list('assigned_to_id', flat=True)
+        )
+    )
+
+
+def _get_stats(stats, pk):
+    model, key, _ = stats
+    row = model.objects.filter(**{key: pk}).first()
+    if row is None:
+        row, = _rebuild(stats, [pk])
+    return row
+
+
+def _overdue(**filters):
+    return (
+        Task.objects.filter(is_archived=False, due_date__lt=timezone.now(), **filters)
+        .exclude(status__in=Task.CLOSED_STATUSES)
+        .aggregate(count=Count('id'), oldest_due_date=Min('due_date'))
+    )
+
+
+def _summary(row, overdue):
+    by_status = {status: getattr(row, f'{status}_count') for status, _ in Task.STATUS_CHOICES}
+    # Отменённые задачи не считаются ни сделанными, ни несделанными
+    countable = row.tasks_count - row.cancelled_count
+    average = None
+    if row.completion_time_count:
+        average = row.completion_time_total.total_seconds() / row.completion_time_count
+    return {
+        'total': row.tasks_count,
+        'archived': row.archived_count,
+        'by_status': by_status,
+        'by_priority': {
+            priority: getattr(row, f'{priority}_count') for priority, _ in Task.PRIORITY_CHOICES
+        },
+        'completion_rate': round(row.completed_count / countable, 4) if countable > 0 else None,
+        'avg_completion_seconds': round(average, 1) if average is not None else None,
+        'overdue': overdue,
+        'updated_at': row.updated_at,
+    }
+
+
+def task_list_analytics(task_list_id):
+    data = _summary(_get_stats(LIST_STATS, task_list_id), _overdue(task_list_id=task_list_id))
+    return {'task_list': task_list_id, **data}
+
+
+def user_analytics(user_id):
+    data = _summary(_get_stats(USER_STATS, user_id), _overdue(assigned_to_id=user_id))
+    return {'user': user_id, **data}
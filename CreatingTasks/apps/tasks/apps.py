@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class TasksConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.tasks'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from CreatingTasks.database import configure_sqlite
+        from . import signals  # noqa: F401
+
+        connection_created.connect(configure_sqlite, dispatch_uid='configure_sqlite')
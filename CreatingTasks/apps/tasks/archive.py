@@ -0,0 +1,124 @@
+"""Перенос старых закрытых задач из Task в ArchivedTask.
+
+Завершённые задачи (по completed_at) и архивные (по updated_at) старше
+TASK_ARCHIVE_AFTER_DAYS переносятся пачками: строка ArchivedTask с
+комментариями в JSON, затем удаление из Task (каскадом уходят комментарии,
+поисковые записи, напоминания и уведомления). Рабочая таблица и её индексы
+остаются размером с живые задачи.
+
+Журнал изменений, кэш ответов, счётчики аналитики и непрочитанных
+уведомлений обновляются одним вызовом на пачку, а не обработчиками post_delete на каждую задачу.
+"""
+import contextvars
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.notifications import counters
+from . import analytics, changelog
+from .caching import invalidate_lists
+from .models import ArchivedTask, Comment, Task
+from .websocket_manager import websocket_manager
+
+BATCH_SIZE = 500
+
+_archiving = contextvars.ContextVar('archiving', default=False)
+
+
+def in_progress():
+    """Идёт удаление перенесённых задач - обработчики сигналов его пропускают"""
+    return _archiving.get()
+
+
+def eligible_tasks(days=None):
+    days = settings.TASK_ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    # Индексы (status, completed_at) и (is_archived, status)
+    return Task.objects.filter(
+        Q(status='completed', completed_at__lt=cutoff) | Q(is_archived=True, updated_at__lt=cutoff)
+    )
+
+
+def _comments_by_task(task_ids):
+    comments = defaultdict(list)
+    rows = (
+        Comment.objects.filter(task_id__in=task_ids)
+        .order_by('created_at', 'id')
+        .values('id', 'task_id', 'author_id', 'author__username', 'content', 'created_at', 'updated_at')
+    )
+    for row in rows:
+        comments[row.pop('task_id')].append({
+            'id': row['id'],
+            'author_id': row['author_id'],
+            'author_username': row['author__username'],
+            'content': row['content'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        })
+    return comments
+
+
+def _archived(task, comments):
+    return ArchivedTask(
+        id=task.pk, task_list_id=task.task_list_id, title=task.title, description=task.description,
+        created_by_id=task.created_by_id, assigned_to_id=task.assigned_to_id,
+        status=task.status, priority=task.priority, due_date=task.due_date,
+        completed_at=task.completed_at, created_at=task.created_at, updated_at=task.updated_at,
+        comments=comments.get(task.pk, []),
+    )
+
+
+def archive_batch(task_ids):
+    """Переносит задачи task_ids в архив; возвращает число перенесённых"""
+    with transaction.atomic():
+        tasks = list(Task.objects.filter(id__in=task_ids).select_for_update())
+        if not tasks:
+            return 0
+        ids = [task.pk for task in tasks]
+        comments = _comments_by_task(ids)
+        ArchivedTask.objects.bulk_create([_archived(task, comments) for task in tasks])
+        # Уведомления о задачах удаляются каскадом, в том числе непрочитанные
+        unread_user_ids = counters.unread_user_ids(related_task_id__in=ids)
+
+        token = _archiving.set(True)
+        try:
+            Task.objects.filter(id__in=ids).delete()
+        finally:
+            _archiving.reset(token)
+
+        # Для аналитики задача не исчезает, а становится архивной
+        analytics.record_transitions([
+            (task._tracked_state(), {**task._tracked_state(), 'is_archived': True}) for task in tasks
+        ])
+        removed_from = defaultdict(list)
+        for task in tasks:
+            removed_from[task.task_list_id].append(task.pk)
+        versions = changelog.record_bulk('deleted', [], removed_from)
+        invalidate_lists(removed_from)
+        counters.invalidate(unread_user_ids)
+
+        def send():
+            for task_list_id, removed_ids in removed_from.items():
+                websocket_manager.broadcast_bulk_update(
+                    task_list_id, 'archived', removed_ids, versions.get(task_list_id)
+                )
+
+        transaction.on_commit(send)
+    return len(tasks)
+
+
+def archive_old_tasks(days=None, batch_size=BATCH_SIZE, limit=None):
+    """Переносит подходящие задачи пачками по batch_size, каждая в своей транзакции.
+    limit ограничивает число задач за один запуск"""
+    archived = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        ids = list(eligible_tasks(days).order_by('id').values_list('id', flat=True)[:size])
+        if not ids:
+            break
+        archived += archive_batch(ids)
+    return archived
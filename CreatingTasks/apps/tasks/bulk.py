@@ -0,0 +1,231 @@
+"""Массовые операции над задачами: одна транзакция, одна запись на пачку
+и одно WebSocket-событие на каждый затронутый список. Здесь же пакетное
+создание списков задач."""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from . import analytics, changelog, search
+from .membership import get_user_list_ids, invalidate_membership
+from .models import TaskList, Task
+from .slugs import bulk_create_with_unique_slugs
+from .signals import tasks_bulk_changed
+from .websocket_manager import websocket_manager
+
+MAX_BULK_SIZE = 1000
+
+
+def _check_lists(user, task_list_ids):
+    foreign = set(task_list_ids) - get_user_list_ids(user.pk)
+    if foreign:
+        raise PermissionDenied(
+            f"Нет доступа к спискам: {', '.join(str(pk) for pk in sorted(foreign))}"
+        )
+
+
+def _check_assignees(items):
+    assignee_ids = {item['assigned_to'] for item in items if item.get('assigned_to')}
+    if not assignee_ids:
+        return
+    existing = set(
+        get_user_model().objects.filter(id__in=assignee_ids).values_list('id', flat=True)
+    )
+    missing = assignee_ids - existing
+    if missing:
+        raise ValidationError(
+            {'assigned_to': f"Пользователи не найдены: {', '.join(str(pk) for pk in sorted(missing))}"}
+        )
+
+
+def _load_tasks(user, task_ids):
+    """Загружает задачи одним запросом; чужие и несуществующие id - ошибка"""
+    task_ids = set(task_ids)
+    tasks = list(
+        Task.objects.filter(id__in=task_ids, task_list_id__in=get_user_list_ids(user.pk))
+    )
+    missing = task_ids - {task.pk for task in tasks}
+    if missing:
+        raise ValidationError(
+            {'ids': f"Задачи не найдены: {', '.join(str(pk) for pk in sorted(missing))}"}
+        )
+    return tasks
+
+
+def _group_by_list(tasks):
+    by_list = defaultdict(list)
+    for task in tasks:
+        by_list[task.task_list_id].append(task.pk)
+    return by_list
+
+
+def _notify(action, tasks, by_list=None, removed_from=None, **extra):
+    """Журналирует пачку и после коммита шлёт одно событие на каждый список.
+    extra (actor_id, assigned_task_ids, completed_task_ids) уходит в сигнал"""
+    if by_list is None:
+        by_list = _group_by_list(tasks)
+    task_ids = [task.pk for task in tasks]
+    # search сравнивает текст с _loaded_state, а analytics его обновляет - порядок важен
+    search.index_tasks(tasks)
+    analytics.record_bulk(tasks)
+    versions = changelog.record_bulk(
+        'created' if action == 'created' else 'updated', tasks, removed_from
+    )
+
+    def send():
+        for task_list_id, ids in by_list.items():
+            websocket_manager.broadcast_bulk_update(
+                task_list_id, action, ids, versions.get(task_list_id)
+            )
+        tasks_bulk_changed.send(
+            sender=Task, action=action, task_ids=task_ids, task_list_ids=list(by_list), **extra
+        )
+
+    transaction.on_commit(send)
+
+
+def bulk_create_tasks(user, items):
+    _check_lists(user, {item['task_list'] for item in items})
+    _check_assignees(items)
+    tasks = [
+        Task(
+            title=item['title'],
+            description=item.get('description', ''),
+            task_list_id=item['task_list'],
+            created_by=user,
+            assigned_to_id=item.get('assigned_to'),
+            status=item.get('status', 'pending'),
+            priority=item.get('priority', 'medium'),
+            due_date=item.get('due_date'),
+        )
+        for item in items
+    ]
+    with transaction.atomic():
+        tasks = Task.objects.bulk_create(tasks)
+        _notify(
+            'created', tasks, actor_id=user.pk,
+            assigned_task_ids=[task.pk for task in tasks if task.assigned_to_id],
+        )
+    return tasks
+
+
+def bulk_update_tasks(user, items):
+    changes = {item['id']: item for item in items}
+    tasks = _load_tasks(user, changes)
+    _check_assignees(items)
+    now = timezone.now()
+    fields = {'updated_at'}
+    assigned_task_ids, completed_task_ids = [], []
+    for task in tasks:
+        item = changes[task.pk]
+        if item.get('assigned_to') and item['assigned_to'] != task.assigned_to_id:
+            assigned_task_ids.append(task.pk)
+        if item.get('status') == 'completed' and task.status != 'completed':
+            completed_task_ids.append(task.pk)
+        for field, value in item.items():
+            if field == 'id':
+                continue
+            if field == 'assigned_to':
+                task.assigned_to_id = value
+            else:
+                setattr(task, field, value)
+            fields.add(field)
+        if item.get('status') == 'completed' and task.completed_at is None:
+            task.completed_at = now
+            fields.add('completed_at')
+        task.updated_at = now
+    with transaction.atomic():
+        Task.objects.bulk_update(tasks, sorted(fields), batch_size=500)
+        _notify(
+            'updated', tasks, actor_id=user.pk,
+            assigned_task_ids=assigned_task_ids, completed_task_ids=completed_task_ids,
+        )
+    return tasks
+
+
+def bulk_complete_tasks(user, task_ids):
+    tasks = _load_tasks(user, task_ids)
+    now = timezone.now()
+    completed_task_ids = [task.pk for task in tasks if task.status != 'completed']
+    with transaction.atomic():
+        # Уже завершённые задачи не трогаем, чтобы не сбить completed_at
+        Task.objects.filter(id__in=completed_task_ids).update(
+            status='completed', completed_at=now, updated_at=now
+        )
+        for task in tasks:
+            if task.status != 'completed':
+                task.status, task.completed_at, task.updated_at = 'completed', now, now
+        _notify('completed', tasks, actor_id=user.pk, completed_task_ids=completed_task_ids)
+    return tasks
+
+
+def bulk_move_tasks(user, task_ids, task_list_id):
+    _check_lists(user, {task_list_id})
+    tasks = _load_tasks(user, task_ids)
+    # Исходные списки тоже получают событие, чтобы убрать карточки у себя
+    removed_from = {
+        source_id: ids for source_id, ids in _group_by_list(tasks).items()
+        if source_id != task_list_id
+    }
+    by_list = dict(removed_from)
+    by_list[task_list_id] = [task.pk for task in tasks]
+    with transaction.atomic():
+        Task.objects.filter(id__in=[task.pk for task in tasks]).update(
+            task_list_id=task_list_id, updated_at=timezone.now()
+        )
+        for task in tasks:
+            task.task_list_id = task_list_id
+        _notify('moved', tasks, by_list, removed_from, actor_id=user.pk)
+    return tasks
+
+
+def bulk_archive_tasks(user, task_ids, archived=True):
+    tasks = _load_tasks(user, task_ids)
+    with transaction.atomic():
+        Task.objects.filter(id__in=[task.pk for task in tasks]).update(
+            is_archived=archived, updated_at=timezone.now()
+        )
+        for task in tasks:
+            task.is_archived = archived
+        _notify('archived' if archived else 'unarchived', tasks, actor_id=user.pk)
+    return tasks
+
+
+def reorder_tasks(user, task_list_id, task_ids):
+    """Расставляет задачи списка в порядке task_ids"""
+    tasks = _load_tasks(user, task_ids)
+    if any(task.task_list_id != task_list_id for task in tasks):
+        raise ValidationError({'task_ids': 'Все задачи должны быть из одного списка'})
+    positions = {task_id: position for position, task_id in enumerate(task_ids)}
+    now = timezone.now()
+    for task in tasks:
+        task.position = positions[task.pk]
+        task.updated_at = now
+    with transaction.atomic():
+        Task.objects.bulk_update(tasks, ['position', 'updated_at'], batch_size=500)
+        _notify('reordered', tasks, actor_id=user.pk)
+    return sorted(tasks, key=lambda task: task.position)
+
+
+def bulk_create_task_lists(user, items):
+    """Импорт списков пачкой: slug выделяются на всю пачку сразу, автор - участник"""
+    task_lists = [
+        TaskList(
+            name=item['name'],
+            description=item.get('description', ''),
+            color=item.get('color', '#3498db'),
+            created_by=user,
+        )
+        for item in items
+    ]
+    with transaction.atomic():
+        task_lists = bulk_create_with_unique_slugs(TaskList, task_lists)
+        Membership = TaskList.members.through
+        Membership.objects.bulk_create([
+            Membership(tasklist_id=task_list.pk, user_id=user.pk) for task_list in task_lists
+        ])
+        # bulk_create не шлёт m2m_changed
+        invalidate_membership([user.pk])
+    return task_lists
@@ -0,0 +1,105 @@
+"""Кэш ответов GET для списков и задач.
+
+У каждого списка в кэше есть токен версии; сигналы Task, Comment и
+TaskList заменяют его новым, и все ответы, собранные из этого списка,
+перестают находиться. Ключ ответа - адрес запроса, пользователь и токены
+всех списков, из которых он собран, поэтому явно удалять ответы не нужно.
+Хэш того же ключа служит ETag: совпавший If-None-Match получает 304 без
+обращения к кэшу ответов и сериализации.
+
+Поля, зависящие от текущего времени (is_overdue, overdue_count), меняются
+без сигналов, поэтому в ключ входит и номер интервала длиной
+TASK_RESPONSE_CACHE_TIMEOUT: ответ и ETag устаревают не позже, чем через
+этот интервал.
+
+Ответ для кэша всегда собирается с основной базы: собранный с отстающей
+реплики под новым токеном отдавался бы (и подтверждался 304) весь срок
+кэша, даже когда реплика уже догнала.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from CreatingTasks.database import use_replica
+
+VERSION_TIMEOUT = 24 * 60 * 60
+
+
+def _version_key(task_list_id):
+    return f'tasks:response_version:{task_list_id}'
+
+
+def get_list_versions(task_list_ids):
+    """{list_id: токен}; недостающие токены создаются заново"""
+    keys = {_version_key(task_list_id): task_list_id for task_list_id in task_list_ids}
+    found = cache.get_many(keys)
+    versions = {keys[key]: token for key, token in found.items()}
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        for key, token in missing.items():
+            # add не затрёт токен, который успел записать параллельный запрос
+            if not cache.add(key, token, VERSION_TIMEOUT):
+                token = cache.get(key, token)
+            versions[keys[key]] = token
+    return versions
+
+
+def invalidate_lists(task_list_ids):
+    """Меняет токены сразу и ещё раз после коммита, чтобы параллельный
+    запрос не закэшировал данные до коммита"""
+    task_list_ids = {task_list_id for task_list_id in task_list_ids if task_list_id is not None}
+    if not task_list_ids:
+        return
+
+    def bump():
+        cache.set_many(
+            {_version_key(task_list_id): uuid.uuid4().hex for task_list_id in task_list_ids},
+            VERSION_TIMEOUT
+        )
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = {value.strip() for value in header.split(',')}
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+class CachedResponseMixin:
+    """Кэширование GET-ответов вьюсета по версиям списков"""
+
+    def cached_response(self, task_list_ids, build):
+        """build() возвращает данные ответа; вызывается только при промахе,
+        с чтением с основной базы"""
+        request = self.request
+        versions = get_list_versions(task_list_ids)
+        parts = [
+            self.basename, self.action, request.build_absolute_uri(),
+            str(request.user.pk),
+            str(int(time.time() // max(settings.TASK_RESPONSE_CACHE_TIMEOUT, 1))),
+            ','.join(f'{list_id}:{versions[list_id]}' for list_id in sorted(versions)),
+        ]
+        digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+        etag = f'"{digest}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = f'tasks:response:{digest}'
+        data = cache.get(key)
+        if data is None:
+            with use_replica(False):
+                data = build()
+            cache.set(key, data, settings.TASK_RESPONSE_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
@@ -0,0 +1,139 @@
+"""Журнал изменений задач по спискам.
+
+Каждое изменение задачи получает следующую версию своего списка
+(TaskList.version) и строку TaskChange. Клиент, переподключаясь с
+since=<версия>, получает только пропущенные изменения; снимок списка
+отдаётся, только если нужная часть журнала уже удалена.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import TaskList, Task, TaskChange
+from .serializers import TaskSerializer
+from .websocket_manager import websocket_manager
+
+MAX_REPLAY = getattr(settings, 'TASK_CHANGELOG_MAX_REPLAY', 1000)
+
+
+def _event(change):
+    if change.action == 'deleted':
+        return {'type': 'task_deleted', 'task_id': change.task_id, 'version': change.version}
+    return {'type': f'task_{change.action}', 'task': change.payload, 'version': change.version}
+
+
+def _broadcast_on_commit(changes):
+    def send():
+        for change in changes:
+            websocket_manager.send_task_update(change.task_list_id, _event(change))
+    transaction.on_commit(send)
+
+
+def record_change(task, action):
+    """Запись изменения уже сохранённой задачи (версия выдана в Task.save)"""
+    change = TaskChange.objects.create(
+        task_list_id=task.task_list_id,
+        version=task.version,
+        task_id=task.pk,
+        action=action,
+        payload=TaskSerializer(task).data,
+    )
+    _broadcast_on_commit([change])
+    return change
+
+
+def record_removal(task_list_id, task_id):
+    """Задача удалена из списка или перенесена в другой"""
+    version = TaskList.allocate_versions(task_list_id)
+    if version is None:
+        return None
+    change = TaskChange.objects.create(
+        task_list_id=task_list_id, version=version, task_id=task_id, action='deleted'
+    )
+    _broadcast_on_commit([change])
+    return change
+
+
+def record_bulk(action, tasks, removed_from=None):
+    """Журналирует массовую операцию без рассылки по задачам.
+
+    removed_from - {id списка: [id задач]}, откуда задачи ушли при переносе.
+    Возвращает {id списка: последняя версия} для агрегированного события.
+    """
+    by_list = defaultdict(list)
+    for task in tasks:
+        by_list[task.task_list_id].append(task.pk)
+
+    versions = {}
+    changes = []
+    with transaction.atomic():
+        fresh = {
+            task.pk: task
+            for task in Task.objects.filter(pk__in=[task.pk for task in tasks])
+            .select_related('created_by', 'assigned_to')
+        }
+        for task_list_id, task_ids in by_list.items():
+            last = TaskList.allocate_versions(task_list_id, len(task_ids))
+            version = last - len(task_ids)
+            for task_id in task_ids:
+                version += 1
+                fresh[task_id].version = version
+                changes.append(TaskChange(
+                    task_list_id=task_list_id, version=version, task_id=task_id,
+                    action=action, payload=TaskSerializer(fresh[task_id]).data,
+                ))
+            versions[task_list_id] = last
+        for task_list_id, task_ids in (removed_from or {}).items():
+            last = TaskList.allocate_versions(task_list_id, len(task_ids))
+            version = last - len(task_ids)
+            for task_id in task_ids:
+                version += 1
+                changes.append(TaskChange(
+                    task_list_id=task_list_id, version=version, task_id=task_id, action='deleted'
+                ))
+            versions[task_list_id] = last
+        Task.objects.bulk_update(fresh.values(), ['version'], batch_size=500)
+        TaskChange.objects.bulk_create(changes, batch_size=500)
+    return versions
+
+
+def changes_since(task_list_id, since):
+    """Сообщение синхронизации: дельты после since или снимок списка"""
+    current = TaskList.objects.filter(pk=task_list_id).values_list('version', flat=True).first()
+    if current is None:
+        return None
+    if since is not None and since >= current:
+        return {'type': 'sync', 'mode': 'delta', 'version': current, 'changes': []}
+
+    if since is not None and current - since <= MAX_REPLAY:
+        changes = list(TaskChange.objects.filter(task_list_id=task_list_id, version__gt=since))
+        # Журнал непрерывен, только если сохранилась версия since + 1
+        if changes and changes[0].version == since + 1:
+            return {
+                'type': 'sync',
+                'mode': 'delta',
+                'version': changes[-1].version,
+                'changes': [_event(change) for change in changes],
+            }
+
+    tasks = Task.objects.filter(
+        task_list_id=task_list_id, is_archived=False
+    ).select_related('created_by', 'assigned_to')
+    return {
+        'type': 'sync',
+        'mode': 'snapshot',
+        'version': current,
+        'tasks': TaskSerializer(tasks, many=True).data,
+    }
+
+
+def trim(keep):
+    """Оставляет в журнале не больше keep последних версий каждого списка"""
+    deleted = 0
+    for task_list_id, version in TaskList.objects.filter(version__gt=keep).values_list('id', 'version'):
+        count, _ = TaskChange.objects.filter(
+            task_list_id=task_list_id, version__lte=version - keep
+        ).delete()
+        deleted += count
+    return deleted
@@ -0,0 +1,97 @@
+"""Денормализованные счётчики комментариев задачи и рассылка комментариев.
+
+Task.comments_count и Task.last_activity_at (время последнего созданного
+или изменённого комментария) меняются одним UPDATE из обработчиков
+сигналов Comment, без Task.save: версия задачи и журнал изменений не
+трогаются. Клиенты узнают новые значения из событий comment_* в группе
+списка. API задачу комментария не меняет, но перенос (из админки)
+учитывается как удаление из старой задачи и создание в новой.
+recount() пересчитывает их с нуля.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+from .models import Comment, Task
+from .serializers import CommentSerializer
+from .websocket_manager import websocket_manager
+
+RECOUNT_BATCH_SIZE = 1000
+
+_to_datetime = serializers.DateTimeField().to_representation
+
+
+def _last_activity():
+    return Subquery(
+        Comment.objects.filter(task_id=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1]
+    )
+
+
+def _broadcast(task_id, event):
+    """Событие в группу списка после коммита, с текущими счётчиками задачи;
+    возвращает id списка"""
+    row = Task.objects.filter(pk=task_id).values(
+        'task_list_id', 'comments_count', 'last_activity_at'
+    ).first()
+    if row is None:
+        return None
+    event = {
+        **event,
+        'task_id': task_id,
+        'comments_count': row['comments_count'],
+        'last_activity_at': _to_datetime(row['last_activity_at']) if row['last_activity_at'] else None,
+    }
+    transaction.on_commit(lambda: websocket_manager.broadcast_comment(row['task_list_id'], event))
+    return row['task_list_id']
+
+
+def _removed(task_id, comment_id):
+    # Время активности - по оставшимся комментариям
+    Task.objects.filter(pk=task_id).update(
+        comments_count=F('comments_count') - 1, last_activity_at=_last_activity()
+    )
+    return _broadcast(task_id, {'type': 'comment_deleted', 'comment_id': comment_id})
+
+
+def comment_saved(comment, created):
+    """Возвращает id затронутых списков"""
+    list_ids = set()
+    previous_task_id = getattr(comment, '_loaded_task_id', None)
+    comment._loaded_task_id = comment.task_id
+    if not created and previous_task_id not in (None, comment.task_id):
+        list_ids.add(_removed(previous_task_id, comment.pk))
+        created = True
+    changes = {'last_activity_at': comment.updated_at}
+    if created:
+        changes['comments_count'] = F('comments_count') + 1
+    Task.objects.filter(pk=comment.task_id).update(**changes)
+    list_ids.add(_broadcast(comment.task_id, {
+        'type': 'comment_created' if created else 'comment_updated',
+        'comment_id': comment.pk,
+        'comment': CommentSerializer(comment).data,
+    }))
+    return list_ids - {None}
+
+
+def comment_deleted(comment):
+    """Возвращает id затронутых списков"""
+    return {_removed(comment.task_id, comment.pk)} - {None}
+
+
+def recount(task_ids=None, batch_size=RECOUNT_BATCH_SIZE):
+    """Пересчитывает счётчики задач task_ids (или всех) пачками; возвращает число задач"""
+    counts = Subquery(
+        Comment.objects.filter(task_id=OuterRef('pk'))
+        .order_by().values('task_id').annotate(total=Count('id')).values('total'),
+        output_field=IntegerField(),
+    )
+    if task_ids is None:
+        task_ids = Task.objects.order_by('pk').values_list('pk', flat=True)
+    task_ids = list(task_ids)
+    updated = 0
+    for start in range(0, len(task_ids), batch_size):
+        updated += Task.objects.filter(pk__in=task_ids[start:start + batch_size]).update(
+            comments_count=Coalesce(counts, Value(0)), last_activity_at=_last_activity()
+        )
+    return updated
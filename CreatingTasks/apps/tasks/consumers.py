@@ -1,8 +1,18 @@
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from .models import TaskList, Task
+from apps.notifications import counters
+from . import changelog, ws_commands
+from .membership import is_member
+
+
+def _parse_version(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
 
 
 class TaskConsumer(AsyncWebsocketConsumer):
@@ -17,6 +27,10 @@ class TaskConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             await self.accept()
+            # ws/tasks/<id>/?since=<версия> - догнать пропущенные изменения
+            query = parse_qs(self.scope.get('query_string', b'').decode())
+            if 'since' in query:
+                await self.send_sync(_parse_version(query['since'][0]))
         else:
             await self.close()
 
@@ -27,32 +41,56 @@ class TaskConsumer(AsyncWebsocketConsumer):
         )
 
     async def receive(self, text_data):
-        data = json.loads(text_data)
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            await self.send(text_data=json.dumps({'type': 'error', 'errors': {'detail': 'Неверный JSON'}}))
+            return
         message_type = data.get('type')
 
-        if message_type == 'task_updated':
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'task_update',
-                    'data': data
-                }
-            )
+        if message_type == 'sync':
+            await self.send_sync(_parse_version(data.get('since')))
+
+        elif message_type in ws_commands.COMMANDS:
+            # Изменение сохраняется на сервере, остальным клиентам его
+            # разошлёт журнал изменений уже с новой версией
+            request_id = data.get('request_id')
+            try:
+                result = await self.execute_command(data)
+            except ws_commands.CommandError as e:
+                await self.send(text_data=json.dumps({
+                    'type': 'error', 'request_id': request_id, 'errors': e.errors
+                }))
+            else:
+                await self.send(text_data=json.dumps(
+                    {'type': 'ack', 'request_id': request_id, **result}
+                ))
 
     async def task_update(self, event):
         await self.send(text_data=json.dumps(event['data']))
 
+    async def send_sync(self, since):
+        message = await self.get_changes_since(since)
+        if message is not None:
+            await self.send(text_data=json.dumps(message))
+
+    @database_sync_to_async
+    def execute_command(self, data):
+        return ws_commands.execute(self.scope['user'], self.task_list_id, data)
+
+    @database_sync_to_async
+    def get_changes_since(self, since):
+        return changelog.changes_since(self.task_list_id, since)
+
     @database_sync_to_async
     def has_access(self):
         user = self.scope['user']
         if isinstance(user, AnonymousUser):
             return False
 
-        try:
-            task_list = TaskList.objects.get(id=self.task_list_id)
-            return user in task_list.members.all() or user == task_list.created_by
-        except TaskList.DoesNotExist:
-            return False
+        return is_member(user.pk, self.task_list_id)
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -71,6 +109,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         await self.accept()
+        await self.send(text_data=json.dumps({
+            'type': 'unread_count',
+            'count': await self.get_unread_count()
+        }))
+
+    @database_sync_to_async
+    def get_unread_count(self):
+        return counters.get_unread_count(self.user_id)
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(
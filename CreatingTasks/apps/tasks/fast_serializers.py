@@ -0,0 +1,64 @@
+"""Быстрое чтение задач для больших выборок.
+
+Строки берутся через .values() одним запросом с JOIN пользователей и
+превращаются в словари без ModelSerializer. Результат совпадает с
+TaskSerializer поле в поле: тот же порядок ключей, тот же формат дат,
+assigned_to_username отсутствует у задач без исполнителя.
+"""
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Task
+
+TASK_VALUES = (
+    'id', 'title', 'description', 'task_list_id', 'status', 'priority',
+    'due_date', 'completed_at', 'created_at', 'updated_at', 'assigned_to_id',
+    'assigned_to__username', 'created_by__username', 'position', 'version',
+    'comments_count', 'last_activity_at',
+)
+
+_datetime_field = serializers.DateTimeField()
+
+
+def task_rows(queryset):
+    """Queryset задач -> строки .values(); годится для CursorPagination"""
+    return queryset.values(*TASK_VALUES)
+
+
+def serialize_task_rows(rows):
+    now = timezone.now()
+    closed = Task.CLOSED_STATUSES
+    to_datetime = _datetime_field.to_representation
+    data = []
+    append = data.append
+    for row in rows:
+        due_date = row['due_date']
+        completed_at = row['completed_at']
+        last_activity_at = row['last_activity_at']
+        item = {
+            'id': row['id'],
+            'title': row['title'],
+            'description': row['description'],
+            'task_list': row['task_list_id'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'due_date': to_datetime(due_date) if due_date is not None else None,
+            'completed_at': to_datetime(completed_at) if completed_at is not None else None,
+            'created_at': to_datetime(row['created_at']),
+            'updated_at': to_datetime(row['updated_at']),
+            'is_overdue': due_date is not None and row['status'] not in closed and now > due_date,
+            'assigned_to': row['assigned_to_id'],
+        }
+        if row['assigned_to_id'] is not None:
+            item['assigned_to_username'] = row['assigned_to__username']
+        item['created_by_username'] = row['created_by__username']
+        item['position'] = row['position']
+        item['version'] = row['version']
+        item['comments_count'] = row['comments_count']
+        item['last_activity_at'] = to_datetime(last_activity_at) if last_activity_at is not None else None
+        append(item)
+    return data
+
+
+def serialize_tasks(queryset):
+    return serialize_task_rows(task_rows(queryset))
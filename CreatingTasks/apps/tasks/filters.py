@@ -0,0 +1,106 @@
+from datetime import datetime, time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from .models import Task
+from .search import filter_tasks
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _parse_bool(name, value):
+    value = value.lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValidationError({name: 'Ожидается true или false'})
+
+
+def _parse_moment(name, value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: 'Неверный формат даты'})
+        moment = datetime.combine(day, time.min)
+    if settings.USE_TZ and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    """Серверная фильтрация задач по query-параметрам.
+
+    Каждый фильтр опирается на индекс из Task.Meta.indexes:
+    status/overdue - (status, due_date), assigned_to - (assigned_to, status),
+    priority - (priority, status), archived - (is_archived, status),
+    due_after/due_before - (due_date), search - полнотекстовый индекс (apps.tasks.search).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        statuses = _split(params.get('status', ''))
+        if statuses:
+            self._check_choices('status', statuses, Task.STATUS_CHOICES)
+            queryset = queryset.filter(status__in=statuses)
+
+        priorities = _split(params.get('priority', ''))
+        if priorities:
+            self._check_choices('priority', priorities, Task.PRIORITY_CHOICES)
+            queryset = queryset.filter(priority__in=priorities)
+
+        assigned_to = params.get('assigned_to')
+        if assigned_to:
+            queryset = self._filter_assignee(request, queryset, assigned_to)
+
+        due_after = params.get('due_after')
+        if due_after:
+            queryset = queryset.filter(due_date__gte=_parse_moment('due_after', due_after))
+        due_before = params.get('due_before')
+        if due_before:
+            queryset = queryset.filter(due_date__lt=_parse_moment('due_before', due_before))
+
+        overdue = params.get('overdue')
+        if overdue and _parse_bool('overdue', overdue):
+            open_statuses = [s for s, _ in Task.STATUS_CHOICES if s not in Task.CLOSED_STATUSES]
+            queryset = queryset.filter(status__in=open_statuses, due_date__lt=timezone.now())
+
+        archived = params.get('archived', getattr(view, 'default_archived_filter', None))
+        if archived is not None and archived != 'all':
+            queryset = queryset.filter(is_archived=_parse_bool('archived', str(archived)))
+
+        search = params.get('search', '').strip()
+        if search:
+            queryset = filter_tasks(queryset, search)
+
+        return queryset
+
+    def _check_choices(self, name, values, choices):
+        allowed = {value for value, _ in choices}
+        unknown = [value for value in values if value not in allowed]
+        if unknown:
+            raise ValidationError({name: f"Неизвестные значения: {', '.join(unknown)}"})
+
+    def _filter_assignee(self, request, queryset, value):
+        if value == 'me':
+            return queryset.filter(assigned_to=request.user)
+        if value == 'none':
+            return queryset.filter(assigned_to__isnull=True)
+        ids = _split(value)
+        if not all(item.isdigit() for item in ids):
+            raise ValidationError({'assigned_to': 'Ожидается id пользователя, me или none'})
+        return queryset.filter(assigned_to_id__in=ids)
+
+
+class TaskOrderingFilter(OrderingFilter):
+    # Курсорная пагинация строит позицию по первому полю, поэтому оно должно быть
+    # без NULL и неизменным: по updated_at задача, изменённая во время прокрутки,
+    # пропала бы или повторилась
+    ordering_fields = ['created_at']
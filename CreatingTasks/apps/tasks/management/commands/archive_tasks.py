@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.tasks import archive
+
+
+class Command(BaseCommand):
+    help = 'Переносит завершённые и архивные задачи старше N дней в ArchivedTask'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TASK_ARCHIVE_AFTER_DAYS,
+                            help='Возраст задачи в днях (по completed_at или updated_at)')
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE,
+                            help='Задач в одной транзакции')
+        parser.add_argument('--limit', type=int, default=None, help='Не больше N задач за запуск')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать подходящие задачи')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archive.eligible_tasks(options['days']).count()
+            self.stdout.write(f'Подходящих задач: {count}')
+            return
+        archived = archive.archive_old_tasks(options['days'], options['batch_size'], options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Перенесено в архив задач: {archived}'))
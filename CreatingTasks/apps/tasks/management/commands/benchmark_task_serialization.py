@@ -0,0 +1,75 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apps.tasks.fast_serializers import serialize_tasks
+from apps.tasks.models import TaskList, Task
+from apps.tasks.renderers import FastJSONRenderer
+from apps.tasks.serializers import TaskSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает TaskSerializer и быстрый путь на N задачах. '
+            'Задачи создаются во временной транзакции и откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Сколько задач сериализовать')
+        parser.add_argument('--repeat', type=int, default=3, help='Лучший из N прогонов')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['count'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, count, repeat):
+        User = get_user_model()
+        owner = User.objects.create_user(username='benchmark-owner')
+        assignee = User.objects.create_user(username='benchmark-assignee')
+        task_list = TaskList.objects.create(name='Benchmark', created_by=owner)
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(
+                title=f'Задача {i}', description='Описание ' * 5, task_list=task_list,
+                created_by=owner, assigned_to=assignee if i % 2 else None,
+                status=('pending', 'in_progress', 'completed')[i % 3],
+                due_date=now + timedelta(hours=i % 48 - 24),
+                position=i,
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        queryset = Task.objects.filter(task_list=task_list).order_by('-created_at', '-id')
+
+        def current():
+            data = TaskSerializer(queryset.select_related('created_by', 'assigned_to'), many=True).data
+            return data, JSONRenderer().render(data)
+
+        def fast():
+            data = serialize_tasks(queryset)
+            return data, FastJSONRenderer().render(data)
+
+        results = {}
+        for name, path in (('TaskSerializer + JSONRenderer', current), ('fast path + orjson', fast)):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                results[name] = path()
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            self.stdout.write(f'{name:32} {best * 1000:9.1f} ms  {count / best:10.0f} задач/с')
+
+        (current_data, current_json), (fast_data, fast_json) = results.values()
+        if current_json != fast_json:
+            raise CommandError('Вывод быстрого пути отличается от TaskSerializer')
+        self.stdout.write(self.style.SUCCESS('Вывод совпадает байт в байт'))
@@ -0,0 +1,316 @@
+import json
+import re
+import statistics
+import time
+from collections import Counter
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.tasks import analytics, archive, search
+from apps.tasks.caching import invalidate_lists
+from apps.tasks.comments import recount as recount_comments
+from apps.tasks.membership import invalidate_membership
+from apps.tasks.models import TaskList, Task, Comment
+from apps.users.models import UserProfile
+
+PASSWORD = 'budget-check-password'
+COVERED_URLCONFS = ('apps.tasks.urls', 'apps.users.urls')
+# Служебные запросы транзакций не считаются повторами
+SKIP_DUPLICATES = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)', re.I)
+# IN (...) из нескольких значений - пакетный запрос (например, каскадное удаление), а не N+1
+BATCHED = re.compile(r'\bIN \([^()]*,')
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class Scenario:
+    """Запрос к API и его бюджет: число SQL-запросов и задержка в мс"""
+
+    def __init__(self, route, method, path, budget, data=None, max_ms=None, repeatable=None,
+                 content_type=None):
+        self.route = route
+        self.method = method
+        self.path = path
+        self.budget = budget
+        self.data = data
+        # Тело как есть (строка) вместо JSON
+        self.content_type = content_type
+        self.max_ms = max_ms
+        # Изменяющие запросы выполняются один раз
+        self.repeatable = method == 'get' if repeatable is None else repeatable
+
+
+def scenarios(ids):
+    """Бюджеты - число запросов на холодных кэшах ответов и членства.
+    От объёма данных они не зависят (кроме каскадного удаления списка,
+    которое идёт пачками), поэтому рост числа запросов - регрессия"""
+    bulk_ids = ids['bulk_tasks']
+    return [
+        Scenario('api-root', 'get', '/api/tasks/', 1),
+        Scenario('tasklist-list', 'get', '/api/tasks/lists/', 4),
+        Scenario('tasklist-list', 'post', '/api/tasks/lists/', 9, {'name': 'Новый список'}),
+        Scenario('tasklist-detail', 'get', '/api/tasks/lists/{list}/', 5),
+        Scenario('tasklist-detail', 'patch', '/api/tasks/lists/{list}/', 8, {'description': 'Обновлено'}),
+        Scenario('tasklist-tasks', 'get', '/api/tasks/lists/{list}/tasks/', 3),
+        Scenario('tasklist-tasks', 'get', '/api/tasks/lists/{list}/tasks/?status=pending&assigned_to=me', 3),
+        Scenario('tasklist-changes', 'get', '/api/tasks/lists/{list}/changes/?since=0', 5),
+        Scenario('tasklist-analytics', 'get', '/api/tasks/lists/{list}/analytics/', 4),
+        Scenario('tasklist-export', 'get', '/api/tasks/lists/export/', 3),
+        Scenario('tasklist-bulk-create', 'post', '/api/tasks/lists/bulk/create/', 8,
+                 [{'name': f'Импорт {i}'} for i in range(20)]),
+        Scenario('task-list', 'get', '/api/tasks/tasks/', 3),
+        Scenario('task-list', 'get', '/api/tasks/tasks/?ordering=created_at&overdue=true', 3),
+        Scenario('task-list', 'post', '/api/tasks/tasks/', 13,
+                 {'title': 'Новая задача', 'task_list': ids['list']}),
+        Scenario('task-detail', 'get', '/api/tasks/tasks/{task}/', 3),
+        Scenario('task-detail', 'patch', '/api/tasks/tasks/{task}/', 13, {'priority': 'high'}),
+        Scenario('task-complete', 'post', '/api/tasks/tasks/{task}/complete/', 13),
+        Scenario('task-comments', 'get', '/api/tasks/tasks/{task}/comments/', 4),
+        Scenario('task-comments', 'post', '/api/tasks/tasks/{task}/comments/', 8, {'content': 'В ветку'}),
+        Scenario('task-my-tasks', 'get', '/api/tasks/tasks/my_tasks/', 3),
+        Scenario('task-analytics', 'get', '/api/tasks/tasks/analytics/', 3),
+        Scenario('task-bulk-create', 'post', '/api/tasks/tasks/bulk/create/', 16,
+                 [{'title': f'Пакет {i}', 'task_list': ids['list']} for i in range(50)]),
+        Scenario('task-bulk-update', 'post', '/api/tasks/tasks/bulk/update/', 17,
+                 [{'id': task_id, 'priority': 'urgent'} for task_id in bulk_ids]),
+        Scenario('task-bulk-complete', 'post', '/api/tasks/tasks/bulk/complete/', 17, {'ids': bulk_ids}),
+        Scenario('task-bulk-move', 'post', '/api/tasks/tasks/bulk/move/', 20,
+                 {'ids': bulk_ids, 'task_list': ids['other_list']}),
+        Scenario('task-bulk-archive', 'post', '/api/tasks/tasks/bulk/archive/', 17, {'ids': bulk_ids}),
+        Scenario('task-export', 'get', '/api/tasks/tasks/export/', 3),
+        Scenario('task-export', 'get', '/api/tasks/tasks/export/?fmt=csv&status=pending', 3),
+        Scenario('task-import', 'post', '/api/tasks/tasks/import/?task_list={list}', 16,
+                 ''.join(f'{{"title": "Импорт {i}"}}\n' for i in range(50)),
+                 content_type='application/x-ndjson'),
+        Scenario('task-import', 'post', '/api/tasks/tasks/import/?fmt=csv', 16,
+                 'title,task_list,priority\n'
+                 + ''.join(f'Импорт CSV {i},{ids["list"]},high\n' for i in range(50)),
+                 content_type='text/csv'),
+        Scenario('archivedtask-list', 'get', '/api/tasks/archive/', 3),
+        Scenario('archivedtask-list', 'get', '/api/tasks/archive/?task_list={list}', 3),
+        Scenario('archivedtask-detail', 'get', '/api/tasks/archive/{archived_task}/', 3),
+        Scenario('search-list', 'get', '/api/tasks/search/?q=Задача 1', 3),
+        Scenario('task-list', 'get', '/api/tasks/tasks/?search=Задача', 3),
+        Scenario('comment-list', 'get', '/api/tasks/comments/', 3),
+        Scenario('comment-list', 'post', '/api/tasks/comments/', 7,
+                 {'task': ids['task'], 'content': 'Комментарий'}),
+        Scenario('comment-export', 'get', '/api/tasks/comments/export/?task_list={list}', 3),
+        Scenario('comment-detail', 'get', '/api/tasks/comments/{comment}/', 3),
+        Scenario('comment-detail', 'patch', '/api/tasks/comments/{comment}/', 7, {'content': 'Исправлено'}),
+        Scenario('comment-detail', 'delete', '/api/tasks/comments/{spare_comment}/', 7),
+        Scenario('task-detail', 'delete', '/api/tasks/tasks/{spare_task}/', 17),
+        Scenario('tasklist-detail', 'delete', '/api/tasks/lists/{spare_list}/', 25),
+        Scenario('current_user', 'get', '/api/auth/me/', 2),
+        Scenario('user_list', 'get', '/api/auth/users/', 3),
+        # Хэширование пароля само по себе занимает сотни миллисекунд
+        Scenario('register', 'post', '/api/auth/register/', 9,
+                 {'username': 'budget-new', 'email': 'new@example.com', 'password': PASSWORD}, max_ms=2000),
+        Scenario('login', 'post', '/api/auth/login/', 12,
+                 {'username': ids['viewer_username'], 'password': PASSWORD}, max_ms=2000),
+        Scenario('logout', 'post', '/api/auth/logout/', 3),
+    ]
+
+
+def _route_names(urlconf):
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                walk(pattern.url_patterns)
+            elif pattern.name:
+                names.add(pattern.name)
+
+    walk(import_module(urlconf).urlpatterns)
+    return names
+
+
+def _duplicates(queries, threshold):
+    """Одинаковые с точностью до литералов запросы - признак N+1"""
+    shapes = Counter()
+    for query in queries:
+        sql = query['sql']
+        if SKIP_DUPLICATES.match(sql) or BATCHED.search(sql):
+            continue
+        shapes[LITERALS.sub('?', sql)] += 1
+    return [(count, sql) for sql, count in shapes.most_common() if count >= threshold]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Проверяет бюджеты SQL-запросов и задержки эндпоинтов apps.tasks и apps.users '
+            'на сгенерированных данных. Всё выполняется в откатываемой транзакции; '
+            'при нарушениях команда завершается с ненулевым кодом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', type=int, default=10)
+        parser.add_argument('--members', type=int, default=8, help='Участников в каждом списке')
+        parser.add_argument('--tasks', type=int, default=40, help='Задач в каждом списке')
+        parser.add_argument('--comments', type=int, default=2, help='Комментариев к каждой задаче')
+        parser.add_argument('--repeat', type=int, default=5, help='Прогонов GET-запросов (медиана)')
+        parser.add_argument('--max-ms', type=float, default=500.0, help='Потолок задержки по умолчанию')
+        parser.add_argument('--n-plus-one', type=int, default=3,
+                            help='Сколько одинаковых запросов считать N+1')
+        parser.add_argument('--json', action='store_true', help='Отчёт в JSON')
+
+    def handle(self, *args, **options):
+        results = []
+        try:
+            with transaction.atomic():
+                results = self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        failures = [result for result in results if result['problems']]
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+        else:
+            self._report(results)
+        if failures:
+            raise CommandError(f'Нарушены бюджеты: {len(failures)} из {len(results)}')
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS(f'Все бюджеты соблюдены ({len(results)})'))
+
+    def _seed(self, options):
+        User = get_user_model()
+        password = make_password(PASSWORD)
+        members = User.objects.bulk_create([
+            User(username=f'budget-{i}', email=f'budget-{i}@example.com', password=password)
+            for i in range(options['members'])
+        ])
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in members])
+        viewer = members[0]
+
+        task_lists = TaskList.objects.bulk_create([
+            TaskList(name=f'Список {i}', slug=f'budget-list-{i}', created_by=viewer)
+            for i in range(options['lists'] + 2)
+        ])
+        Membership = TaskList.members.through
+        Membership.objects.bulk_create([
+            Membership(tasklist_id=task_list.pk, user_id=user.pk)
+            for task_list in task_lists for user in members
+        ])
+        statuses = [status for status, _ in Task.STATUS_CHOICES]
+        tasks = Task.objects.bulk_create([
+            Task(
+                title=f'Задача {i}', task_list=task_list, created_by=viewer,
+                assigned_to=members[i % len(members)], status=statuses[i % len(statuses)],
+                position=i,
+            )
+            for task_list in task_lists for i in range(options['tasks'])
+        ], batch_size=1000)
+        comments = Comment.objects.bulk_create([
+            Comment(task=task, author=members[i % len(members)], content=f'Комментарий {i}')
+            for task in tasks for i in range(options['comments'])
+        ], batch_size=1000)
+
+        # Счётчики аналитики и комментариев - как после rebuild_task_stats
+        # и recount_comments на живой базе
+        recount_comments([task.pk for task in tasks])
+        analytics.rebuild([task_list.pk for task_list in task_lists], [user.pk for user in members])
+        search.reindex()
+
+        first_list_tasks = [task for task in tasks if task.task_list_id == task_lists[0].pk]
+        archived_ids = [task.pk for task in first_list_tasks[21:25]]
+        archive.archive_batch(archived_ids)
+        return viewer, {
+            'list': task_lists[0].pk,
+            'other_list': task_lists[1].pk,
+            'spare_list': task_lists[-1].pk,
+            'task': first_list_tasks[0].pk,
+            'spare_task': first_list_tasks[-1].pk,
+            'comment': comments[0].pk,
+            'spare_comment': comments[1].pk,
+            'bulk_tasks': [task.pk for task in first_list_tasks[1:21]],
+            'archived_task': archived_ids[0],
+            'viewer': viewer.pk,
+            'viewer_username': viewer.username,
+            'list_ids': [task_list.pk for task_list in task_lists],
+        }
+
+    def _run(self, options):
+        viewer, ids = self._seed(options)
+        token = Token.objects.create(user=viewer)
+        client = APIClient(SERVER_NAME='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        all_scenarios = scenarios(ids)
+        results = [self._measure(client, scenario, ids, options) for scenario in all_scenarios]
+
+        covered = {scenario.route for scenario in all_scenarios}
+        for urlconf in COVERED_URLCONFS:
+            for route in sorted(_route_names(urlconf) - covered):
+                results.append({
+                    'route': route, 'method': '-', 'path': urlconf, 'queries': None,
+                    'budget': None, 'median_ms': None, 'max_ms': None,
+                    'problems': ['маршрут не покрыт сценарием'],
+                })
+        return results
+
+    def _measure(self, client, scenario, ids, options):
+        path = scenario.path.format(**ids)
+        runs = options['repeat'] if scenario.repeatable else 1
+        max_ms = scenario.max_ms or options['max_ms']
+        timings, query_counts, problems, duplicates = [], [], [], []
+
+        for _ in range(runs):
+            # Кэши ответов и членства холодные, как у первого запроса после изменения
+            invalidate_lists(ids['list_ids'])
+            invalidate_membership([ids['viewer']])
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                try:
+                    if scenario.content_type:
+                        response = getattr(client, scenario.method)(
+                            path, scenario.data, content_type=scenario.content_type
+                        )
+                    else:
+                        response = getattr(client, scenario.method)(path, scenario.data, format='json')
+                    # Потоковый ответ читает базу по мере отдачи
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                except Exception as e:
+                    problems.append(f'исключение: {e!r}')
+                    break
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                problems.append(f'HTTP {response.status_code}')
+                break
+            query_counts.append(len(captured))
+            duplicates = duplicates or _duplicates(captured.captured_queries, options['n_plus_one'])
+
+        queries = max(query_counts) if query_counts else None
+        median_ms = statistics.median(timings) if timings else None
+        if queries is not None and queries > scenario.budget:
+            problems.append(f'запросов {queries} > {scenario.budget}')
+        if median_ms is not None and median_ms > max_ms:
+            problems.append(f'{median_ms:.0f} мс > {max_ms:.0f} мс')
+        for count, sql in duplicates:
+            problems.append(f'N+1: {count}x {sql[:160]}')
+        return {
+            'route': scenario.route, 'method': scenario.method.upper(), 'path': path,
+            'queries': queries, 'budget': scenario.budget,
+            'median_ms': round(median_ms, 1) if median_ms is not None else None,
+            'max_ms': max_ms, 'problems': problems,
+        }
+
+    def _report(self, results):
+        for result in results:
+            status = self.style.ERROR('FAIL') if result['problems'] else self.style.SUCCESS('ok  ')
+            queries = '-' if result['queries'] is None else f"{result['queries']}/{result['budget']}"
+            latency = '-' if result['median_ms'] is None else f"{result['median_ms']:.1f}/{result['max_ms']:.0f} мс"
+            self.stdout.write(
+                f"{status} {result['method']:6} {result['path']:60} запросов {queries:>7}  {latency}"
+            )
+            for problem in result['problems']:
+                self.stdout.write(f'       - {problem}')
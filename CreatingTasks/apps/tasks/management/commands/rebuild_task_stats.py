@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.tasks import analytics
+from apps.tasks.models import TaskList
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики аналитики (TaskListStats, UserTaskStats) по задачам. '
+            'Нужна после миграции и для исправления расхождений')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', type=int, action='append', dest='task_list_ids',
+                            help='id списка; можно повторять. По умолчанию - все')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='id пользователя; можно повторять. По умолчанию - все')
+
+    def handle(self, *args, **options):
+        task_lists = TaskList.objects.all()
+        users = get_user_model().objects.all()
+        if options['task_list_ids'] or options['user_ids']:
+            # Несуществующие id пропускаются
+            task_lists = task_lists.filter(id__in=options['task_list_ids'] or ())
+            users = users.filter(id__in=options['user_ids'] or ())
+        lists, users = analytics.rebuild(
+            task_lists.values_list('id', flat=True), users.values_list('id', flat=True)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано: списков {len(lists)}, пользователей {len(users)}'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.tasks import comments
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает число комментариев и время последней активности у задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', type=int, action='append', dest='task_ids',
+                            help='id задачи; можно повторять. По умолчанию - все')
+        parser.add_argument('--batch-size', type=int, default=comments.RECOUNT_BATCH_SIZE,
+                            help='Сколько задач обновлять за один запрос')
+
+    def handle(self, *args, **options):
+        recounted = comments.recount(options['task_ids'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано задач: {recounted}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.tasks import search
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс задач и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=search.REINDEX_BATCH_SIZE,
+                            help='Сколько записей вставлять за один запрос')
+
+    def handle(self, *args, **options):
+        indexed = search.reindex(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано записей: {indexed}'))
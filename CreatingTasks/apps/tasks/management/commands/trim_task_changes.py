@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.tasks import changelog
+
+
+class Command(BaseCommand):
+    help = 'Обрезает журнал изменений задач, оставляя последние версии каждого списка'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=settings.TASK_CHANGELOG_RETENTION,
+            help='Сколько последних версий хранить для каждого списка'
+        )
+
+    def handle(self, *args, **options):
+        deleted = changelog.trim(options['keep'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей журнала: {deleted}'))
@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import TaskList
+
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id):
+    return f'tasks:membership:{user_id}'
+
+
+def get_user_list_ids(user_id):
+    """Множество id списков, в которых состоит пользователь (из кэша)"""
+    key = _cache_key(user_id)
+    list_ids = cache.get(key)
+    if list_ids is None:
+        # Кэш живёт час, поэтому читаем с основной базы, а не с отстающей реплики
+        list_ids = frozenset(
+            TaskList.members.through.objects.using(DEFAULT_DB_ALIAS)
+            .filter(user_id=user_id)
+            .values_list('tasklist_id', flat=True)
+        )
+        cache.set(key, list_ids, MEMBERSHIP_CACHE_TIMEOUT)
+    return list_ids
+
+
+def is_member(user_id, task_list_id):
+    try:
+        task_list_id = int(task_list_id)
+    except (TypeError, ValueError):
+        return False
+    return task_list_id in get_user_list_ids(user_id)
+
+
+def invalidate_membership(user_ids):
+    """Сбрасывает кэш сразу и повторно после коммита транзакции,
+    чтобы параллельный запрос не закэшировал состояние до коммита"""
+    keys = [_cache_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
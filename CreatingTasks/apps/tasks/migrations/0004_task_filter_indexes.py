@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['priority', 'status'], name='tasks_task_priorit_685c61_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['is_archived', 'status'], name='tasks_task_is_arch_d86acc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date'], name='tasks_task_due_dat_bce847_idx'),
+        ),
+    ]
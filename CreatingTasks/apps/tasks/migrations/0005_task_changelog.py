@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Версия изменений'),
+        ),
+        migrations.AddField(
+            model_name='tasklist',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Версия изменений'),
+        ),
+        migrations.CreateModel(
+            name='TaskChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField()),
+                ('task_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Создана'), ('updated', 'Изменена'), ('deleted', 'Удалена')], max_length=20)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('task_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='tasks.tasklist')),
+            ],
+            options={
+                'ordering': ['version'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='taskchange',
+            constraint=models.UniqueConstraint(fields=('task_list', 'version'), name='tasks_taskchange_list_version_uniq'),
+        ),
+    ]
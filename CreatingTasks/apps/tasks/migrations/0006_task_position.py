@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='position',
+            field=models.PositiveIntegerField(default=0, verbose_name='Позиция в списке'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['task_list', 'position'], name='tasks_task_task_li_c9372a_idx'),
+        ),
+    ]
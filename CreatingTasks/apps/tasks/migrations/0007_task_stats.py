@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:55
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_auto_20251008_0003'),
+        ('tasks', '0006_task_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskListStats',
+            fields=[
+                ('tasks_count', models.IntegerField(default=0)),
+                ('archived_count', models.IntegerField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('in_progress_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('low_count', models.IntegerField(default=0)),
+                ('medium_count', models.IntegerField(default=0)),
+                ('high_count', models.IntegerField(default=0)),
+                ('urgent_count', models.IntegerField(default=0)),
+                ('completion_time_total', models.DurationField(default=datetime.timedelta(0))),
+                ('completion_time_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('task_list', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='tasks.tasklist')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserTaskStats',
+            fields=[
+                ('tasks_count', models.IntegerField(default=0)),
+                ('archived_count', models.IntegerField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('in_progress_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('low_count', models.IntegerField(default=0)),
+                ('medium_count', models.IntegerField(default=0)),
+                ('high_count', models.IntegerField(default=0)),
+                ('urgent_count', models.IntegerField(default=0)),
+                ('completion_time_total', models.DurationField(default=datetime.timedelta(0))),
+                ('completion_time_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
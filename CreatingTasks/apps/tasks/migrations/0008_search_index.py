@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Внешний FTS5-индекс над tasks_searchentry, синхронизируется триггерами
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE tasks_searchentry_fts USING fts5(
+        title, body, content='tasks_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER tasks_searchentry_ai AFTER INSERT ON tasks_searchentry BEGIN
+        INSERT INTO tasks_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER tasks_searchentry_ad AFTER DELETE ON tasks_searchentry BEGIN
+        INSERT INTO tasks_searchentry_fts(tasks_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER tasks_searchentry_au AFTER UPDATE ON tasks_searchentry BEGIN
+        INSERT INTO tasks_searchentry_fts(tasks_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO tasks_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS tasks_searchentry_au',
+    'DROP TRIGGER IF EXISTS tasks_searchentry_ad',
+    'DROP TRIGGER IF EXISTS tasks_searchentry_ai',
+    'DROP TABLE IF EXISTS tasks_searchentry_fts',
+]
+
+# Конфигурация 'simple' без стемминга: в задачах смешаны русский и английский
+POSTGRES_FORWARD = [
+    """ALTER TABLE tasks_searchentry ADD COLUMN document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED""",
+    'CREATE INDEX tasks_searchentry_document_idx ON tasks_searchentry USING GIN (document)',
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS tasks_searchentry_document_idx',
+    'ALTER TABLE tasks_searchentry DROP COLUMN IF EXISTS document',
+]
+
+SQL = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+}
+
+
+def _run(statements_index):
+    def run(apps, schema_editor):
+        statements = SQL.get(schema_editor.connection.vendor)
+        if statements is None:
+            return
+        for statement in statements[statements_index]:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_task_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Задача'), ('comment', 'Комментарий')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.task')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='tasks_searchentry_kind_object_uniq'),
+        ),
+        migrations.RunPython(_run(0), _run(1)),
+    ]
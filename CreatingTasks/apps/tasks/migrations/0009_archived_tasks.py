@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:02
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', '⏳ Ожидает'), ('in_progress', '🔄 В работе'), ('completed', '✅ Завершена'), ('cancelled', '❌ Отменена')], max_length=20)),
+                ('priority', models.CharField(choices=[('low', '🔵 Низкий'), ('medium', '🟡 Средний'), ('high', '🟠 Высокий'), ('urgent', '🔴 Срочный')], max_length=20)),
+                ('due_date', models.DateTimeField(null=True)),
+                ('completed_at', models.DateTimeField(null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('comments', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'completed_at'], name='tasks_task_status_9c6008_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='assigned_to',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='task_list',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_tasks', to='tasks.tasklist'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['task_list', '-created_at', '-id'], name='tasks_archi_task_li_befa2b_idx'),
+        ),
+    ]
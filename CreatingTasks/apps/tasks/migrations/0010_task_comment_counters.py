@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:09
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_counters(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    Comment = apps.get_model('tasks', 'Comment')
+    comments = Comment.objects.filter(task_id=OuterRef('pk')).order_by()
+    Task.objects.filter(id__in=Comment.objects.values('task_id')).update(
+        comments_count=Coalesce(Subquery(
+            comments.values('task_id').annotate(total=Count('id')).values('total'),
+            output_field=IntegerField(),
+        ), Value(0)),
+        last_activity_at=Subquery(comments.order_by('-updated_at').values('updated_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_archived_tasks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность в комментариях'),
+        ),
+        migrations.RunPython(fill_comment_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:40
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def fill_search_entries(apps, schema_editor):
+    """Записи поиска для задач и комментариев, созданных до 0008.
+
+    FTS5 в SQLite заполняют триггеры на вставку, tsvector в PostgreSQL -
+    сгенерированная колонка; уже проиндексированные объекты пропускаются.
+    """
+    Task = apps.get_model('tasks', 'Task')
+    Comment = apps.get_model('tasks', 'Comment')
+    SearchEntry = apps.get_model('tasks', 'SearchEntry')
+    db_alias = schema_editor.connection.alias
+    sources = (
+        (Task.objects.only('id', 'title', 'description'), lambda task: SearchEntry(
+            kind='task', object_id=task.pk, task_id=task.pk, title=task.title, body=task.description,
+        )),
+        (Comment.objects.only('id', 'task_id', 'content'), lambda comment: SearchEntry(
+            kind='comment', object_id=comment.pk, task_id=comment.task_id, body=comment.content,
+        )),
+    )
+    for queryset, build in sources:
+        batch = []
+        for obj in queryset.using(db_alias).order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            batch.append(build(obj))
+            if len(batch) >= BATCH_SIZE:
+                SearchEntry.objects.using(db_alias).bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        SearchEntry.objects.using(db_alias).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_task_comment_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_entries, migrations.RunPython.noop),
+    ]
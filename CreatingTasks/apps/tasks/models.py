@@ -1,7 +1,42 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
-from django.utils.text import slugify
+
+from .slugs import save_with_unique_slug
+
+
+class TaskListQuerySet(models.QuerySet):
+    def with_summary(self):
+        """Аннотирует списки счётчиками задач и участников, посчитанными в SQL"""
+        active = Q(tasks__is_archived=False)
+        counters = {
+            f'{status}_count': Count('tasks', filter=active & Q(tasks__status=status), distinct=True)
+            for status, _ in Task.STATUS_CHOICES
+        }
+        members = (
+            TaskList.members.through.objects
+            .filter(tasklist_id=OuterRef('pk'))
+            .order_by()
+            .values('tasklist_id')
+            .annotate(total=Count('user_id'))
+            .values('total')
+        )
+        return self.annotate(
+            tasks_count=Count('tasks', filter=active, distinct=True),
+            overdue_count=Count(
+                'tasks',
+                filter=active & Q(tasks__due_date__lt=timezone.now())
+                & ~Q(tasks__status__in=Task.CLOSED_STATUSES),
+                distinct=True,
+            ),
+            members_count=Coalesce(Subquery(members, output_field=models.IntegerField()), 0),
+            **counters,
+        )
 
 
 class TaskList(models.Model):
@@ -14,9 +49,12 @@ class TaskList(models.Model):
                                      verbose_name="Участники")
     color = models.CharField(max_length=7, default="#3498db", verbose_name="Цвет")
     is_archived = models.BooleanField(default=False, verbose_name="В архиве")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Версия изменений")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TaskListQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Список задач"
         verbose_name_plural = "Списки задач"
@@ -27,18 +65,23 @@ class TaskList(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
-            # Ensure slug uniqueness
-            original_slug = self.slug
-            counter = 1
-            while TaskList.objects.filter(slug=self.slug).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
+            # Один запрос за свободным суффиксом и повтор при гонке вставок
+            return save_with_unique_slug(self, lambda: super(TaskList, self).save(*args, **kwargs))
         super().save(*args, **kwargs)
 
     def get_active_tasks(self):
         return self.tasks.filter(is_archived=False)
 
+    @staticmethod
+    def allocate_versions(task_list_id, count=1):
+        """Резервирует count следующих версий списка, возвращает последнюю.
+        None - если списка уже нет"""
+        with transaction.atomic():
+            updated = TaskList.objects.filter(pk=task_list_id).update(version=F('version') + count)
+            if not updated:
+                return None
+            return TaskList.objects.filter(pk=task_list_id).values_list('version', flat=True).get()
+
 
 class Task(models.Model):
     STATUS_CHOICES = [
@@ -55,6 +98,8 @@ class Task(models.Model):
         ('urgent', '🔴 Срочный'),
     ]
 
+    CLOSED_STATUSES = ['completed', 'cancelled']
+
     title = models.CharField(max_length=255, verbose_name="Заголовок")
     description = models.TextField(blank=True, verbose_name="Описание")
     task_list = models.ForeignKey(TaskList, on_delete=models.CASCADE,
@@ -71,9 +116,25 @@ class Task(models.Model):
     due_date = models.DateTimeField(null=True, blank=True, verbose_name="Срок выполнения")
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
     is_archived = models.BooleanField(default=False, verbose_name="В архиве")
+    position = models.PositiveIntegerField(default=0, verbose_name="Позиция в списке")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Версия изменений")
+    # Денормализованы из комментариев (apps.tasks.comments), чтобы доска
+    # не считала их подзапросом на каждую карточку
+    comments_count = models.PositiveIntegerField(default=0, verbose_name="Комментариев")
+    last_activity_at = models.DateTimeField(null=True, blank=True,
+                                            verbose_name="Последняя активность в комментариях")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    # Значения этих полей на момент загрузки доступны обработчикам сигналов
+    # в instance._loaded_state, чтобы видеть переходы без лишних запросов
+    TRACKED_FIELDS = (
+        'task_list_id', 'status', 'assigned_to_id', 'is_archived',
+        'priority', 'created_at', 'completed_at', 'title', 'description',
+    )
+    # Меняются только UPDATE из apps.tasks.comments
+    COMMENT_FIELDS = ('comments_count', 'last_activity_at')
+
     class Meta:
         verbose_name = "Задача"
         verbose_name_plural = "Задачи"
@@ -81,20 +142,54 @@ class Task(models.Model):
         indexes = [
             models.Index(fields=['status', 'due_date']),
             models.Index(fields=['assigned_to', 'status']),
+            models.Index(fields=['priority', 'status']),
+            models.Index(fields=['is_archived', 'status']),
+            models.Index(fields=['due_date']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['task_list', '-created_at', '-id']),
+            models.Index(fields=['task_list', 'position']),
+            models.Index(fields=['status', 'completed_at']),
         ]
 
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = instance._tracked_state()
+        return instance
+
+    def _tracked_state(self):
+        return {field: self.__dict__[field] for field in self.TRACKED_FIELDS if field in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        # Каждое сохранение получает следующую версию своего списка;
+        # запись в журнал изменений делает обработчик post_save
+        with transaction.atomic():
+            self.version = TaskList.allocate_versions(self.task_list_id) or 0
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+            elif not self._state.adding and not kwargs.get('force_insert'):
+                # Полное сохранение загруженной раньше задачи не затирает
+                # счётчики комментариев, изменившиеся с тех пор
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.COMMENT_FIELDS
+                ]
+            super().save(*args, **kwargs)
+        self._loaded_state = self._tracked_state()
+
     def is_overdue(self):
-        if self.due_date and self.status not in ['completed', 'cancelled']:
+        if self.due_date and self.status not in self.CLOSED_STATUSES:
             return timezone.now() > self.due_date
         return False
 
     def mark_as_completed(self):
         self.status = 'completed'
         self.completed_at = timezone.now()
-        self.save()
+        self.save(update_fields=['status', 'completed_at', 'updated_at'])
 
     def get_time_until_due(self):
         if self.due_date:
@@ -113,6 +208,135 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['task', 'created_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Comment by {self.author} on {self.task}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Задача на момент загрузки: перенос меняет счётчики обеих задач
+        instance._loaded_task_id = instance.__dict__.get('task_id')
+        return instance
+
+class TaskChange(models.Model):
+    """Журнал изменений задач списка для догоняющей синхронизации клиентов"""
+    ACTION_CHOICES = [
+        ('created', 'Создана'),
+        ('updated', 'Изменена'),
+        ('deleted', 'Удалена'),
+    ]
+
+    task_list = models.ForeignKey(TaskList, on_delete=models.CASCADE, related_name='changes')
+    version = models.PositiveBigIntegerField()
+    task_id = models.BigIntegerField()
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    payload = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['version']
+        constraints = [
+            models.UniqueConstraint(fields=['task_list', 'version'], name='tasks_taskchange_list_version_uniq'),
+        ]
+
+    def __str__(self):
+        return f"v{self.version} {self.action} task {self.task_id}"
+
+
+class ArchivedTask(models.Model):
+    """Задача, перенесённая из Task архивацией (apps.tasks.archive), вместе с
+    комментариями. Только для чтения; id совпадает с id исходной задачи"""
+    id = models.BigIntegerField(primary_key=True)
+    task_list = models.ForeignKey(TaskList, on_delete=models.CASCADE, related_name='archived_tasks')
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                   null=True, related_name='+')
+    assigned_to = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                    null=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=Task.PRIORITY_CHOICES)
+    due_date = models.DateTimeField(null=True)
+    completed_at = models.DateTimeField(null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # [{id, author_id, author_username, content, created_at, updated_at}, ...]
+    comments = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['task_list', '-created_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} (архив)"
+
+
+class TaskStats(models.Model):
+    """Счётчики задач, которые обновляются на переходах задач (apps.tasks.analytics).
+    Архивные задачи входят в счётчики и отдельно в archived_count"""
+    tasks_count = models.IntegerField(default=0)
+    archived_count = models.IntegerField(default=0)
+    pending_count = models.IntegerField(default=0)
+    in_progress_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+    low_count = models.IntegerField(default=0)
+    medium_count = models.IntegerField(default=0)
+    high_count = models.IntegerField(default=0)
+    urgent_count = models.IntegerField(default=0)
+    # Сумма (completed_at - created_at) по завершённым задачам с датой завершения
+    completion_time_total = models.DurationField(default=timedelta(0))
+    completion_time_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class TaskListStats(TaskStats):
+    task_list = models.OneToOneField(TaskList, on_delete=models.CASCADE, primary_key=True,
+                                     related_name='stats')
+
+    def __str__(self):
+        return f"Stats of list {self.task_list_id}"
+
+
+class UserTaskStats(TaskStats):
+    """Счётчики по задачам, назначенным пользователю"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='task_stats')
+
+    def __str__(self):
+        return f"Stats of user {self.user_id}"
+
+
+class SearchEntry(models.Model):
+    """Текст задачи или комментария для полнотекстового поиска (apps.tasks.search).
+    Сам индекс - FTS5 в SQLite или tsvector в PostgreSQL - создаётся миграцией"""
+    KIND_CHOICES = [
+        ('task', 'Задача'),
+        ('comment', 'Комментарий'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # Удаление задачи удаляет записи её самой и её комментариев
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='+')
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='tasks_searchentry_kind_object_uniq'),
+        ]
 
     def __str__(self):
-        return f"Comment by {self.author} on {self.task}"
\ No newline at end of file
+        return f"{self.kind} {self.object_id}"
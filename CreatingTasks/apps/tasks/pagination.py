@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset-пагинация по (created_at, id) без OFFSET и COUNT(*)"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class TaskCursorPagination(CreatedAtCursorPagination):
+    pass
+
+
+class CommentCursorPagination(CreatedAtCursorPagination):
+    # Комментарии читаются в хронологическом порядке
+    ordering = ('created_at', 'id')
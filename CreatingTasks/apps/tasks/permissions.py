@@ -0,0 +1,19 @@
+from rest_framework.permissions import BasePermission
+
+from .membership import is_member
+from .models import TaskList, Task, Comment, ArchivedTask
+
+
+class IsTaskListMember(BasePermission):
+    """Доступ к объекту только участникам его списка задач"""
+
+    def has_object_permission(self, request, view, obj):
+        if isinstance(obj, TaskList):
+            task_list_id = obj.pk
+        elif isinstance(obj, (Task, ArchivedTask)):
+            task_list_id = obj.task_list_id
+        elif isinstance(obj, Comment):
+            task_list_id = obj.task.task_list_id
+        else:
+            return False
+        return is_member(request.user.pk, task_list_id)
@@ -0,0 +1,202 @@
+"""Полнотекстовый поиск по задачам и комментариям.
+
+Текст хранится в SearchEntry (строка на задачу или комментарий) и
+обновляется обработчиками сигналов и массовыми операциями. Индекс над
+ним зависит от базы и создаётся миграцией 0008: FTS5 с триггерами в
+SQLite или сгенерированный tsvector с GIN-индексом в PostgreSQL. Записи
+для данных, созданных до неё, добавляет миграция 0011.
+Бэкенд выбирается по вендору соединения; SEARCH_BACKENDS в настройках
+позволяет подменить его ({'postgresql': 'path.to.Backend'}).
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Comment, SearchEntry, Task
+
+# Только буквы и цифры: так термы безопасны и для MATCH, и для to_tsquery
+TERM_RE = re.compile(r'[^\W_]+')
+MAX_TERMS = 8
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+TEXT_PREVIEW = 200
+REINDEX_BATCH_SIZE = 1000
+
+BACKENDS = {
+    'sqlite': 'apps.tasks.search.SQLiteFTSBackend',
+    'postgresql': 'apps.tasks.search.PostgresSearchBackend',
+}
+_backends = {}
+
+
+class SearchBackend:
+    """SQL совпадений: (entry_id, score) записей SearchEntry, где больше score - выше"""
+
+    def match_sql(self, terms):
+        raise NotImplementedError
+
+    def rebuild(self, connection):
+        """Пересборка индекса после полной переиндексации"""
+
+
+class SQLiteFTSBackend(SearchBackend):
+    table = 'tasks_searchentry_fts'
+    # Веса bm25 для колонок title и body
+    weights = (10.0, 1.0)
+
+    def match_sql(self, terms):
+        # Каждый терм - префикс, все термы обязательны
+        query = ' '.join(f'"{term}"*' for term in terms)
+        sql = (
+            f'SELECT rowid AS entry_id, -bm25({self.table}, %s, %s) AS score '
+            f'FROM {self.table} WHERE {self.table} MATCH %s'
+        )
+        return sql, [*self.weights, query]
+
+    def rebuild(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend(SearchBackend):
+    # Должна совпадать с конфигурацией сгенерированной колонки document
+    config = 'simple'
+
+    def match_sql(self, terms):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        sql = (
+            'SELECT id AS entry_id, ts_rank(document, to_tsquery(%s, %s)) AS score '
+            f'FROM {SearchEntry._meta.db_table} WHERE document @@ to_tsquery(%s, %s)'
+        )
+        return sql, [self.config, query, self.config, query]
+
+
+def get_backend(using=DEFAULT_DB_ALIAS):
+    vendor = connections[using].vendor
+    if vendor not in _backends:
+        path = {**BACKENDS, **getattr(settings, 'SEARCH_BACKENDS', {})}.get(vendor)
+        if path is None:
+            raise ImproperlyConfigured(f'Полнотекстовый поиск не поддерживает базу {vendor}')
+        _backends[vendor] = import_string(path)()
+    return _backends[vendor]
+
+
+def parse_terms(text):
+    return TERM_RE.findall(text)[:MAX_TERMS]
+
+
+def _matches(terms, using):
+    sql, params = get_backend(using).match_sql(terms)
+    return f'({sql}) m JOIN {SearchEntry._meta.db_table} e ON e.id = m.entry_id', params
+
+
+def filter_tasks(queryset, text):
+    """Задачи queryset, в заголовке или описании которых есть все слова text"""
+    terms = parse_terms(text)
+    if not terms:
+        return queryset.none()
+    matches, params = _matches(terms, queryset.db)
+    return queryset.filter(id__in=RawSQL(
+        f"SELECT e.task_id FROM {matches} WHERE e.kind = 'task'", params
+    ))
+
+
+def search(text, task_list_ids, limit=DEFAULT_LIMIT):
+    """Задачи и комментарии из списков task_list_ids по убыванию релевантности"""
+    terms = parse_terms(text)
+    task_list_ids = list(task_list_ids)
+    if not terms or not task_list_ids:
+        return []
+    using = router.db_for_read(SearchEntry)
+    matches, params = _matches(terms, using)
+    placeholders = ', '.join(['%s'] * len(task_list_ids))
+    sql = (
+        f'SELECT e.kind, e.object_id, e.task_id, t.task_list_id, t.title, e.body, m.score '
+        f'FROM {matches} JOIN {Task._meta.db_table} t ON t.id = e.task_id '
+        f'WHERE t.task_list_id IN ({placeholders}) '
+        f'ORDER BY m.score DESC, e.id LIMIT %s'
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [*params, *task_list_ids, min(limit, MAX_LIMIT)])
+        rows = cursor.fetchall()
+    return [
+        {
+            'type': kind,
+            'id': object_id,
+            'task_id': task_id,
+            'task_list_id': task_list_id,
+            'title': title,
+            'text': body[:TEXT_PREVIEW],
+            'score': round(score, 6),
+        }
+        for kind, object_id, task_id, task_list_id, title, body, score in rows
+    ]
+
+
+def _task_entry(task):
+    return SearchEntry(kind='task', object_id=task.pk, task_id=task.pk,
+                       title=task.title, body=task.description)
+
+
+def _comment_entry(comment):
+    return SearchEntry(kind='comment', object_id=comment.pk, task_id=comment.task_id,
+                       body=comment.content)
+
+
+def _upsert(entries):
+    SearchEntry.objects.bulk_create(
+        entries, batch_size=REINDEX_BATCH_SIZE, update_conflicts=True,
+        unique_fields=['kind', 'object_id'], update_fields=['task', 'title', 'body'],
+    )
+
+
+def _text_changed(task):
+    previous = getattr(task, '_loaded_state', None)
+    if previous is None:
+        return True
+    return any(
+        previous.get(field) != task.__dict__.get(field) for field in ('title', 'description')
+    )
+
+
+def index_tasks(tasks):
+    """Обновляет записи задач, у которых изменился текст (по _loaded_state)"""
+    entries = [_task_entry(task) for task in tasks if _text_changed(task)]
+    if entries:
+        _upsert(entries)
+
+
+def index_comments(comments):
+    _upsert([_comment_entry(comment) for comment in comments])
+
+
+def remove_comments(comment_ids):
+    SearchEntry.objects.filter(kind='comment', object_id__in=comment_ids).delete()
+
+
+def reindex(batch_size=REINDEX_BATCH_SIZE, using=DEFAULT_DB_ALIAS):
+    """Заново строит SearchEntry и индекс по всем задачам и комментариям"""
+    sources = (
+        (Task.objects.only('id', 'title', 'description'), _task_entry),
+        (Comment.objects.only('id', 'task_id', 'content'), _comment_entry),
+    )
+    indexed = 0
+    with transaction.atomic(using=using):
+        SearchEntry.objects.using(using).all().delete()
+        for queryset, build in sources:
+            batch = []
+            for obj in queryset.using(using).order_by('pk').iterator(chunk_size=batch_size):
+                batch.append(build(obj))
+                if len(batch) >= batch_size:
+                    SearchEntry.objects.using(using).bulk_create(batch)
+                    indexed += len(batch)
+                    batch = []
+            SearchEntry.objects.using(using).bulk_create(batch)
+            indexed += len(batch)
+        get_backend(using).rebuild(connections[using])
+    return indexed
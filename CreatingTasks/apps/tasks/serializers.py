@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import TaskList, Task, Comment
+from .models import TaskList, Task, Comment, ArchivedTask
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -13,24 +13,67 @@ class TaskSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'task_list',
             'status', 'priority', 'due_date', 'completed_at',
             'created_at', 'updated_at', 'is_overdue', 'assigned_to',
-            'assigned_to_username', 'created_by_username'
+            'assigned_to_username', 'created_by_username', 'position', 'version',
+            'comments_count', 'last_activity_at'
+        ]
+        read_only_fields = [
+            'id', 'created_at', 'updated_at', 'completed_at', 'version',
+            'comments_count', 'last_activity_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'completed_at']
 
 
 class TaskListSerializer(serializers.ModelSerializer):
-    tasks = TaskSerializer(many=True, read_only=True)
+    tasks = serializers.SerializerMethodField()
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
-    members_count = serializers.IntegerField(source='members.count', read_only=True)
+    members_count = serializers.SerializerMethodField()
 
     class Meta:
         model = TaskList
         fields = [
             'id', 'name', 'slug', 'description', 'tasks',
             'created_by', 'created_by_username', 'members_count',
-            'color', 'is_archived', 'created_at', 'updated_at'
+            'color', 'is_archived', 'version', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'slug', 'created_by', 'version', 'created_at', 'updated_at']
+
+    @staticmethod
+    def _prefetched(obj, name):
+        return name in getattr(obj, '_prefetched_objects_cache', {})
+
+    def get_tasks(self, obj):
+        tasks = obj.tasks.all()
+        if not self._prefetched(obj, 'tasks'):
+            # После update DRF сбрасывает prefetch - без этого запрос на каждую задачу
+            tasks = tasks.select_related('created_by', 'assigned_to')
+        return TaskSerializer(tasks, many=True, context=self.context).data
+
+    def get_members_count(self, obj):
+        if self._prefetched(obj, 'members'):
+            return len(obj.members.all())
+        return obj.members.count()
+
+
+class TaskListSummarySerializer(serializers.ModelSerializer):
+    """Облегчённое представление списка: счётчики вместо вложенных задач"""
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+    tasks_count = serializers.IntegerField(read_only=True)
+    pending_count = serializers.IntegerField(read_only=True)
+    in_progress_count = serializers.IntegerField(read_only=True)
+    completed_count = serializers.IntegerField(read_only=True)
+    cancelled_count = serializers.IntegerField(read_only=True)
+    overdue_count = serializers.IntegerField(read_only=True)
+    members_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = TaskList
+        fields = [
+            'id', 'name', 'slug', 'description',
+            'created_by', 'created_by_username', 'members_count',
+            'tasks_count', 'pending_count', 'in_progress_count',
+            'completed_count', 'cancelled_count', 'overdue_count',
+            'color', 'is_archived', 'version', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
 
 
 class TaskCreateSerializer(serializers.ModelSerializer):
@@ -57,4 +100,74 @@ class CommentSerializer(serializers.ModelSerializer):
 class CommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
-        fields = ['content', 'task']
\ No newline at end of file
+        fields = ['content', 'task']
+
+
+class CommentUpdateSerializer(CommentSerializer):
+    """Правка комментария: задача задаётся только при создании"""
+
+    class Meta(CommentSerializer.Meta):
+        read_only_fields = CommentSerializer.Meta.read_only_fields + ['task']
+
+
+class ArchivedTaskSerializer(serializers.ModelSerializer):
+    assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = ArchivedTask
+        fields = [
+            'id', 'title', 'description', 'task_list',
+            'status', 'priority', 'due_date', 'completed_at',
+            'created_at', 'updated_at', 'archived_at', 'assigned_to',
+            'assigned_to_username', 'created_by_username'
+        ]
+        read_only_fields = fields
+
+
+class ArchivedTaskDetailSerializer(ArchivedTaskSerializer):
+    """Карточка архивной задачи вместе с её комментариями"""
+
+    class Meta(ArchivedTaskSerializer.Meta):
+        fields = ArchivedTaskSerializer.Meta.fields + ['comments']
+        read_only_fields = fields
+
+
+class TaskListBulkCreateItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaskList
+        fields = ['name', 'description', 'color']
+
+
+class TaskBulkCreateItemSerializer(serializers.Serializer):
+    # Связи принимаются как id и проверяются пачкой в apps.tasks.bulk,
+    # а не отдельным запросом на каждый элемент
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    task_list = serializers.IntegerField()
+    assigned_to = serializers.IntegerField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Task.PRIORITY_CHOICES, required=False)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class TaskBulkUpdateItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField(max_length=255, required=False)
+    description = serializers.CharField(required=False, allow_blank=True)
+    assigned_to = serializers.IntegerField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Task.PRIORITY_CHOICES, required=False)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class TaskBulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
+
+class TaskBulkMoveSerializer(TaskBulkIdsSerializer):
+    task_list = serializers.IntegerField()
+
+
+class TaskBulkArchiveSerializer(TaskBulkIdsSerializer):
+    is_archived = serializers.BooleanField(default=True)
@@ -0,0 +1,121 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, pre_delete, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import analytics, archive, changelog, comments, search
+from .caching import invalidate_lists
+from .membership import invalidate_membership
+from .models import TaskList, Task, Comment
+
+# Массовые операции (bulk_create/bulk_update/update) не вызывают post_save,
+# поэтому после коммита отправляется один сигнал на всю пачку:
+# sender=Task, action, task_ids, task_list_ids, actor_id
+# и, если были такие переходы, assigned_task_ids и completed_task_ids
+tasks_bulk_changed = Signal()
+
+
+@receiver(m2m_changed, sender=TaskList.members.through)
+def task_list_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Инвалидация кэша членства при изменении участников списка"""
+    if reverse:
+        # user.task_lists.add(...) - instance это пользователь
+        if action in ('post_add', 'post_remove'):
+            invalidate_membership([instance.pk])
+            invalidate_lists(pk_set or [])
+        elif action == 'pre_clear':
+            instance._cleared_list_ids = list(instance.task_lists.values_list('id', flat=True))
+        elif action == 'post_clear':
+            invalidate_membership([instance.pk])
+            invalidate_lists(getattr(instance, '_cleared_list_ids', []))
+        return
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_lists([instance.pk])
+
+    if action in ('post_add', 'post_remove'):
+        invalidate_membership(pk_set or [])
+    elif action == 'pre_clear':
+        instance._cleared_member_ids = list(instance.members.values_list('id', flat=True))
+    elif action == 'post_clear':
+        invalidate_membership(getattr(instance, '_cleared_member_ids', []))
+
+
+@receiver(pre_delete, sender=TaskList)
+def remember_task_list_members(sender, instance, **kwargs):
+    instance._deleted_member_ids = list(instance.members.values_list('id', flat=True))
+    instance._deleted_assignee_ids = analytics.list_assignee_ids(instance.pk)
+
+
+@receiver(post_delete, sender=TaskList)
+def task_list_deleted(sender, instance, **kwargs):
+    invalidate_membership(getattr(instance, '_deleted_member_ids', []))
+    invalidate_lists([instance.pk])
+    # Задачи списка удалены каскадом без поштучных дельт
+    analytics.rebuild(user_ids=getattr(instance, '_deleted_assignee_ids', []), existing_only=True)
+
+
+@receiver(post_save, sender=TaskList)
+def task_list_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        invalidate_lists([instance.pk])
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # Объект без _loaded_state, но с существующей строкой: прежнее состояние
+    # неизвестно, analytics пересчитает затронутые счётчики
+    previous = None if created else getattr(instance, '_loaded_state', {})
+    analytics.record_transition(previous, instance._tracked_state())
+    search.index_tasks([instance])
+    previous_list_id = getattr(instance, '_loaded_state', {}).get('task_list_id')
+    if previous_list_id is not None and previous_list_id != instance.task_list_id:
+        changelog.record_removal(previous_list_id, instance.pk)
+        invalidate_lists([previous_list_id])
+    changelog.record_change(instance, 'created' if created else 'updated')
+    invalidate_lists([instance.task_list_id])
+
+
+def _deleted_with_task_list(origin):
+    if isinstance(origin, TaskList):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is TaskList
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, origin=None, **kwargs):
+    # При удалении всего списка журнал удаляется вместе с ним,
+    # архивация обновляет журнал, кэш и аналитику сама, одним вызовом на пачку
+    if _deleted_with_task_list(origin) or archive.in_progress():
+        return
+    analytics.record_transition(getattr(instance, '_loaded_state', None) or instance._tracked_state(), None)
+    changelog.record_removal(instance.task_list_id, instance.pk)
+    invalidate_lists([instance.task_list_id])
+
+
+@receiver(tasks_bulk_changed)
+def tasks_bulk_changed_handler(sender, task_list_ids=(), **kwargs):
+    invalidate_lists(task_list_ids)
+
+
+def _deleted_with_task(origin):
+    if isinstance(origin, (Task, TaskList)):
+        return True
+    return isinstance(origin, QuerySet) and origin.model in (Task, TaskList)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, created=False, raw=False, origin=None, signal=None, **kwargs):
+    # Каскад от задачи или списка сбрасывает кэш сам, без запроса на каждый комментарий;
+    # поисковые записи комментариев удаляются вместе с записью задачи
+    if raw or _deleted_with_task(origin):
+        return
+    if signal is post_delete:
+        search.remove_comments([instance.pk])
+        task_list_ids = comments.comment_deleted(instance)
+    else:
+        search.index_comments([instance])
+        task_list_ids = comments.comment_saved(instance, created)
+    invalidate_lists(task_list_ids)
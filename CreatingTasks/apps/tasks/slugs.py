@@ -0,0 +1,97 @@
+"""Выделение уникальных slug для списков задач.
+
+Занятые slug с той же основой читаются одним запросом по уникальному
+индексу (slug = основа или slug LIKE 'основа-%'), свободные суффиксы
+считаются в Python. Гонку двух параллельных вставок ловит уникальный
+индекс: сохранение повторяется в savepoint с заново выбранным slug.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+SLUG_MAX_LENGTH = 255
+# Место под суффикс "-<число>"
+SUFFIX_RESERVE = 11
+MAX_ATTEMPTS = 5
+DEFAULT_BASE = 'list'
+# Не раздуваем OR-условие запроса на очень больших пачках
+BASES_PER_QUERY = 100
+
+
+def base_slug(name):
+    """slugify отбрасывает кириллицу, поэтому пустой результат заменяется на 'list'"""
+    base = slugify(name)[:SLUG_MAX_LENGTH - SUFFIX_RESERVE].strip('-')
+    return base or DEFAULT_BASE
+
+
+def _taken_suffixes(model, bases):
+    """{основа: множество занятых суффиксов}; 0 - сама основа без суффикса"""
+    taken = defaultdict(set)
+    bases = sorted(set(bases))
+    for start in range(0, len(bases), BASES_PER_QUERY):
+        chunk = bases[start:start + BASES_PER_QUERY]
+        condition = Q()
+        for base in chunk:
+            condition |= Q(slug=base) | Q(slug__startswith=f'{base}-')
+        chunk = set(chunk)
+        for slug in model.objects.filter(condition).values_list('slug', flat=True):
+            if slug in chunk:
+                taken[slug].add(0)
+            head, _, tail = slug.rpartition('-')
+            if tail.isdigit() and head in chunk:
+                taken[head].add(int(tail))
+    return taken
+
+
+def allocate_slugs(model, names):
+    """Свободные slug для списка имён в том же порядке, один запрос на 100 основ"""
+    bases = [base_slug(name) for name in names]
+    taken = _taken_suffixes(model, bases)
+    slugs = []
+    # Основа одного имени может совпасть со slug другого ("sprint-1")
+    allocated = set()
+    for base in bases:
+        used = taken[base]
+        suffix = 0
+        while True:
+            slug = f'{base}-{suffix}' if suffix else base
+            if suffix not in used and slug not in allocated:
+                break
+            suffix += 1
+        used.add(suffix)
+        allocated.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _is_slug_conflict(model, instances):
+    slugs = [instance.slug for instance in instances]
+    return model.objects.filter(slug__in=slugs).exists()
+
+
+def save_with_unique_slug(instance, save):
+    """Вызывает save() и при столкновении slug повторяет с новым значением"""
+    model = type(instance)
+    for attempt in range(MAX_ATTEMPTS):
+        instance.slug = allocate_slugs(model, [instance.name])[0]
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            if attempt == MAX_ATTEMPTS - 1 or not _is_slug_conflict(model, [instance]):
+                raise
+
+
+def bulk_create_with_unique_slugs(model, instances, batch_size=500):
+    """bulk_create с выделением slug всей пачке сразу и повтором при гонке"""
+    for attempt in range(MAX_ATTEMPTS):
+        for instance, slug in zip(instances, allocate_slugs(model, [i.name for i in instances])):
+            instance.slug = slug
+        try:
+            with transaction.atomic():
+                return model.objects.bulk_create(instances, batch_size=batch_size)
+        except IntegrityError:
+            if attempt == MAX_ATTEMPTS - 1 or not _is_slug_conflict(model, instances):
+                raise
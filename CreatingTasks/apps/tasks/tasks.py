@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from . import archive
+
+
+@shared_task(ignore_result=True)
+def archive_old_tasks():
+    """Периодическая задача Celery beat: перенос старых закрытых задач в архив"""
+    return archive.archive_old_tasks()
@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.tasks.models import Comment, SearchEntry, Task, TaskList
+from apps.users.models import User
+
+
+class CommentTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner')
+        self.stranger = User.objects.create_user('stranger')
+        self.task_list = self._task_list('Свой список', self.owner)
+        self.other_list = self._task_list('Чужой список', self.stranger)
+        self.task = Task.objects.create(title='Своя', task_list=self.task_list, created_by=self.owner)
+        self.other_task = Task.objects.create(title='Чужая', task_list=self.other_list, created_by=self.stranger)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def _task_list(self, name, user):
+        task_list = TaskList.objects.create(name=name, created_by=user)
+        task_list.members.add(user)
+        return task_list
+
+    def create_comment(self, task, content='Комментарий'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/tasks/comments/', {'task': task.pk, 'content': content}, format='json')
+        return response
+
+
+class CommentAccessTests(CommentTestCase):
+    def test_cannot_comment_in_foreign_list(self):
+        response = self.create_comment(self.other_task)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_update_cannot_move_comment_to_another_task(self):
+        self.create_comment(self.task)
+        comment_id = Comment.objects.get().pk
+        for method in ('patch', 'put'):
+            response = getattr(self.client, method)(
+                f'/api/tasks/comments/{comment_id}/',
+                {'task': self.other_task.pk, 'content': 'Правка'}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['task'], self.task.pk)
+        self.assertEqual(Comment.objects.get().task_id, self.task.pk)
+
+        stranger = APIClient()
+        stranger.force_authenticate(self.stranger)
+        response = stranger.get(f'/api/tasks/tasks/{self.other_task.pk}/comments/')
+        self.assertEqual(response.json()['results'], [])
+
+
+class CommentCounterTests(CommentTestCase):
+    """Task.comments_count и last_activity_at после создания, правки, переноса и удаления"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_list.members.add(self.owner)
+        cache.clear()
+        patcher = mock.patch('apps.tasks.comments.websocket_manager')
+        self.websocket_manager = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertCounters(self, task):
+        task.refresh_from_db()
+        comments = Comment.objects.filter(task=task)
+        self.assertEqual(task.comments_count, comments.count())
+        self.assertEqual(task.last_activity_at, comments.aggregate(last=Max('updated_at'))['last'])
+
+    def broadcasts(self):
+        events = [call.args for call in self.websocket_manager.broadcast_comment.call_args_list]
+        self.websocket_manager.reset_mock()
+        return [(task_list_id, event['type'], event['task_id'], event['comments_count'])
+                for task_list_id, event in events]
+
+    def test_counters_follow_comment_lifecycle(self):
+        self.create_comment(self.task, 'Первый')
+        self.create_comment(self.task, 'Второй')
+        first, second = Comment.objects.order_by('id')
+        self.assertCounters(self.task)
+        self.assertEqual(self.broadcasts(), [
+            (self.task_list.pk, 'comment_created', self.task.pk, 1),
+            (self.task_list.pk, 'comment_created', self.task.pk, 2),
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/tasks/comments/{first.pk}/', {'content': 'Правка'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(self.task)
+        self.assertEqual(self.broadcasts(), [(self.task_list.pk, 'comment_updated', self.task.pk, 2)])
+
+        # Перенос (админка): удаление из старой задачи, создание в новой
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.get(pk=second.pk)
+            comment.task = self.other_task
+            comment.save()
+        self.assertCounters(self.task)
+        self.assertCounters(self.other_task)
+        self.assertEqual(self.broadcasts(), [
+            (self.task_list.pk, 'comment_deleted', self.task.pk, 1),
+            (self.other_list.pk, 'comment_created', self.other_task.pk, 1),
+        ])
+
+        for comment, task, task_list in ((first, self.task, self.task_list),
+                                         (second, self.other_task, self.other_list)):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(f'/api/tasks/comments/{comment.pk}/')
+            self.assertEqual(response.status_code, 204)
+            self.assertCounters(task)
+            self.assertEqual(self.broadcasts(), [(task_list.pk, 'comment_deleted', task.pk, 0)])
+        self.assertIsNone(self.task.last_activity_at)
+
+    def test_move_updates_both_cached_task_pages(self):
+        self.create_comment(self.task)
+        comment = Comment.objects.get()
+        urls = [f'/api/tasks/tasks/{task.pk}/comments/' for task in (self.task, self.other_task)]
+        self.assertEqual([len(self.client.get(url).json()['results']) for url in urls], [1, 0])
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.task = self.other_task
+            comment.save()
+        self.assertEqual([len(self.client.get(url).json()['results']) for url in urls], [0, 1])
+        self.assertEqual(SearchEntry.objects.get(kind='comment').task_id, self.other_task.pk)
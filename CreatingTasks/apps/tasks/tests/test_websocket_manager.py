@@ -0,0 +1,100 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer
+from django.test import SimpleTestCase
+
+from apps.tasks.websocket_manager import WebSocketManager
+
+
+class WebSocketManagerTests(SimpleTestCase):
+    def setUp(self):
+        # Окно больше длительности теста: кадры уходят только по flush()
+        self.manager = WebSocketManager(coalesce_window=60)
+        self.manager.channel_layer = self.layer = InMemoryChannelLayer()
+        self.channels = {}
+        for task_list_id in (1, 2):
+            channel = async_to_sync(self.layer.new_channel)()
+            async_to_sync(self.layer.group_add)(f'tasks_{task_list_id}', channel)
+            self.channels[task_list_id] = channel
+
+    def frames(self, task_list_id=1):
+        self.manager.flush()
+
+        async def drain():
+            frames = []
+            while True:
+                try:
+                    message = await asyncio.wait_for(self.layer.receive(self.channels[task_list_id]), 0.05)
+                except asyncio.TimeoutError:
+                    return frames
+                self.assertEqual(message['type'], 'task_update')
+                frames.append(message['data'])
+
+        return async_to_sync(drain)()
+
+    def test_last_write_wins_per_task(self):
+        self.manager.broadcast_task_update(1, {'id': 5, 'title': 'Старое'}, version=3)
+        self.manager.broadcast_task_update(1, {'id': 5, 'title': 'Новое'}, version=4)
+        self.assertEqual(self.frames(), [{
+            'type': 'task_updated', 'task': {'id': 5, 'title': 'Новое'}, 'version': 4, 'from_version': 3,
+        }])
+        self.assertEqual(self.manager.get_metrics()['events_coalesced'], 1)
+
+    def test_created_then_updated_is_sent_as_created(self):
+        self.manager.broadcast_task_creation(1, {'id': 5, 'title': 'Черновик'}, version=1)
+        self.manager.broadcast_task_update(1, {'id': 5, 'title': 'Готово'}, version=2)
+        self.manager.broadcast_comment(1, {'type': 'comment_created', 'comment_id': 9, 'task_id': 5})
+        self.manager.broadcast_comment(1, {'type': 'comment_updated', 'comment_id': 9, 'task_id': 5})
+        [frame] = self.frames()
+        self.assertEqual(frame['events'], [
+            {'type': 'task_created', 'task': {'id': 5, 'title': 'Готово'}, 'version': 2, 'from_version': 1},
+            {'type': 'comment_created', 'comment_id': 9, 'task_id': 5},
+        ])
+
+    def test_deleted_after_created_keeps_deleted(self):
+        self.manager.broadcast_task_creation(1, {'id': 5}, version=1)
+        self.manager.broadcast_task_deletion(1, 5, version=2)
+        self.assertEqual(self.frames(), [
+            {'type': 'task_deleted', 'task_id': 5, 'version': 2, 'from_version': 1},
+        ])
+
+    def test_comment_events_do_not_displace_task_events(self):
+        self.manager.broadcast_task_update(1, {'id': 5}, version=7)
+        self.manager.broadcast_comment(1, {'type': 'comment_deleted', 'comment_id': 9, 'task_id': 5})
+        [frame] = self.frames()
+        self.assertEqual([event['type'] for event in frame['events']], ['task_updated', 'comment_deleted'])
+
+    def test_batch_carries_version_range(self):
+        self.manager.broadcast_task_update(1, {'id': 1}, version=3)
+        self.manager.broadcast_task_update(1, {'id': 2}, version=4)
+        self.manager.broadcast_task_update(1, {'id': 1}, version=5)
+        self.manager.broadcast_comment(1, {'type': 'comment_created', 'comment_id': 9, 'task_id': 2})
+        [frame] = self.frames()
+        self.assertEqual(frame['type'], 'batch')
+        self.assertEqual((frame['from_version'], frame['version']), (3, 5))
+        # Заменённое событие уходит на место последнего
+        self.assertEqual(
+            [(event['type'], event.get('from_version'), event.get('version')) for event in frame['events']],
+            [('task_updated', None, 4), ('task_updated', 3, 5), ('comment_created', None, None)],
+        )
+
+    def test_bulk_events_are_not_coalesced(self):
+        self.manager.broadcast_bulk_update(1, 'complete', [1, 2], version=8)
+        self.manager.broadcast_bulk_update(1, 'delete', [3], version=9)
+        [frame] = self.frames()
+        self.assertEqual([event['action'] for event in frame['events']], ['complete', 'delete'])
+        self.assertEqual((frame['from_version'], frame['version']), (8, 9))
+
+    def test_groups_get_separate_frames(self):
+        self.manager.broadcast_task_update(1, {'id': 1}, version=3)
+        self.manager.broadcast_task_update(2, {'id': 2}, version=10)
+        self.manager.flush()
+        self.assertEqual(self.frames(1), [{'type': 'task_updated', 'task': {'id': 1}, 'version': 3}])
+        self.assertEqual(self.frames(2), [{'type': 'task_updated', 'task': {'id': 2}, 'version': 10}])
+
+    def test_zero_window_sends_immediately(self):
+        self.manager.coalesce_window = 0
+        self.manager.broadcast_task_update(1, {'id': 1}, version=3)
+        self.manager.broadcast_task_update(1, {'id': 1}, version=4)
+        self.assertEqual([frame['version'] for frame in self.frames()], [3, 4])
@@ -0,0 +1,229 @@
+"""Потоковый экспорт и импорт в JSONL и CSV.
+
+Экспорт читает queryset через .iterator(chunk_size) и отдаёт
+StreamingHttpResponse кусками по CHUNK_SIZE записей, поэтому память не
+зависит от размера выгрузки. Формат записей задач - тот же, что у API
+(apps.tasks.fast_serializers).
+
+Импорт задач читает тело запроса построчно и создаёт задачи пачками по
+IMPORT_BATCH_SIZE через bulk.bulk_create_tasks, каждая пачка - своя
+транзакция. Ошибки строк попадают в отчёт и не прерывают остальные.
+"""
+import codecs
+import csv
+import io
+from itertools import islice
+
+import orjson
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from . import bulk
+from .fast_serializers import serialize_task_rows, task_rows
+from .membership import get_user_list_ids
+from .serializers import TaskBulkCreateItemSerializer
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+DEFAULT_FORMAT = 'jsonl'
+CHUNK_SIZE = 1000
+IMPORT_BATCH_SIZE = 500
+# Отчёт об ошибках не растёт вместе с файлом
+MAX_REPORTED_ERRORS = 1000
+
+LIST_FIELDS = [
+    'id', 'name', 'slug', 'description', 'color', 'is_archived',
+    'created_by', 'created_at', 'updated_at',
+]
+TASK_FIELDS = [
+    'id', 'title', 'description', 'task_list', 'status', 'priority',
+    'due_date', 'completed_at', 'created_at', 'updated_at', 'is_overdue',
+    'assigned_to', 'assigned_to_username', 'created_by_username', 'position', 'version',
+    'comments_count', 'last_activity_at',
+]
+COMMENT_FIELDS = [
+    'id', 'task', 'author', 'author_username', 'content', 'created_at', 'updated_at',
+]
+
+_to_datetime = serializers.DateTimeField().to_representation
+
+
+def parse_format(value):
+    value = (value or DEFAULT_FORMAT).lower()
+    if value not in FORMATS:
+        raise ValidationError({'fmt': f"Ожидается один из форматов: {', '.join(FORMATS)}"})
+    return value
+
+
+def _chunks(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _jsonl(chunks):
+    for items in chunks:
+        yield b''.join(orjson.dumps(item) + b'\n' for item in items)
+
+
+def _csv(chunks, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fields, extrasaction='ignore')
+    writer.writeheader()
+    for items in chunks:
+        writer.writerows(items)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Пустая выгрузка - только заголовок
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _response(chunks, fmt, fields, filename):
+    content = _jsonl(chunks) if fmt == 'jsonl' else _csv(chunks, fields)
+    response = StreamingHttpResponse(content, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def export_task_lists(queryset, fmt):
+    rows = queryset.order_by('id').values(
+        'id', 'name', 'slug', 'description', 'color', 'is_archived',
+        'created_by_id', 'created_at', 'updated_at',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+    def chunks():
+        for chunk in _chunks(rows):
+            for row in chunk:
+                row['created_by'] = row.pop('created_by_id')
+                row['created_at'] = _to_datetime(row['created_at'])
+                row['updated_at'] = _to_datetime(row['updated_at'])
+            yield chunk
+
+    return _response(chunks(), fmt, LIST_FIELDS, 'task_lists')
+
+
+def export_tasks(queryset, fmt):
+    rows = task_rows(queryset).iterator(chunk_size=CHUNK_SIZE)
+    chunks = (serialize_task_rows(chunk) for chunk in _chunks(rows))
+    return _response(chunks, fmt, TASK_FIELDS, 'tasks')
+
+
+def export_comments(queryset, fmt):
+    rows = queryset.order_by('created_at', 'id').values(
+        'id', 'task_id', 'author_id', 'author__username', 'content', 'created_at', 'updated_at',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+    def chunks():
+        for chunk in _chunks(rows):
+            yield [
+                {
+                    'id': row['id'],
+                    'task': row['task_id'],
+                    'author': row['author_id'],
+                    'author_username': row['author__username'],
+                    'content': row['content'],
+                    'created_at': _to_datetime(row['created_at']),
+                    'updated_at': _to_datetime(row['updated_at']),
+                }
+                for row in chunk
+            ]
+
+    return _response(chunks(), fmt, COMMENT_FIELDS, 'comments')
+
+
+def read_lines(stream):
+    """Строки файла или тела запроса по одной; BOM в начале отбрасывается"""
+    return codecs.iterdecode(iter(stream.readline, b''), 'utf-8-sig')
+
+
+def _records(lines, fmt):
+    """(номер строки, запись, ошибка) по одной записи за раз"""
+    if fmt == 'jsonl':
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                yield number, None, 'Некорректный JSON'
+                continue
+            if not isinstance(record, dict):
+                yield number, None, 'Ожидается JSON-объект'
+                continue
+            yield number, record, None
+        return
+    reader = csv.DictReader(lines)
+    for record in reader:
+        # Пустые ячейки - значения по умолчанию; лишние колонки без заголовка отбрасываются
+        yield reader.line_num, {key: value for key, value in record.items() if key and value}, None
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+
+def _flush(user, batch, report):
+    if not batch:
+        return
+    allowed = get_user_list_ids(user.pk)
+    assignee_ids = {item['assigned_to'] for _, item in batch if item.get('assigned_to')}
+    existing = set(
+        get_user_model().objects.filter(id__in=assignee_ids).values_list('id', flat=True)
+    ) if assignee_ids else set()
+    items = []
+    for line, item in batch:
+        if item['task_list'] not in allowed:
+            report.error(line, {'task_list': f"Нет доступа к списку {item['task_list']}"})
+        elif item.get('assigned_to') and item['assigned_to'] not in existing:
+            report.error(line, {'assigned_to': f"Пользователь не найден: {item['assigned_to']}"})
+        else:
+            items.append(item)
+    if items:
+        report.created += len(bulk.bulk_create_tasks(user, items))
+
+
+def import_tasks(user, lines, fmt, task_list_id=None):
+    """Создаёт задачи из строк JSONL/CSV. task_list_id подменяет task_list
+    всех записей (например, загрузка выгрузки в другой список)"""
+    report = ImportReport()
+    batch = []
+    try:
+        for line, record, error in _records(lines, fmt):
+            if error:
+                report.error(line, error)
+                continue
+            if task_list_id is not None:
+                record['task_list'] = task_list_id
+            serializer = TaskBulkCreateItemSerializer(data=record)
+            if not serializer.is_valid():
+                report.error(line, serializer.errors)
+                continue
+            batch.append((line, serializer.validated_data))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                _flush(user, batch, report)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Дальше файл не читается; уже созданные пачки остаются
+        report.error(None, f'Файл не разобран до конца: {e}')
+    _flush(user, batch, report)
+    return report.as_dict()
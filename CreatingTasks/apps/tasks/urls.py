@@ -6,6 +6,8 @@ router = DefaultRouter()
 router.register(r'lists', views.TaskListViewSet)
 router.register(r'tasks', views.TaskViewSet)
 router.register(r'comments', views.CommentViewSet, basename='comment')
+router.register(r'search', views.SearchViewSet, basename='search')
+router.register(r'archive', views.ArchivedTaskViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,57 +1,377 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F, Prefetch
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import TaskList, Task, Comment
-from .serializers import TaskListSerializer, TaskSerializer, CommentSerializer, CommentCreateSerializer
+from rest_framework.renderers import BrowsableAPIRenderer
+from CreatingTasks.database import ReplicaReadMixin
+from .actors import ActingUserMixin
+from .models import TaskList, Task, Comment, ArchivedTask
+from .membership import get_user_list_ids, is_member
+from .permissions import IsTaskListMember
+from .pagination import TaskCursorPagination, CommentCursorPagination
+from .filters import TaskFilterBackend, TaskOrderingFilter
+from .serializers import (
+    TaskListSerializer, TaskListSummarySerializer, TaskListBulkCreateItemSerializer, TaskSerializer,
+    CommentSerializer, CommentCreateSerializer, CommentUpdateSerializer,
+    ArchivedTaskSerializer, ArchivedTaskDetailSerializer,
+    TaskBulkCreateItemSerializer, TaskBulkUpdateItemSerializer,
+    TaskBulkIdsSerializer, TaskBulkMoveSerializer, TaskBulkArchiveSerializer
+)
+from . import analytics, bulk, changelog, search, transfer
+from .caching import CachedResponseMixin
+from .fast_serializers import serialize_task_rows, serialize_tasks, task_rows
+from .renderers import FastJSONRenderer
 
-class TaskListViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class BulkRequestMixin:
+    # Размер проверяется до сериализатора: иначе огромный запрос целиком
+    # проходит валидацию, прежде чем будет отклонён
+
+    def _bulk_items(self, serializer_class):
+        data = self.request.data
+        if isinstance(data, list):
+            if not data:
+                raise ValidationError('Пустой список')
+            if len(data) > bulk.MAX_BULK_SIZE:
+                raise ValidationError(f'Не больше {bulk.MAX_BULK_SIZE} элементов за запрос')
+        serializer = serializer_class(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def _bulk_params(self, serializer_class):
+        data = self.request.data
+        ids = data.get('ids') if isinstance(data, dict) else None
+        if isinstance(ids, list) and len(ids) > bulk.MAX_BULK_SIZE:
+            raise ValidationError({'ids': f'Не больше {bulk.MAX_BULK_SIZE} элементов за запрос'})
+        serializer = serializer_class(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+
+class TaskListViewSet(ActingUserMixin, ReplicaReadMixin, BulkRequestMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, IsTaskListMember]
     serializer_class = TaskListSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     queryset = TaskList.objects.all()  # Добавьте эту строку
+    # Вложенный /lists/{id}/tasks/ по умолчанию скрывает архивные задачи
+    default_archived_filter = 'false'
 
     def get_queryset(self):
-        return TaskList.objects.filter(
-            members=self.request.user
-        ).prefetch_related('tasks', 'members')
+        queryset = TaskList.objects.filter(
+            id__in=get_user_list_ids(self.request.user.pk)
+        ).select_related('created_by')
+        if self.action == 'list':
+            # Список отдаёт только счётчики, задачи грузятся через /lists/{id}/tasks/
+            return queryset.with_summary().order_by('-created_at')
+        if self.action in ('retrieve', 'update', 'partial_update'):
+            return queryset.prefetch_related(
+                Prefetch('tasks', queryset=Task.objects.select_related('created_by', 'assigned_to')),
+                'members'
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return TaskListSummarySerializer
+        if self.action == 'tasks':
+            return TaskSerializer
+        return TaskListSerializer
 
     def perform_create(self, serializer):
         task_list = serializer.save(created_by=self.request.user)
         task_list.members.add(self.request.user)
 
-class TaskViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+    def _member_list_id(self):
+        """id списка из URL, если пользователь в нём состоит, иначе None"""
+        list_id = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return int(list_id) if is_member(self.request.user.pk, list_id) else None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            get_user_list_ids(request.user.pk),
+            lambda: super(TaskListViewSet, self).list(request, *args, **kwargs).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        list_id = self._member_list_id()
+        if list_id is None:
+            # 404 отдаёт обычный путь
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(
+            [list_id], lambda: super(TaskListViewSet, self).retrieve(request, *args, **kwargs).data
+        )
+
+    @action(detail=True, methods=['get'])
+    def tasks(self, request, pk=None):
+        """Постраничная выдача задач одного списка"""
+        list_id = self._member_list_id()
+        if list_id is None:
+            self.get_object()
+        return self.cached_response([list_id], lambda: self._tasks_page(list_id))
+
+    def _tasks_page(self, list_id):
+        queryset = Task.objects.filter(task_list_id=list_id)
+        queryset = TaskFilterBackend().filter_queryset(self.request, queryset, self)
+
+        paginator = TaskCursorPagination()
+        page = paginator.paginate_queryset(task_rows(queryset), self.request, view=self)
+        return paginator.get_paginated_response(serialize_task_rows(page)).data
+
+    @action(detail=False, methods=['post'], url_path='bulk/create')
+    def bulk_create(self, request):
+        """Импорт нескольких списков одним запросом"""
+        task_lists = bulk.bulk_create_task_lists(
+            request.user, self._bulk_items(TaskListBulkCreateItemSerializer)
+        )
+        return Response(
+            {'created': [{'id': task_list.pk, 'slug': task_list.slug} for task_list in task_lists]},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """Счётчики по статусам и приоритетам, доля и среднее время выполнения, просрочка"""
+        list_id = self._member_list_id()
+        if list_id is None:
+            self.get_object()
+        return Response(analytics.task_list_analytics(list_id))
+
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        """Изменения списка после версии since (или снимок, если журнал обрезан)"""
+        task_list = self.get_object()
+        since = request.query_params.get('since')
+        if since is not None and not since.isdigit():
+            raise ValidationError({'since': 'Ожидается номер версии'})
+        return Response(changelog.changes_since(task_list.pk, int(since) if since else None))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потоковая выгрузка списков пользователя: ?fmt=jsonl|csv"""
+        fmt = transfer.parse_format(request.query_params.get('fmt'))
+        return transfer.export_task_lists(self.get_queryset(), fmt)
+
+class TaskViewSet(ActingUserMixin, ReplicaReadMixin, BulkRequestMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, IsTaskListMember]
     serializer_class = TaskSerializer
+    pagination_class = TaskCursorPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    filter_backends = [TaskFilterBackend, TaskOrderingFilter]
+    ordering = TaskCursorPagination.ordering
     queryset = Task.objects.all()  # Добавьте эту строку
+    MY_TASKS_LIMIT = 100
 
     def get_queryset(self):
         return Task.objects.filter(
-            task_list__members=self.request.user
+            task_list_id__in=get_user_list_ids(self.request.user.pk)
         ).select_related('task_list', 'created_by', 'assigned_to')
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(get_user_list_ids(request.user.pk), self._tasks_page)
+
+    def _tasks_page(self):
+        # Выдача строится из .values() без TaskSerializer, формат тот же
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(task_rows(queryset))
+        return self.get_paginated_response(serialize_task_rows(page)).data
+
+    def retrieve(self, request, *args, **kwargs):
+        task = self.get_object()
+
+        def build():
+            # Задача могла прийти с реплики, а в кэш попадает только копия с основной базы
+            obj = task if task._state.db == DEFAULT_DB_ALIAS else self.get_object()
+            return self.get_serializer(obj).data
+
+        return self.cached_response([task.task_list_id], build)
+
     def perform_create(self, serializer):
+        if not is_member(self.request.user.pk, serializer.validated_data['task_list'].pk):
+            raise PermissionDenied('Вы не участник этого списка задач')
         serializer.save(created_by=self.request.user)
 
+    def perform_update(self, serializer):
+        task_list = serializer.validated_data.get('task_list')
+        if task_list is not None and not is_member(self.request.user.pk, task_list.pk):
+            raise PermissionDenied('Вы не участник этого списка задач')
+        serializer.save()
+
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         task = self.get_object()
         task.mark_as_completed()
         return Response({'status': 'task completed'})
 
-class CommentViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get', 'post'])
+    def comments(self, request, pk=None):
+        """Комментарии одной задачи в хронологическом порядке (курсор по created_at, id)
+        и добавление нового"""
+        task = self.get_object()
+        if request.method == 'POST':
+            serializer = CommentCreateSerializer(data={'task': task.pk, 'content': request.data.get('content')})
+            serializer.is_valid(raise_exception=True)
+            comment = serializer.save(author=request.user)
+            return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
+        return self.cached_response([task.task_list_id], lambda: self._comments_page(task))
+
+    def _comments_page(self, task):
+        queryset = Comment.objects.filter(task_id=task.pk).select_related('author')
+        paginator = CommentCursorPagination()
+        # Без view: иначе курсор взял бы порядок задач из TaskOrderingFilter
+        page = paginator.paginate_queryset(queryset, self.request)
+        return paginator.get_paginated_response(CommentSerializer(page, many=True).data).data
+
+    @action(detail=False, methods=['get'])
+    def my_tasks(self, request):
+        """Открытые задачи текущего пользователя одним ответом (для бота)"""
+        tasks = self.get_queryset().filter(
+            assigned_to=request.user, is_archived=False
+        ).exclude(status__in=Task.CLOSED_STATUSES).order_by(
+            F('due_date').asc(nulls_last=True), '-created_at', '-id'
+        )[:self.MY_TASKS_LIMIT]
+        return Response(serialize_tasks(tasks))
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """Та же аналитика по задачам, назначенным текущему пользователю"""
+        return Response(analytics.user_analytics(request.user.pk))
+
+    @action(detail=False, methods=['post'], url_path='bulk/create')
+    def bulk_create(self, request):
+        tasks = bulk.bulk_create_tasks(request.user, self._bulk_items(TaskBulkCreateItemSerializer))
+        return Response({'created': [task.pk for task in tasks]}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk/update')
+    def bulk_update(self, request):
+        items = self._bulk_items(TaskBulkUpdateItemSerializer)
+        tasks = bulk.bulk_update_tasks(request.user, items)
+        return Response({'updated': [task.pk for task in tasks]})
+
+    @action(detail=False, methods=['post'], url_path='bulk/complete')
+    def bulk_complete(self, request):
+        params = self._bulk_params(TaskBulkIdsSerializer)
+        tasks = bulk.bulk_complete_tasks(request.user, params['ids'])
+        return Response({'completed': [task.pk for task in tasks]})
+
+    @action(detail=False, methods=['post'], url_path='bulk/move')
+    def bulk_move(self, request):
+        params = self._bulk_params(TaskBulkMoveSerializer)
+        tasks = bulk.bulk_move_tasks(request.user, params['ids'], params['task_list'])
+        return Response({'moved': [task.pk for task in tasks]})
+
+    @action(detail=False, methods=['post'], url_path='bulk/archive')
+    def bulk_archive(self, request):
+        params = self._bulk_params(TaskBulkArchiveSerializer)
+        tasks = bulk.bulk_archive_tasks(request.user, params['ids'], params['is_archived'])
+        return Response({'archived' if params['is_archived'] else 'unarchived': [task.pk for task in tasks]})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потоковая выгрузка задач с теми же фильтрами, что у списка: ?fmt=jsonl|csv"""
+        fmt = transfer.parse_format(request.query_params.get('fmt'))
+        return transfer.export_tasks(self.filter_queryset(self.get_queryset()), fmt)
+
+    @action(detail=False, methods=['post'], url_path='import', url_name='import')
+    def import_tasks(self, request):
+        """Импорт задач из JSONL или CSV: файл в поле file (multipart) или тело
+        запроса целиком. ?task_list=<id> кладёт все задачи в этот список.
+        Ошибочные строки пропускаются и перечисляются в ответе"""
+        fmt = transfer.parse_format(request.query_params.get('fmt'))
+        task_list = request.query_params.get('task_list')
+        if task_list is not None:
+            if not task_list.isdigit():
+                raise ValidationError({'task_list': 'Ожидается id списка'})
+            if not is_member(request.user.pk, task_list):
+                raise PermissionDenied('Вы не участник этого списка задач')
+            task_list = int(task_list)
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ValidationError({'file': 'Файл не передан'})
+            stream = upload
+        else:
+            # Тело читается по строкам, без request.data
+            stream = request.stream
+            if stream is None:
+                raise ValidationError('Пустое тело запроса')
+        report = transfer.import_tasks(request.user, transfer.read_lines(stream), fmt, task_list)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+class ArchivedTaskViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    """Задачи, перенесённые в архив (apps.tasks.archive), только чтение.
+    ?task_list=<id> - архив одного списка"""
+    permission_classes = [IsAuthenticated, IsTaskListMember]
+    serializer_class = ArchivedTaskSerializer
+    pagination_class = TaskCursorPagination
+    queryset = ArchivedTask.objects.all()
+
+    def get_queryset(self):
+        queryset = ArchivedTask.objects.filter(
+            task_list_id__in=get_user_list_ids(self.request.user.pk)
+        ).select_related('created_by', 'assigned_to')
+        if self.action != 'list':
+            return queryset
+        task_list = self.request.query_params.get('task_list')
+        if task_list:
+            if not task_list.isdigit():
+                raise ValidationError({'task_list': 'Ожидается id списка'})
+            queryset = queryset.filter(task_list_id=task_list)
+        # Комментарии отдаются только в карточке задачи
+        return queryset.defer('comments')
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ArchivedTaskDetailSerializer
+        return ArchivedTaskSerializer
+
+class SearchViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """Полнотекстовый поиск по задачам и комментариям списков пользователя"""
     permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'Пустой поисковый запрос'})
+        limit = request.query_params.get('limit', str(search.DEFAULT_LIMIT))
+        if not limit.isdigit() or not 0 < int(limit) <= search.MAX_LIMIT:
+            raise ValidationError({'limit': f'Ожидается число от 1 до {search.MAX_LIMIT}'})
+        results = search.search(query, get_user_list_ids(request.user.pk), int(limit))
+        return Response({'query': query, 'results': results})
+
+class CommentViewSet(ActingUserMixin, ReplicaReadMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, IsTaskListMember]
     serializer_class = CommentSerializer
+    pagination_class = CommentCursorPagination
     queryset = Comment.objects.all()  # Добавьте эту строку
 
     def get_queryset(self):
         return Comment.objects.filter(
-            task__task_list__members=self.request.user
+            task__task_list_id__in=get_user_list_ids(self.request.user.pk)
         ).select_related('author', 'task')
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CommentCreateSerializer
+        if self.action in ('update', 'partial_update'):
+            return CommentUpdateSerializer
         return CommentSerializer
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
\ No newline at end of file
+        if not is_member(self.request.user.pk, serializer.validated_data['task'].task_list_id):
+            raise PermissionDenied('Вы не участник этого списка задач')
+        serializer.save(author=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потоковая выгрузка комментариев: ?fmt=jsonl|csv, ?task=<id>, ?task_list=<id>"""
+        fmt = transfer.parse_format(request.query_params.get('fmt'))
+        queryset = self.get_queryset()
+        for param, field in (('task', 'task_id'), ('task_list', 'task__task_list_id')):
+            value = request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: 'Ожидается id'})
+                queryset = queryset.filter(**{field: value})
+        return transfer.export_comments(queryset, fmt)
\ No newline at end of file
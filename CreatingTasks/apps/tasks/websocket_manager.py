@@ -1,67 +1,265 @@
-import json
+import asyncio
+import atexit
+import itertools
 import logging
-from typing import Dict, Set
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from django.conf import settings
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
 logger = logging.getLogger(__name__)
 
 
-class WebSocketManager:
-    """Класс для управления WebSocket соединениями в CreatingTasks"""
+class BroadcastMetrics:
+    """Метрики исходящей очереди WebSocket"""
 
     def __init__(self):
+        self._lock = threading.Lock()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.events_enqueued = 0
+        self.events_coalesced = 0
+        self.frames_sent = 0
+        self.flushes = 0
+        self.errors = 0
+        self.last_flush_latency_ms = 0.0
+        self.max_flush_latency_ms = 0.0
+        self._total_flush_latency_ms = 0.0
+
+    def enqueued(self, depth: int, coalesced: bool):
+        with self._lock:
+            self.events_enqueued += 1
+            if coalesced:
+                self.events_coalesced += 1
+            self.queue_depth = depth
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def flushed(self, frames: int, latency_ms: float):
+        with self._lock:
+            self.queue_depth = 0
+            self.flushes += 1
+            self.frames_sent += frames
+            self.last_flush_latency_ms = latency_ms
+            self.max_flush_latency_ms = max(self.max_flush_latency_ms, latency_ms)
+            self._total_flush_latency_ms += latency_ms
+
+    def failed(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'events_enqueued': self.events_enqueued,
+                'events_coalesced': self.events_coalesced,
+                'frames_sent': self.frames_sent,
+                'flushes': self.flushes,
+                'errors': self.errors,
+                'last_flush_latency_ms': round(self.last_flush_latency_ms, 3),
+                'max_flush_latency_ms': round(self.max_flush_latency_ms, 3),
+                'avg_flush_latency_ms': round(
+                    self._total_flush_latency_ms / self.flushes, 3
+                ) if self.flushes else 0.0,
+            }
+
+
+class WebSocketManager:
+    """Класс для управления WebSocket соединениями в CreatingTasks
+
+    Обновления задач не отправляются из потока запроса: они складываются
+    в очередь по группам tasks_{id}, схлопываются по id задачи (побеждает
+    последнее событие) и раз в WEBSOCKET_COALESCE_WINDOW секунд уходят
+    одним кадром на группу из фонового event loop.
+
+    Схлопнутое событие с версией журнала несёт from_version - первую
+    версию, которую оно заменило; кадр batch - общий диапазон
+    from_version..version своих событий. Версии внутри диапазона клиент
+    не считает пропущенными и sync из-за них не запрашивает.
+    """
+
+    CREATED_UPDATED = {('task_created', 'task_updated'), ('comment_created', 'comment_updated')}
+
+    def __init__(self, coalesce_window: Optional[float] = None):
         self.channel_layer = get_channel_layer()
+        if coalesce_window is None:
+            coalesce_window = getattr(settings, 'WEBSOCKET_COALESCE_WINDOW', 0.05)
+        self.coalesce_window = coalesce_window
+        self.metrics = BroadcastMetrics()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, OrderedDict] = {}
+        self._first_enqueued_at: Optional[float] = None
+        self._flush_scheduled = False
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
 
     def send_task_update(self, task_list_id: int, data: Dict):
         """Отправка обновления задачи всем подключенным клиентам"""
-        try:
-            async_to_sync(self.channel_layer.group_send)(
-                f'tasks_{task_list_id}',
-                {
-                    'type': 'task_update',
-                    'data': data
-                }
-            )
-            logger.info(f"Task update sent to group tasks_{task_list_id}")
-        except Exception as e:
-            logger.error(f"Error sending task update: {e}")
+        group = f'tasks_{task_list_id}'
+        if self.coalesce_window <= 0:
+            self._send_now(group, 'task_update', data)
+            return
+
+        key = self._coalesce_key(data)
+        with self._lock:
+            events = self._pending.setdefault(group, OrderedDict())
+            previous = events.pop(key, None)
+            if previous is not None and (previous.get('type'), data.get('type')) in self.CREATED_UPDATED:
+                # Клиент ещё не видел задачу (комментарий) - отправляем как создание
+                data = dict(data, type=previous['type'])
+            if previous is not None and data.get('version') is not None:
+                first = previous.get('from_version', previous.get('version'))
+                if first is not None:
+                    data = dict(data, from_version=first)
+            events[key] = data
+            depth = sum(len(group_events) for group_events in self._pending.values())
+            if self._first_enqueued_at is None:
+                self._first_enqueued_at = time.monotonic()
+            schedule = not self._flush_scheduled
+            self._flush_scheduled = True
+        self.metrics.enqueued(depth, coalesced=previous is not None)
+
+        if schedule:
+            loop = self._ensure_loop()
+            loop.call_soon_threadsafe(self._schedule_flush)
 
     def send_notification(self, user_id: int, notification_data: Dict):
         """Отправка уведомления конкретному пользователю"""
+        group = f'notifications_{user_id}'
+        if self.coalesce_window <= 0:
+            self._send_now(group, 'send_notification', notification_data)
+            return
+        asyncio.run_coroutine_threadsafe(
+            self._group_send(group, 'send_notification', notification_data),
+            self._ensure_loop()
+        )
+
+    def flush(self, timeout: float = 5.0):
+        """Синхронно отправляет всё накопленное (для тестов и остановки)"""
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._flush(), self._loop)
+        future.result(timeout)
+
+    def get_metrics(self) -> Dict:
+        return self.metrics.snapshot()
+
+    def _coalesce_key(self, data: Dict):
+        # События комментария не должны вытеснять события его задачи
+        if data.get('comment_id') is not None:
+            return f"comment:{data['comment_id']}"
+        task = data.get('task')
+        task_id = task.get('id') if isinstance(task, dict) else data.get('task_id')
+        if task_id is not None:
+            return f'task:{task_id}'
+        # Агрегированные события не схлопываются
+        return f'event:{next(self._sequence)}'
+
+    def _send_now(self, group: str, event_type: str, data: Dict):
+        try:
+            async_to_sync(self.channel_layer.group_send)(group, {'type': event_type, 'data': data})
+            logger.debug(f"{event_type} sent to group {group}")
+        except Exception as e:
+            self.metrics.failed()
+            logger.error(f"Error sending {event_type} to {group}: {e}")
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='websocket-broadcast', daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+            return self._loop
+
+    def _schedule_flush(self):
+        self._loop.call_later(
+            self.coalesce_window, lambda: self._loop.create_task(self._flush())
+        )
+
+    async def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            started_at, self._first_enqueued_at = self._first_enqueued_at, None
+            self._flush_scheduled = False
+        if not pending:
+            return
+
+        frames = 0
+        for group, events in pending.items():
+            events = list(events.values())
+            if len(events) == 1:
+                data = events[0]
+            else:
+                data = {'type': 'batch', 'events': events}
+                versions = [
+                    version for event in events
+                    for version in (event.get('from_version'), event.get('version')) if version is not None
+                ]
+                if versions:
+                    data['from_version'], data['version'] = min(versions), max(versions)
+            if await self._group_send(group, 'task_update', data):
+                frames += 1
+
+        latency_ms = (time.monotonic() - started_at) * 1000 if started_at else 0.0
+        self.metrics.flushed(frames, latency_ms)
+        logger.debug(f"Flushed {frames} frame(s) in {latency_ms:.1f} ms")
+
+    async def _group_send(self, group: str, event_type: str, data: Dict) -> bool:
         try:
-            async_to_sync(self.channel_layer.group_send)(
-                f'notifications_{user_id}',
-                {
-                    'type': 'send_notification',
-                    'data': notification_data
-                }
-            )
-            logger.info(f"Notification sent to user {user_id}")
+            await self.channel_layer.group_send(group, {'type': event_type, 'data': data})
+            return True
         except Exception as e:
-            logger.error(f"Error sending notification: {e}")
+            self.metrics.failed()
+            logger.error(f"Error sending {event_type} to {group}: {e}")
+            return False
 
-    def broadcast_task_creation(self, task_list_id: int, task_data: Dict):
+    def broadcast_task_creation(self, task_list_id: int, task_data: Dict, version: Optional[int] = None):
         """Широковещательная рассылка о создании новой задачи"""
         self.send_task_update(task_list_id, {
             'type': 'task_created',
-            'task': task_data
+            'task': task_data,
+            'version': version
         })
 
-    def broadcast_task_update(self, task_list_id: int, task_data: Dict):
+    def broadcast_task_update(self, task_list_id: int, task_data: Dict, version: Optional[int] = None):
         """Широковещательная рассылка об обновлении задачи"""
         self.send_task_update(task_list_id, {
             'type': 'task_updated',
-            'task': task_data
+            'task': task_data,
+            'version': version
         })
 
-    def broadcast_task_deletion(self, task_list_id: int, task_id: int):
+    def broadcast_bulk_update(self, task_list_id: int, action: str, task_ids: List[int],
+                              version: Optional[int] = None):
+        """Одно агрегированное событие на список после массовой операции"""
+        self.send_task_update(task_list_id, {
+            'type': 'tasks_bulk_updated',
+            'action': action,
+            'task_ids': task_ids,
+            'version': version
+        })
+
+    def broadcast_comment(self, task_list_id: int, event: Dict):
+        """Комментарий создан, изменён или удалён: comment_created/_updated/_deleted
+        с comment_id, task_id и новыми счётчиками задачи"""
+        self.send_task_update(task_list_id, event)
+
+    def broadcast_task_deletion(self, task_list_id: int, task_id: int, version: Optional[int] = None):
         """Широковещательная рассылка об удалении задачи"""
         self.send_task_update(task_list_id, {
             'type': 'task_deleted',
-            'task_id': task_id
+            'task_id': task_id,
+            'version': version
         })
 
 
 # Глобальный экземпляр менеджера WebSocket
-websocket_manager = WebSocketManager()
\ No newline at end of file
+websocket_manager = WebSocketManager()
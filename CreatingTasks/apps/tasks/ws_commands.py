@@ -0,0 +1,99 @@
+"""Команды изменения задач, приходящие через TaskConsumer.
+
+Каждая команда проверяется теми же сериализаторами, что и REST API,
+сохраняется в БД и подтверждается новой версией списка (кроме
+комментария, который версию не меняет). Рассылку остальным клиентам
+делает журнал изменений (apps.tasks.changelog) или apps.tasks.comments.
+"""
+from django.db import transaction
+from rest_framework.exceptions import APIException, ValidationError
+
+from . import bulk
+from .actors import acting_as
+from .membership import is_member
+from .models import TaskList, Task
+from .serializers import TaskSerializer, TaskUpdateSerializer, CommentSerializer, CommentCreateSerializer
+
+
+class CommandError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _get_task(task_list_id, task_id):
+    try:
+        return Task.objects.select_related('created_by', 'assigned_to').get(
+            pk=task_id, task_list_id=task_list_id
+        )
+    except (Task.DoesNotExist, ValueError, TypeError):
+        raise CommandError({'task_id': 'Задача не найдена в этом списке'})
+
+
+def _update_task(task_list_id, message, fields):
+    task = _get_task(task_list_id, message.get('task_id'))
+    data = {field: message.get(field) for field in fields}
+    serializer = TaskUpdateSerializer(task, data=data, partial=True)
+    if not serializer.is_valid():
+        raise CommandError(serializer.errors)
+    if data.get('status') == 'completed' and task.status != 'completed':
+        task.mark_as_completed()
+    else:
+        task = serializer.save()
+    return {'version': task.version, 'task': TaskSerializer(task).data}
+
+
+def update_status(user, task_list_id, message):
+    return _update_task(task_list_id, message, ['status'])
+
+
+def assign(user, task_list_id, message):
+    return _update_task(task_list_id, message, ['assigned_to'])
+
+
+def reorder(user, task_list_id, message):
+    task_ids = message.get('task_ids')
+    if not isinstance(task_ids, list) or not task_ids:
+        raise CommandError({'task_ids': 'Ожидается непустой список id задач'})
+    if len(task_ids) > bulk.MAX_BULK_SIZE:
+        raise CommandError({'task_ids': f'Не больше {bulk.MAX_BULK_SIZE} задач за раз'})
+    tasks = bulk.reorder_tasks(user, task_list_id, task_ids)
+    return {
+        'version': TaskList.objects.filter(pk=task_list_id).values_list('version', flat=True).get(),
+        'task_ids': [task.pk for task in tasks],
+    }
+
+
+def comment(user, task_list_id, message):
+    task = _get_task(task_list_id, message.get('task_id'))
+    serializer = CommentCreateSerializer(data={'task': task.pk, 'content': message.get('content')})
+    if not serializer.is_valid():
+        raise CommandError(serializer.errors)
+    created = serializer.save(author=user)
+    # Комментарий не меняет версию списка, остальным его разошлёт событие comment_created
+    return {'comment': CommentSerializer(created).data}
+
+
+COMMANDS = {
+    'update_status': update_status,
+    'assign': assign,
+    'reorder': reorder,
+    'comment': comment,
+}
+
+
+def execute(user, task_list_id, message):
+    """Выполняет команду; возвращает полезную нагрузку подтверждения"""
+    handler = COMMANDS.get(message.get('type'))
+    if handler is None:
+        raise CommandError({'type': 'Неизвестная команда'})
+    # Доступ мог быть отозван после подключения
+    if not is_member(user.pk, task_list_id):
+        raise CommandError({'detail': 'Нет доступа к списку задач'})
+    try:
+        with acting_as(user), transaction.atomic():
+            return handler(user, int(task_list_id), message)
+    except ValidationError as e:
+        raise CommandError(e.detail)
+    except APIException as e:
+        raise CommandError({'detail': str(e.detail)})
@@ -50,4 +50,6 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    # Незагруженный профиль не менялся: не тратим SELECT и UPDATE на каждый save (last_login)
+    if User.profile.related.is_cached(instance):
+        instance.profile.save()
\ No newline at end of file
@@ -49,4 +49,4 @@ def current_user_view(request):
 class UserListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
-    queryset = User.objects.all()
\ No newline at end of file
+    queryset = User.objects.select_related('profile').order_by('id')
\ No newline at end of file
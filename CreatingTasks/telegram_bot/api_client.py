@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import random
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+
+class ApiResponse:
+    def __init__(self, status: int, data: Any):
+        self.status = status
+        self.data = data
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+class ApiClient:
+    """Общий HTTP-клиент бота к API CreatingTasks.
+
+    Одна ClientSession на процесс: пул keep-alive соединений с кэшем DNS,
+    ограничение числа одновременных запросов, таймауты и повтор
+    с экспоненциальной задержкой для сетевых ошибок и 429/5xx.
+    """
+
+    def __init__(self, base_url: str, *, max_connections: int = 100, max_concurrency: int = 50,
+                 timeout: float = 10.0, retries: int = 3, backoff: float = 0.2,
+                 keepalive_timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 5.0))
+        self.retries = retries
+        self.backoff = backoff
+        self.keepalive_timeout = keepalive_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={'Accept': 'application/json'},
+            )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def request(self, method: str, path: str, *, token: Optional[str] = None,
+                      json: Any = None, params: Optional[Dict] = None,
+                      retry: Optional[bool] = None) -> ApiResponse:
+        """Запрос к API; path - относительный путь вида /tasks/tasks/.
+
+        retry=None - повторяются только идемпотентные методы.
+        """
+        if self._session is None:
+            await self.start()
+        method = method.upper()
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        attempts = self.retries + 1 if retry else 1
+        headers = {'Authorization': f'Token {token}'} if token else None
+        url = f"{self.base_url}/{path.lstrip('/')}"
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                async with self._semaphore:
+                    async with self._session.request(
+                            method, url, json=json, params=params, headers=headers
+                    ) as response:
+                        if response.status in RETRY_STATUSES and not last_attempt:
+                            delay = self._retry_after(response) or self._delay(attempt)
+                            logger.warning(f"{method} {path}: {response.status}, retry in {delay:.2f}s")
+                            await response.release()
+                        else:
+                            return ApiResponse(response.status, await self._read(response))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if last_attempt:
+                    raise
+                delay = self._delay(attempt)
+                logger.warning(f"{method} {path}: {e!r}, retry in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def get(self, path: str, **kwargs) -> ApiResponse:
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> ApiResponse:
+        return await self.request('POST', path, **kwargs)
+
+    def _delay(self, attempt: int) -> float:
+        # Экспоненциальная задержка с джиттером
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    async def _read(response: aiohttp.ClientResponse) -> Any:
+        if response.content_type == 'application/json':
+            return await response.json()
+        return await response.text()
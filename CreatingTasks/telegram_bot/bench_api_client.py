@@ -0,0 +1,74 @@
+"""Бенчмарк HTTP-клиента бота против локального заглушечного API.
+
+Сравнивает старую схему (новая ClientSession на каждое сообщение)
+с общим ApiClient и печатает сообщений в секунду:
+
+    python bench_api_client.py --messages 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from api_client import ApiClient
+
+TASKS = [
+    {'id': i, 'title': f'Задача {i}', 'status': 'pending', 'priority': 'medium'}
+    for i in range(20)
+]
+
+
+async def start_stub_api(port):
+    async def my_tasks(request):
+        return web.json_response(TASKS)
+
+    app = web.Application()
+    app.router.add_get('/api/tasks/my_tasks/', my_tasks)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    await site.start()
+    return runner
+
+
+async def session_per_message(base_url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f'{base_url}/tasks/my_tasks/',
+                               headers={'Authorization': 'Token bench'}) as response:
+            await response.json()
+
+
+async def run(name, handler, messages, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(messages)))
+    elapsed = time.perf_counter() - started
+    print(f'{name:<22} {messages / elapsed:10.1f} msg/s  ({elapsed:.2f}s)')
+
+
+async def main(args):
+    runner = await start_stub_api(args.port)
+    base_url = f'http://127.0.0.1:{args.port}/api'
+    try:
+        await run('session per message', lambda: session_per_message(base_url),
+                  args.messages, args.concurrency)
+        async with ApiClient(base_url, max_concurrency=args.concurrency) as client:
+            await run('shared ApiClient', lambda: client.get('/tasks/my_tasks/', token='bench'),
+                      args.messages, args.concurrency)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--port', type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
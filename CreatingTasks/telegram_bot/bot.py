@@ -1,12 +1,16 @@
 import os
+import html
 import logging
 from aiogram import Bot, Dispatcher, types
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.utils import executor
-import aiohttp
-import asyncio
+from aiogram.utils.exceptions import MessageCantBeEdited, MessageNotModified, MessageToEditNotFound
+
+from api_client import ApiClient
+from push_consumer import PushConsumer
+from send_queue import SendQueue
+from storage import BackendLock, MemoryBackend, SharedStorage, storage_from_url
 
 logging.basicConfig(level=logging.INFO)
 
@@ -18,11 +22,55 @@ class TaskStates(StatesGroup):
 
 
 class TelegramBot:
+    TASKS_PAGE_SIZE = 10
+    # Сколько помнить id отправленной карточки задачи для редактирования
+    CARD_TTL = 30 * 24 * 60 * 60
+    # Сколько держать блокировку карточки, если процесс упал посреди отправки
+    CARD_LOCK_TTL = 60
+
+    STATUS_EMOJIS = {
+        'pending': '⏳',
+        'in_progress': '🔄',
+        'completed': '✅',
+        'cancelled': '❌'
+    }
+
+    PRIORITY_EMOJIS = {
+        'low': '🔵',
+        'medium': '🟡',
+        'high': '🟠',
+        'urgent': '🔴'
+    }
+
     def __init__(self):
         self.bot = Bot(token=os.getenv('TELEGRAM_BOT_TOKEN'))
-        self.storage = MemoryStorage()
+        # Redis/SQLite позволяют нескольким процессам бота делить сессии пользователей
+        self.storage = storage_from_url(
+            os.getenv('BOT_FSM_STORAGE', ''),
+            ttl=int(os.getenv('BOT_FSM_TTL', str(30 * 24 * 60 * 60))),
+            cache_ttl=float(os.getenv('BOT_FSM_CACHE_TTL', '1')),
+        )
         self.dp = Dispatcher(self.bot, storage=self.storage)
         self.api_base_url = os.getenv('API_BASE_URL', 'http://localhost:8000/api')
+        # Один пул соединений на процесс вместо ClientSession на каждое сообщение
+        self.api = ApiClient(
+            self.api_base_url,
+            max_connections=int(os.getenv('API_MAX_CONNECTIONS', '100')),
+            max_concurrency=int(os.getenv('API_MAX_CONCURRENCY', '50')),
+            timeout=float(os.getenv('API_TIMEOUT', '10')),
+        )
+        self.sender = SendQueue(
+            self.bot,
+            global_rate=float(os.getenv('TELEGRAM_GLOBAL_RATE', '30')),
+            per_chat_rate=float(os.getenv('TELEGRAM_CHAT_RATE', '1')),
+        )
+        # id карточек задач лежат рядом с FSM, чтобы их видели все процессы бота
+        if isinstance(self.storage, SharedStorage):
+            self.cards = self.storage.backend
+        else:
+            self.cards = MemoryBackend()
+        self.push_url = os.getenv('TELEGRAM_PUSH_URL')
+        self.push = None
         self.handlers()
 
     def handlers(self):
@@ -31,6 +79,7 @@ class TelegramBot:
         self.dp.register_message_handler(self.show_main_menu, commands=['menu'])
         self.dp.register_message_handler(self.show_my_tasks, commands=['tasks'])
         self.dp.register_callback_query_handler(self.handle_task_action, lambda c: c.data.startswith('task_'))
+        self.dp.register_callback_query_handler(self.handle_tasks_page, lambda c: c.data.startswith('tasks_page_'))
 
     async def start(self, message: types.Message):
         """Start command handler"""
@@ -47,40 +96,38 @@ class TelegramBot:
         """Handle user authentication"""
         email = message.text.strip()
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                # Request authentication token
-                async with session.post(
-                        f"{self.api_base_url}/auth/telegram-login/",
-                        json={
-                            'email': email,
-                            'telegram_id': message.from_user.id,
-                            'telegram_username': message.from_user.username
-                        }
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        await state.update_data(token=data.get('token'))
-
-                        await message.answer(
-                            "✅ Авторизация прошла успешно!\n\n"
-                            "Доступные команды:\n"
-                            "/menu - Главное меню\n"
-                            "/tasks - Мои задачи\n"
-                            "/help - Помощь"
-                        )
-                        await TaskStates.main_menu.set()
-                    else:
-                        await message.answer(
-                            "❌ Ошибка авторизации. Пожалуйста, проверьте ваш email "
-                            "и убедитесь, что вы зарегистрированы в системе.\n\n"
-                            "Попробуйте еще раз:"
-                        )
-            except Exception as e:
-                logging.error(f"Auth error: {e}")
+        try:
+            # Request authentication token
+            response = await self.api.post(
+                "/auth/telegram-login/",
+                json={
+                    'email': email,
+                    'telegram_id': message.from_user.id,
+                    'telegram_username': message.from_user.username
+                }
+            )
+            if response.status == 200:
+                await state.update_data(token=response.data.get('token'))
+
+                await message.answer(
+                    "✅ Авторизация прошла успешно!\n\n"
+                    "Доступные команды:\n"
+                    "/menu - Главное меню\n"
+                    "/tasks - Мои задачи\n"
+                    "/help - Помощь"
+                )
+                await TaskStates.main_menu.set()
+            else:
                 await message.answer(
-                    "❌ Произошла ошибка при авторизации. Попробуйте позже."
+                    "❌ Ошибка авторизации. Пожалуйста, проверьте ваш email "
+                    "и убедитесь, что вы зарегистрированы в системе.\n\n"
+                    "Попробуйте еще раз:"
                 )
+        except Exception as e:
+            logging.error(f"Auth error: {e}")
+            await message.answer(
+                "❌ Произошла ошибка при авторизации. Попробуйте позже."
+            )
 
     async def show_main_menu(self, message: types.Message, state: FSMContext):
         """Show main menu"""
@@ -103,79 +150,115 @@ class TelegramBot:
             await message.answer("❌ Сначала необходимо авторизоваться. Используйте /start")
             return
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                headers = {'Authorization': f'Token {token}'}
-                async with session.get(
-                        f"{self.api_base_url}/tasks/my_tasks/",
-                        headers=headers
-                ) as response:
-                    if response.status == 200:
-                        tasks = await response.json()
-                        await self.send_tasks_list(message, tasks)
-                    else:
-                        await message.answer("❌ Ошибка при загрузке задач")
-            except Exception as e:
-                logging.error(f"Error loading tasks: {e}")
+        try:
+            response = await self.api.get("/tasks/tasks/my_tasks/", token=token)
+            if response.status == 200:
+                await self.send_tasks_list(message, response.data, state)
+            else:
                 await message.answer("❌ Ошибка при загрузке задач")
-
-    async def send_tasks_list(self, message: types.Message, tasks):
-        """Send tasks list to user"""
+        except Exception as e:
+            logging.error(f"Error loading tasks: {e}")
+            await message.answer("❌ Ошибка при загрузке задач")
+
+    async def send_tasks_list(self, message: types.Message, tasks, state: FSMContext = None):
+        """Send tasks list to user: одно сообщение на страницу, а не на задачу"""
+        if isinstance(tasks, dict):
+            tasks = tasks.get('results', [])
         if not tasks:
-            await message.answer("📭 У вас нет назначенных задач")
+            await self.sender.send_message(message.chat.id, "📭 У вас нет назначенных задач")
             return
 
-        for task in tasks:
-            task_text = self.format_task_message(task)
-            keyboard = types.InlineKeyboardMarkup()
+        if state is not None:
+            # Страницы листаются без повторного запроса к API
+            await state.update_data(tasks=[self.compact_task(task) for task in tasks], tasks_page=0)
+        text, keyboard = self.render_tasks_page(tasks, 0)
+        await self.sender.send_message(
+            message.chat.id, text, reply_markup=keyboard, parse_mode='HTML'
+        )
 
+    async def handle_tasks_page(self, callback_query: types.CallbackQuery, state: FSMContext):
+        """Листание страниц списка задач: сообщение редактируется на месте"""
+        tasks = (await state.get_data()).get('tasks')
+        if not tasks:
+            await callback_query.answer("Список устарел, отправьте /tasks")
+            return
+        page = int(callback_query.data.rsplit('_', 1)[1])
+        await state.update_data(tasks_page=page)
+        text, keyboard = self.render_tasks_page(tasks, page)
+        await callback_query.answer()
+        await self.sender.edit_message_text(
+            callback_query.message.chat.id, callback_query.message.message_id, text,
+            reply_markup=keyboard, parse_mode='HTML'
+        )
+
+    @staticmethod
+    def compact_task(task):
+        fields = ('id', 'title', 'status', 'priority', 'due_date')
+        return {field: task.get(field) for field in fields}
+
+    def render_tasks_page(self, tasks, page):
+        pages = max(1, (len(tasks) + self.TASKS_PAGE_SIZE - 1) // self.TASKS_PAGE_SIZE)
+        page = min(max(page, 0), pages - 1)
+        start = page * self.TASKS_PAGE_SIZE
+        page_tasks = tasks[start:start + self.TASKS_PAGE_SIZE]
+
+        lines = [f"📋 <b>Мои задачи</b> ({len(tasks)})\n"]
+        keyboard = types.InlineKeyboardMarkup(row_width=2)
+        for number, task in enumerate(page_tasks, start=start + 1):
+            lines.append(f"{number}. {self.format_task_line(task)}")
+            buttons = []
             if task['status'] != 'completed':
-                keyboard.add(types.InlineKeyboardButton(
-                    "✅ Завершить",
-                    callback_data=f"task_complete_{task['id']}"
+                buttons.append(types.InlineKeyboardButton(
+                    f"✅ {number}", callback_data=f"task_complete_{task['id']}"
                 ))
-
-            keyboard.add(types.InlineKeyboardButton(
-                "📋 Подробности",
-                callback_data=f"task_details_{task['id']}"
+            buttons.append(types.InlineKeyboardButton(
+                f"📋 {number}", callback_data=f"task_details_{task['id']}"
             ))
-
-            await message.answer(task_text, reply_markup=keyboard)
+            keyboard.row(*buttons)
+
+        if pages > 1:
+            navigation = []
+            if page > 0:
+                navigation.append(types.InlineKeyboardButton("◀️", callback_data=f"tasks_page_{page - 1}"))
+            navigation.append(types.InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"tasks_page_{page}"))
+            if page < pages - 1:
+                navigation.append(types.InlineKeyboardButton("▶️", callback_data=f"tasks_page_{page + 1}"))
+            keyboard.row(*navigation)
+        return "\n".join(lines), keyboard
+
+    def format_task_line(self, task):
+        """Короткая строка задачи для списка"""
+        line = (
+            f"{self.STATUS_EMOJIS.get(task['status'], '📝')}"
+            f"{self.PRIORITY_EMOJIS.get(task['priority'], '⚪')} "
+            f"<b>{html.escape(task['title'])}</b>"
+        )
+        due_text = self.format_due_date(task.get('due_date'))
+        if due_text:
+            line += f" — ⏰ {due_text}"
+        return line
+
+    @staticmethod
+    def format_due_date(due_date):
+        if not due_date:
+            return None
+        from datetime import datetime
+        due_date = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
+        return due_date.strftime('%d.%m.%Y %H:%M')
 
     def format_task_message(self, task):
         """Format task data for Telegram message"""
-        status_emojis = {
-            'pending': '⏳',
-            'in_progress': '🔄',
-            'completed': '✅',
-            'cancelled': '❌'
-        }
-
-        priority_emojis = {
-            'low': '🔵',
-            'medium': '🟡',
-            'high': '🟠',
-            'urgent': '🔴'
-        }
-
-        status_emoji = status_emojis.get(task['status'], '📝')
-        priority_emoji = priority_emojis.get(task['priority'], '⚪')
-
-        due_date = task.get('due_date')
-        if due_date:
-            from datetime import datetime
-            due_date = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-            due_text = due_date.strftime('%d.%m.%Y %H:%M')
-        else:
-            due_text = "Не установлен"
+        status_emoji = self.STATUS_EMOJIS.get(task['status'], '📝')
+        priority_emoji = self.PRIORITY_EMOJIS.get(task['priority'], '⚪')
+        due_text = self.format_due_date(task.get('due_date')) or "Не установлен"
 
         return (
-            f"{status_emoji} <b>{task['title']}</b>\n\n"
-            f"📋 Описание: {task['description'] or 'Нет описания'}\n"
+            f"{status_emoji} <b>{html.escape(task['title'])}</b>\n\n"
+            f"📋 Описание: {html.escape(task['description'] or 'Нет описания')}\n"
             f"📁 Список: {task['task_list']}\n"
             f"{priority_emoji} Приоритет: {self.get_priority_text(task['priority'])}\n"
             f"⏰ Срок: {due_text}\n"
-            f"👤 Создал: {task['created_by']['username']}\n"
+            f"👤 Создал: {html.escape(task.get('created_by_username') or '—')}\n"
             f"📊 Статус: {self.get_status_text(task['status'])}"
         )
 
@@ -190,34 +273,152 @@ class TelegramBot:
             return
 
         if data.startswith('task_complete_'):
-            task_id = data.split('_')[2]
-            await self.complete_task(callback_query, task_id, token)
+            parts = data.split('_')
+            await self.complete_task(callback_query, parts[2], token, state, card=parts[-1] == 'card')
 
         elif data.startswith('task_details_'):
             task_id = data.split('_')[2]
             await self.show_task_details(callback_query, task_id, token)
 
-    async def complete_task(self, callback_query: types.CallbackQuery, task_id: str, token: str):
+    async def complete_task(self, callback_query: types.CallbackQuery, task_id: str, token: str,
+                            state: FSMContext, card: bool = False):
         """Mark task as completed"""
-        async with aiohttp.ClientSession() as session:
-            try:
-                headers = {'Authorization': f'Token {token}'}
-                async with session.post(
-                        f"{self.api_base_url}/tasks/{task_id}/complete/",
-                        headers=headers
-                ) as response:
-                    if response.status == 200:
-                        await callback_query.answer("✅ Задача завершена!")
-                        await callback_query.message.edit_reply_markup(reply_markup=None)
-
-                        # Update message text
-                        task_data = await response.json()
-                        updated_text = self.format_task_message(task_data)
-                        await callback_query.message.edit_text(updated_text, parse_mode='HTML')
-                    else:
-                        await callback_query.answer("❌ Ошибка при завершении задачи")
-            except Exception as e:
-                logging.error(f"Error completing task: {e}")
+        try:
+            # Повтор безопасен: завершение задачи идемпотентно
+            response = await self.api.post(f"/tasks/tasks/{task_id}/complete/", token=token, retry=True)
+            if response.status == 200:
+                await callback_query.answer("✅ Задача завершена!")
+                if card:
+                    # Карточку обновит push-событие с сервера
+                    return
+
+                # Обновляем страницу списка на месте
+                user_data = await state.get_data()
+                tasks = user_data.get('tasks') or []
+                for task in tasks:
+                    if str(task['id']) == task_id:
+                        task['status'] = 'completed'
+                await state.update_data(tasks=tasks)
+                text, keyboard = self.render_tasks_page(tasks, user_data.get('tasks_page', 0))
+                await self.sender.edit_message_text(
+                    callback_query.message.chat.id, callback_query.message.message_id, text,
+                    reply_markup=keyboard, parse_mode='HTML'
+                )
+            else:
                 await callback_query.answer("❌ Ошибка при завершении задачи")
+        except Exception as e:
+            logging.error(f"Error completing task: {e}")
+            await callback_query.answer("❌ Ошибка при завершении задачи")
+
+    async def show_task_details(self, callback_query: types.CallbackQuery, task_id: str, token: str):
+        """Show task details"""
+        try:
+            response = await self.api.get(f"/tasks/tasks/{task_id}/", token=token)
+            if response.status == 200:
+                await callback_query.answer()
+                await self.sender.send_message(
+                    callback_query.message.chat.id,
+                    self.format_task_message(response.data), parse_mode='HTML'
+                )
+            else:
+                await callback_query.answer("❌ Задача не найдена")
+        except Exception as e:
+            logging.error(f"Error loading task details: {e}")
+            await callback_query.answer("❌ Ошибка при загрузке задачи")
+
+    async def handle_push(self, event):
+        """Событие из серверной очереди push-доставки"""
+        if event['type'] == 'task':
+            await self.send_task_card(event['chat_id'], event['task'], event.get('notify'), event.get('title'))
+        elif event['type'] == 'notification':
+            await self.sender.send_message(
+                event['chat_id'],
+                f"🔔 <b>{html.escape(event['title'])}</b>\n\n{html.escape(event['message'])}",
+                parse_mode='HTML'
+            )
+
+    async def send_task_card(self, chat_id, task, notify=False, title=None):
+        """Карточка задачи: уже отправленная редактируется, новая - только при notify"""
+        key = f"tgcard:{chat_id}:{task['id']}"
+        # События одной карточки обрабатываются по очереди во всех процессах бота,
+        # иначе правка обгонит отправку; блокировка лежит в том же хранилище, что и карточки
+        async with BackendLock(self.cards, f'{key}:lock', ttl=self.CARD_LOCK_TTL):
+            await self._send_task_card(key, chat_id, task, notify, title)
+
+    async def _send_task_card(self, key, chat_id, task, notify, title):
+        text = self.format_task_message(task)
+        keyboard = self.task_card_keyboard(task)
+        message_id = await self.cards.get(key)
+
+        if message_id and not notify:
+            try:
+                await self.sender.edit_message_text(
+                    chat_id, int(message_id), text, reply_markup=keyboard, parse_mode='HTML'
+                )
+                await self.cards.set(key, message_id, self.CARD_TTL)
+            except MessageNotModified:
+                pass
+            except (MessageToEditNotFound, MessageCantBeEdited):
+                await self.cards.delete(key)
+            return
+        if not notify:
+            return
+
+        if title:
+            text = f"🔔 <b>{html.escape(title)}</b>\n\n{text}"
+        message = await self.sender.send_message(chat_id, text, reply_markup=keyboard, parse_mode='HTML')
+        await self.cards.set(key, str(message.message_id), self.CARD_TTL)
+
+    @staticmethod
+    def task_card_keyboard(task):
+        keyboard = types.InlineKeyboardMarkup()
+        if task['status'] not in ('completed', 'cancelled'):
+            keyboard.add(types.InlineKeyboardButton(
+                "✅ Завершить", callback_data=f"task_complete_{task['id']}_card"
+            ))
+        return keyboard
+
+    def get_status_text(self, status):
+        return {
+            'pending': 'Ожидает',
+            'in_progress': 'В работе',
+            'completed': 'Завершена',
+            'cancelled': 'Отменена'
+        }.get(status, status)
+
+    def get_priority_text(self, priority):
+        return {
+            'low': 'Низкий',
+            'medium': 'Средний',
+            'high': 'Высокий',
+            'urgent': 'Срочный'
+        }.get(priority, priority)
+
+    async def on_startup(self, dp: Dispatcher):
+        await self.api.start()
+        if self.push_url:
+            self.push = PushConsumer(
+                self.push_url, os.getenv('TELEGRAM_PUSH_QUEUE', 'telegram:push'), self.handle_push,
+                concurrency=int(os.getenv('TELEGRAM_PUSH_CONCURRENCY', '50')),
+            )
+            self.push.start()
+
+    async def on_shutdown(self, dp: Dispatcher):
+        if self.push is not None:
+            await self.push.close()
+        await self.sender.close()
+        await self.api.close()
+        await self.dp.storage.close()
+        await self.dp.storage.wait_closed()
+
+    def run(self):
+        executor.start_polling(
+            self.dp,
+            skip_updates=True,
+            on_startup=self.on_startup,
+            on_shutdown=self.on_shutdown
+        )
+
 
-    async def show_task_details(self, callback_query: types.CallbackQuery, task_id: str, token:
\ No newline at end of file
+if __name__ == '__main__':
+    TelegramBot().run()
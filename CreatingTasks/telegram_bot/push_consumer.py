@@ -0,0 +1,71 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class PushConsumer:
+    """Читает события, которые сервер кладёт в Redis-список (BLPOP).
+
+    Каждое событие обрабатывается отдельной задачей, не более concurrency
+    одновременно; порядок внутри чата сохраняет SendQueue. Ошибки
+    соединения с Redis не останавливают цикл - он переподключается
+    с растущей паузой.
+    """
+
+    def __init__(self, url: Optional[str], queue: str,
+                 handler: Callable[[Dict[str, Any]], Awaitable[None]], *,
+                 concurrency: int = 50, block_timeout: int = 5, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.queue = queue
+        self.handler = handler
+        self.block_timeout = block_timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight: Set[asyncio.Task] = set()
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
+        await self.client.close()
+
+    async def _run(self):
+        delay = 1.0
+        while True:
+            try:
+                item = await self.client.blpop(self.queue, timeout=self.block_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Push queue error: {e}, reconnect in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            delay = 1.0
+            if item is None:
+                continue
+            await self._semaphore.acquire()
+            task = asyncio.create_task(self._handle(item[1]))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _handle(self, raw: str):
+        try:
+            await self.handler(json.loads(raw))
+        except Exception as e:
+            logger.error(f"Error handling push event: {e}")
+        finally:
+            self._semaphore.release()
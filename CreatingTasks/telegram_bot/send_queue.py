@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+from aiogram.utils.exceptions import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ведро токенов: rate сообщений в секунду, всплеск до capacity.
+    Ожидающие обслуживаются по очереди, поэтому пики сглаживаются, а не отбрасываются"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if self._updated_at is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def is_full(self, now: float) -> bool:
+        """Ведро восстановилось до capacity - оно не отличается от нового"""
+        if self._updated_at is None:
+            return True
+        return self._tokens + (now - self._updated_at) * self.rate >= self.capacity
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SendQueue:
+    """Очередь исходящих сообщений бота с лимитами Telegram.
+
+    У каждого чата свой FIFO и своё ведро (по умолчанию 1 сообщение в секунду),
+    поверх - общее ведро на весь бот (30 в секунду). Пока один чат ждёт
+    своего лимита, сообщения в другие чаты продолжают уходить. На RetryAfter
+    от Telegram отправка в этот чат откладывается на указанное время.
+
+    Ведро чата живёт и после того, как его очередь опустела: иначе
+    последовательные отправки в один чат не ограничивались бы вовсе.
+    Удаляются только вёдра без обработчика, успевшие восстановиться.
+    """
+
+    def __init__(self, bot, *, global_rate: float = 30.0, per_chat_rate: float = 1.0,
+                 per_chat_burst: float = 3.0, max_retries: int = 3):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self._queues: Dict[int, Deque[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]]] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def submit(self, chat_id: int, call: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Ставит вызов Bot API в очередь чата; результат - через future"""
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(chat_id, deque()).append((call, future))
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+        return future
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        return await self.submit(chat_id, lambda: self.bot.send_message(chat_id, text, **kwargs))
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str, **kwargs):
+        return await self.submit(
+            chat_id,
+            lambda: self.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, **kwargs)
+        )
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def close(self):
+        """Дожидается отправки всего, что уже в очереди"""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    async def _drain(self, chat_id: int):
+        queue = self._queues[chat_id]
+        bucket = self._buckets.setdefault(
+            chat_id, TokenBucket(self.per_chat_rate, capacity=self.per_chat_burst)
+        )
+        try:
+            while queue:
+                call, future = queue.popleft()
+                if future.cancelled():
+                    continue
+                for attempt in range(self.max_retries + 1):
+                    await bucket.acquire()
+                    await self.global_bucket.acquire()
+                    try:
+                        result = await call()
+                    except RetryAfter as e:
+                        if attempt == self.max_retries:
+                            _set_exception(future, e)
+                            break
+                        logger.warning(f"Flood control for chat {chat_id}, retry in {e.timeout}s")
+                        await asyncio.sleep(e.timeout)
+                    except Exception as e:
+                        _set_exception(future, e)
+                        break
+                    else:
+                        # Ожидающий мог отменить future, пока шла отправка
+                        if not future.done():
+                            future.set_result(result)
+                        break
+        finally:
+            # Между опустевшей очередью и этим блоком нет await,
+            # поэтому новое сообщение запустит новый обработчик
+            del self._workers[chat_id]
+            self._queues.pop(chat_id, None)
+            self._evict_idle_buckets()
+
+    def _evict_idle_buckets(self):
+        now = asyncio.get_running_loop().time()
+        for chat_id in [
+            chat_id for chat_id, bucket in self._buckets.items()
+            if chat_id not in self._workers and bucket.is_full(now)
+        ]:
+            del self._buckets[chat_id]
+
+
+def _set_exception(future: asyncio.Future, exc: BaseException):
+    if not future.done():
+        future.set_exception(exc)
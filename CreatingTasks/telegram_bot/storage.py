@@ -0,0 +1,291 @@
+"""Общее хранилище FSM для нескольких процессов бота.
+
+SharedStorage реализует BaseStorage aiogram поверх key-value бэкенда
+(Redis или SQLite): состояние и данные пользователя лежат одной JSON-записью
+с TTL, а короткий локальный кэш снимает повторные чтения в пределах одного
+апдейта. Бэкенд выбирается переменной BOT_FSM_STORAGE:
+
+    redis://localhost:6379/1   - RedisBackend
+    sqlite:///var/lib/bot/fsm.sqlite3 - SQLiteBackend
+    (пусто)                    - MemoryStorage, как раньше
+"""
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher.storage import BaseStorage
+
+
+class KeyValueBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: Optional[int]):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: str, ttl: int) -> bool:
+        """Записывает значение, только если ключа нет (SET NX); True - если записано"""
+
+    @abstractmethod
+    async def delete_if(self, key: str, value: str):
+        """Удаляет ключ, только если в нём всё ещё value"""
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(KeyValueBackend):
+    """Бэкенд в памяти процесса, когда общее хранилище не настроено"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], str]] = {}
+
+    async def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key, value, ttl):
+        self._data[key] = (time.monotonic() + ttl if ttl else None, value)
+
+    async def delete(self, key):
+        self._data.pop(key, None)
+
+    async def add(self, key, value, ttl):
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete_if(self, key, value):
+        if await self.get(key) == value:
+            del self._data[key]
+
+
+class RedisBackend(KeyValueBackend):
+    """Бэкенд для Redis-совместимого сервера; client можно подменить фейком"""
+
+    DELETE_IF_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, url: Optional[str] = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+
+    async def get(self, key):
+        return await self.client.get(key)
+
+    async def set(self, key, value, ttl):
+        await self.client.set(key, value, ex=ttl)
+
+    async def delete(self, key):
+        await self.client.delete(key)
+
+    async def add(self, key, value, ttl):
+        return bool(await self.client.set(key, value, ex=ttl, nx=True))
+
+    async def delete_if(self, key, value):
+        await self.client.eval(self.DELETE_IF_SCRIPT, 1, key, value)
+
+    async def close(self):
+        await self.client.close()
+
+
+class SQLiteBackend(KeyValueBackend):
+    """Бэкенд на SQLite для одного узла; запросы выполняются в пуле потоков"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS fsm_storage ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)'
+        )
+        self._lock = asyncio.Lock()
+
+    async def _run(self, sql, params=()):
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, lambda: self._connection.execute(sql, params).fetchone()
+            )
+
+    async def _changes(self, sql, params=()):
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, lambda: self._connection.execute(sql, params).rowcount
+            )
+
+    async def get(self, key):
+        row = await self._run(
+            'SELECT value FROM fsm_storage WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+            (key, time.time())
+        )
+        return row[0] if row else None
+
+    async def set(self, key, value, ttl):
+        expires_at = time.time() + ttl if ttl else None
+        await self._run(
+            'INSERT INTO fsm_storage (key, value, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at',
+            (key, value, expires_at)
+        )
+
+    async def delete(self, key):
+        await self._run('DELETE FROM fsm_storage WHERE key = ?', (key,))
+
+    async def add(self, key, value, ttl):
+        # Истёкшая запись считается отсутствующей и перезаписывается
+        now = time.time()
+        return await self._changes(
+            'INSERT INTO fsm_storage (key, value, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at '
+            'WHERE fsm_storage.expires_at IS NOT NULL AND fsm_storage.expires_at <= ?',
+            (key, value, now + ttl, now)
+        ) > 0
+
+    async def delete_if(self, key, value):
+        await self._run('DELETE FROM fsm_storage WHERE key = ? AND value = ?', (key, value))
+
+    async def purge_expired(self):
+        await self._run('DELETE FROM fsm_storage WHERE expires_at <= ?', (time.time(),))
+
+    async def close(self):
+        self._connection.close()
+
+
+class BackendLock:
+    """Блокировка между процессами поверх KeyValueBackend (SET NX с истечением).
+
+    ttl ограничивает время владения: блокировка упавшего процесса снимается
+    сама. Снимает её только владелец - по случайному токену в значении.
+    """
+
+    def __init__(self, backend: KeyValueBackend, key: str, *, ttl: int = 60, poll: float = 0.05):
+        self.backend = backend
+        self.key = key
+        self.ttl = ttl
+        self.poll = poll
+        self._token = None
+
+    async def __aenter__(self):
+        token = uuid.uuid4().hex
+        while not await self.backend.add(self.key, token, self.ttl):
+            await asyncio.sleep(self.poll)
+        self._token = token
+        return self
+
+    async def __aexit__(self, *exc_info):
+        token, self._token = self._token, None
+        await self.backend.delete_if(self.key, token)
+
+
+class SharedStorage(BaseStorage):
+    """FSM-хранилище aiogram поверх KeyValueBackend.
+
+    ttl - время жизни записи пользователя (продлевается при каждой записи),
+    cache_ttl - сколько секунд процесс доверяет локальной копии при чтении.
+    Кэш короткий, потому что запись могла обновить другая копия бота.
+    Состояние и данные лежат в одной записи, поэтому запись всегда читает
+    её из бэкенда: иначе set_data вернул бы состояние, которое другой
+    процесс уже сменил.
+    """
+
+    def __init__(self, backend: KeyValueBackend, *, prefix: str = 'fsm',
+                 ttl: Optional[int] = 30 * 24 * 60 * 60, cache_ttl: float = 1.0):
+        self.backend = backend
+        self.prefix = prefix
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[float, Dict]] = {}
+
+    def _key(self, chat, user) -> str:
+        chat, user = self.check_address(chat=chat, user=user)
+        return f'{self.prefix}:{chat}:{user}'
+
+    async def _load(self, key: str, cached: bool = True) -> Dict:
+        if cached:
+            item = self._cache.get(key)
+            if item is not None and item[0] > time.monotonic():
+                return item[1]
+        raw = await self.backend.get(key)
+        record = json.loads(raw) if raw else {'state': None, 'data': {}}
+        self._remember(key, record)
+        return record
+
+    async def _save(self, key: str, record: Dict):
+        if record['state'] is None and not record['data']:
+            await self.backend.delete(key)
+        else:
+            await self.backend.set(key, json.dumps(record), self.ttl)
+        self._remember(key, record)
+
+    def _remember(self, key: str, record: Dict):
+        if self.cache_ttl > 0:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, record)
+            if len(self._cache) > 10000:
+                now = time.monotonic()
+                self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+
+    async def get_state(self, *, chat=None, user=None, default=None) -> Optional[str]:
+        record = await self._load(self._key(chat, user))
+        return record['state'] if record['state'] is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat=None, user=None, default=None) -> Dict:
+        record = await self._load(self._key(chat, user))
+        return dict(record['data']) if record['data'] else dict(default or {})
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        key = self._key(chat, user)
+        record = dict(await self._load(key, cached=False), state=self.resolve_state(state))
+        await self._save(key, record)
+
+    async def set_data(self, *, chat=None, user=None, data=None):
+        key = self._key(chat, user)
+        record = dict(await self._load(key, cached=False), data=dict(data or {}))
+        await self._save(key, record)
+
+    async def update_data(self, *, chat=None, user=None, data=None, **kwargs):
+        key = self._key(chat, user)
+        record = await self._load(key, cached=False)
+        merged = dict(record['data'])
+        merged.update(data or {}, **kwargs)
+        await self._save(key, dict(record, data=merged))
+
+    async def close(self):
+        self._cache.clear()
+        await self.backend.close()
+
+    async def wait_closed(self):
+        pass
+
+
+def storage_from_url(url: str, **kwargs) -> BaseStorage:
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return SharedStorage(RedisBackend(url), **kwargs)
+    if url.startswith('sqlite:///'):
+        return SharedStorage(SQLiteBackend(url[len('sqlite:///'):]), **kwargs)
+    if not url:
+        return MemoryStorage()
+    raise ValueError(f'Unsupported FSM storage URL: {url}')
@@ -0,0 +1,120 @@
+"""Тесты SendQueue на поддельном транспорте Bot.
+
+    cd telegram_bot && python -m unittest test_send_queue
+"""
+import asyncio
+import unittest
+
+from aiogram.utils.exceptions import RetryAfter
+
+from send_queue import SendQueue
+
+RATE = 50.0
+
+
+class FakeBot:
+    """Вместо Bot API: запоминает отправки и время, может падать по сценарию"""
+
+    def __init__(self, failures=None):
+        self.sent = []
+        self.failures = failures or {}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        error = self.failures.get(text)
+        if error is not None:
+            self.failures[text] = error[1:] or None
+            raise error[0]
+        self.sent.append((chat_id, text, asyncio.get_running_loop().time()))
+        return {'chat_id': chat_id, 'text': text}
+
+
+class SendQueueTests(unittest.IsolatedAsyncioTestCase):
+    def make_queue(self, bot, **kwargs):
+        options = {'global_rate': 1000.0, 'per_chat_rate': RATE, 'per_chat_burst': 1.0}
+        options.update(kwargs)
+        return SendQueue(bot, **options)
+
+    async def test_sequential_sends_to_one_chat_are_rate_limited(self):
+        bot = FakeBot()
+        queue = self.make_queue(bot)
+        for i in range(6):
+            await queue.send_message(1, f'm{i}')
+        times = [sent_at for _, _, sent_at in bot.sent]
+        # 5 интервалов по 1/RATE секунды; небольшой допуск на таймер
+        self.assertGreaterEqual(times[-1] - times[0], 5 / RATE * 0.9)
+
+    async def test_burst_is_smoothed_not_rejected(self):
+        bot = FakeBot()
+        queue = self.make_queue(bot)
+        results = await asyncio.gather(*(queue.send_message(1, f'm{i}') for i in range(6)))
+        self.assertEqual([text for _, text, _ in bot.sent], [f'm{i}' for i in range(6)])
+        self.assertEqual([result['text'] for result in results], [f'm{i}' for i in range(6)])
+        self.assertGreaterEqual(bot.sent[-1][2] - bot.sent[0][2], 5 / RATE * 0.9)
+
+    async def test_slow_chat_does_not_block_other_chats(self):
+        bot = FakeBot()
+        queue = self.make_queue(bot)
+        busy = [queue.submit(1, lambda i=i: bot.send_message(1, f'a{i}')) for i in range(5)]
+        await queue.send_message(2, 'b')
+        await asyncio.gather(*busy)
+        order = [text for _, text, _ in bot.sent]
+        self.assertLess(order.index('b'), order.index('a4'))
+
+    async def test_global_rate_limits_all_chats(self):
+        bot = FakeBot()
+        queue = self.make_queue(bot, global_rate=RATE, per_chat_rate=1000.0)
+        await asyncio.gather(*(queue.send_message(chat_id, 'm') for chat_id in range(int(RATE) + 5)))
+        # Ведро на RATE сообщений сразу, остальные 5 - по 1/RATE секунды
+        self.assertGreaterEqual(bot.sent[-1][2] - bot.sent[0][2], 4 / RATE * 0.9)
+
+    async def test_retry_after_is_retried(self):
+        bot = FakeBot(failures={'m': [RetryAfter(0), RetryAfter(0)]})
+        queue = self.make_queue(bot)
+        result = await queue.send_message(1, 'm')
+        self.assertEqual(result['text'], 'm')
+        self.assertEqual(len(bot.sent), 1)
+
+    async def test_retry_after_gives_up_after_max_retries(self):
+        bot = FakeBot(failures={'m': [RetryAfter(0)] * 3})
+        queue = self.make_queue(bot, max_retries=2)
+        with self.assertRaises(RetryAfter):
+            await queue.send_message(1, 'm')
+        # Следующие сообщения чата по-прежнему уходят
+        await queue.send_message(1, 'next')
+        self.assertEqual([text for _, text, _ in bot.sent], ['next'])
+
+    async def test_cancelled_waiter_does_not_break_chat_queue(self):
+        bot = FakeBot()
+        queue = self.make_queue(bot)
+        release = asyncio.Event()
+
+        async def slow_call():
+            await release.wait()
+            return await bot.send_message(1, 'slow')
+
+        slow = queue.submit(1, slow_call)
+        failing = queue.submit(1, lambda: bot.send_message(1, 'boom'))
+        bot.failures['boom'] = [RuntimeError('boom')]
+        after = queue.submit(1, lambda: bot.send_message(1, 'after'))
+        await asyncio.sleep(0)
+        slow.cancel()
+        failing.cancel()
+        release.set()
+        self.assertEqual((await after)['text'], 'after')
+        await queue.close()
+        self.assertEqual(queue.pending(), 0)
+
+    async def test_idle_bucket_is_evicted_once_refilled(self):
+        bot = FakeBot()
+        queue = self.make_queue(bot)
+        await queue.send_message(1, 'm')
+        await queue.close()
+        self.assertIn(1, queue._buckets)
+        await asyncio.sleep(2 / RATE)
+        await queue.send_message(2, 'm')
+        await queue.close()
+        self.assertNotIn(1, queue._buckets)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+"""Тесты общего FSM-хранилища на локальных бэкендах и фейке Redis.
+
+    cd telegram_bot && python -m unittest test_storage
+"""
+import asyncio
+import os
+import tempfile
+import time
+import types
+import unittest
+from unittest import mock
+
+from storage import BackendLock, MemoryBackend, RedisBackend, SharedStorage, SQLiteBackend
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def patch(self, test):
+        # Подменяется только time в storage: часы event loop идут как обычно
+        patcher = mock.patch('storage.time', types.SimpleNamespace(monotonic=self, time=time.time))
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+class FakeRedis:
+    """Подмножество redis.asyncio.Redis, которым пользуется RedisBackend"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+
+    def _alive(self, key):
+        item = self.data.get(key)
+        if item is not None and item[0] is not None and item[0] <= self.clock():
+            del self.data[key]
+            item = None
+        return item
+
+    async def get(self, key):
+        item = self._alive(key)
+        return item[1] if item else None
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and self._alive(key):
+            return None
+        self.data[key] = (self.clock() + ex if ex else None, value)
+        return True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def eval(self, script, numkeys, key, value):
+        assert script == RedisBackend.DELETE_IF_SCRIPT
+        if await self.get(key) == value:
+            del self.data[key]
+            return 1
+        return 0
+
+    async def close(self):
+        pass
+
+
+class SharedStorageTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.clock.patch(self)
+
+    def make_backends(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        sqlite = SQLiteBackend(os.path.join(directory.name, 'fsm.sqlite3'))
+        self.addAsyncCleanup(sqlite.close)
+        return {
+            'memory': MemoryBackend(),
+            'redis': RedisBackend(client=FakeRedis(self.clock)),
+            'sqlite': sqlite,
+        }
+
+    def pair(self, backend, **kwargs):
+        # Две копии бота над одним бэкендом
+        return SharedStorage(backend, **kwargs), SharedStorage(backend, **kwargs)
+
+    async def test_writes_from_other_instance_are_not_lost(self):
+        for name, backend in self.make_backends().items():
+            with self.subTest(backend=name):
+                first, second = self.pair(backend, cache_ttl=60)
+                # У второго экземпляра в кэше пустая запись
+                self.assertIsNone(await second.get_state(chat=1, user=1))
+                await first.set_state(chat=1, user=1, state='Form:title')
+                await second.set_data(chat=1, user=1, data={'title': 'Задача'})
+                await first.update_data(chat=1, user=1, page=2)
+
+                fresh = SharedStorage(backend, cache_ttl=0)
+                self.assertEqual(await fresh.get_state(chat=1, user=1), 'Form:title')
+                self.assertEqual(await fresh.get_data(chat=1, user=1), {'title': 'Задача', 'page': 2})
+
+    async def test_reads_trust_local_copy_for_cache_ttl(self):
+        first, second = self.pair(MemoryBackend(), cache_ttl=1.0)
+        await second.get_state(chat=1, user=1)
+        await first.set_state(chat=1, user=1, state='Form:title')
+        self.assertIsNone(await second.get_state(chat=1, user=1))
+        self.clock.now += 1.5
+        self.assertEqual(await second.get_state(chat=1, user=1), 'Form:title')
+
+    async def test_record_expires_after_ttl(self):
+        for name, backend in self.make_backends().items():
+            if name == 'sqlite':
+                continue  # SQLite хранит срок по time.time(), проверяется ниже
+            with self.subTest(backend=name):
+                storage = SharedStorage(backend, ttl=60, cache_ttl=0)
+                await storage.set_data(chat=1, user=1, data={'a': 1})
+                self.clock.now += 30
+                self.assertEqual(await storage.get_data(chat=1, user=1), {'a': 1})
+                self.clock.now += 31
+                self.assertEqual(await storage.get_data(chat=1, user=1), {})
+
+    async def test_sqlite_record_expires_after_ttl(self):
+        backend = self.make_backends()['sqlite']
+        storage = SharedStorage(backend, ttl=60, cache_ttl=0)
+        await storage.set_data(chat=1, user=1, data={'a': 1})
+        with mock.patch('storage.time.time', lambda: 10 ** 10):
+            self.assertEqual(await storage.get_data(chat=1, user=1), {})
+
+    async def test_empty_record_is_deleted(self):
+        backend = MemoryBackend()
+        storage = SharedStorage(backend)
+        await storage.set_state(chat=1, user=1, state='Form:title')
+        await storage.reset_state(chat=1, user=1)
+        self.assertIsNone(await backend.get('fsm:1:1'))
+
+
+class BackendLockTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.clock.patch(self)
+
+    def backends(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return {
+            'memory': MemoryBackend(),
+            'redis': RedisBackend(client=FakeRedis(self.clock)),
+            'sqlite': SQLiteBackend(os.path.join(directory.name, 'lock.sqlite3')),
+        }
+
+    async def test_holders_do_not_overlap(self):
+        for name, backend in self.backends().items():
+            with self.subTest(backend=name):
+                events = []
+
+                async def worker(n):
+                    async with BackendLock(backend, 'card', ttl=60, poll=0.001):
+                        events.append(('in', n))
+                        await asyncio.sleep(0.005)
+                        events.append(('out', n))
+
+                await asyncio.gather(*(worker(n) for n in range(4)))
+                self.assertEqual(len(events), 8)
+                for i in range(0, 8, 2):
+                    self.assertEqual(events[i + 1], ('out', events[i][1]))
+                self.assertIsNone(await backend.get('card'))
+
+    async def test_expired_lock_is_taken_over_and_not_released_by_old_owner(self):
+        backend = MemoryBackend()
+        stale = BackendLock(backend, 'card', ttl=5)
+        await stale.__aenter__()
+        self.clock.now += 6
+        async with BackendLock(backend, 'card', ttl=5, poll=0.001):
+            # Владелец истёкшей блокировки не снимает новую
+            await stale.__aexit__(None, None, None)
+            self.assertIsNotNone(await backend.get('card'))
+        self.assertIsNone(await backend.get('card'))
+
+    async def test_add_and_delete_if(self):
+        for name, backend in self.backends().items():
+            with self.subTest(backend=name):
+                self.assertTrue(await backend.add('k', 'a', 60))
+                self.assertFalse(await backend.add('k', 'b', 60))
+                await backend.delete_if('k', 'b')
+                self.assertEqual(await backend.get('k'), 'a')
+                await backend.delete_if('k', 'a')
+                self.assertIsNone(await backend.get('k'))
+
+
+if __name__ == '__main__':
+    unittest.main()